@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 
 from pathlib import Path
 import os
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -48,6 +49,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    # Last, so its timings and profiles cover the view rather than the other middleware
+    'core.middleware.RequestMetricsMiddleware',
 ]
 
 ROOT_URLCONF = 'MedicOS.urls'
@@ -69,6 +72,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'MedicOS.wsgi.application'
+ASGI_APPLICATION = 'MedicOS.asgi.application'
 
 
 # Database
@@ -126,9 +130,72 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # API Keys
 OPENFDA_API_KEY = os.getenv('OPENFDA_API_KEY')
+DEEPSEEK_API_KEY = os.getenv('DEEPSEEK_API_KEY')
 WHATSAPP_API_KEY = os.getenv('WHATSAPP_API_KEY')
 AWS_ACCESS_KEY = os.getenv('AWS_ACCESS_KEY')
 AWS_SECRET_KEY = os.getenv('AWS_SECRET_KEY')
+TELEGRAM_TOKEN = os.getenv('TELEGRAM_TOKEN')
+MARYTTS_URL = os.getenv('MARYTTS_URL', 'http://localhost:59125/process')
+VOICERSS_API_KEY = os.getenv('VOICERSS_API_KEY')
+TELEGRAM_API_URL = os.getenv('TELEGRAM_API_URL', 'https://api.telegram.org/bot')
+# Upstream API base URLs, overridable to point at a local fake (manage.py bench_interactions)
+DEEPSEEK_API_URL = os.getenv('DEEPSEEK_API_URL', 'https://api.deepseek.com')
+OPENFDA_API_URL = os.getenv('OPENFDA_API_URL', 'https://api.fda.gov')
+
+# Telegram delivery (api.telegram_sender); defaults follow Telegram's bot limits
+TELEGRAM_GLOBAL_RATE = float(os.getenv('TELEGRAM_GLOBAL_RATE', 30))  # Messages per second across all chats
+TELEGRAM_PER_CHAT_INTERVAL = float(os.getenv('TELEGRAM_PER_CHAT_INTERVAL', 1))  # Seconds between messages to one chat
+TELEGRAM_SEND_WORKERS = int(os.getenv('TELEGRAM_SEND_WORKERS', 50))
+TELEGRAM_MAX_RETRIES = int(os.getenv('TELEGRAM_MAX_RETRIES', 3))  # Attempts per message when rate limited
+
+# Outbound HTTP (core.http_client)
+HTTP_CLIENT_TIMEOUT = float(os.getenv('HTTP_CLIENT_TIMEOUT', 15))  # Seconds per request unless overridden
+HTTP_CLIENT_POOL_SIZE = int(os.getenv('HTTP_CLIENT_POOL_SIZE', 20))  # Keep-alive connections per host
+HTTP_CLIENT_KEEPALIVE = float(os.getenv('HTTP_CLIENT_KEEPALIVE', 30))
+HTTP_CLIENT_DNS_TTL = int(os.getenv('HTTP_CLIENT_DNS_TTL', 300))
+# Per-host circuit breaker: open after N consecutive failures, probe again after the timeout (seconds)
+HTTP_CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('HTTP_CIRCUIT_FAILURE_THRESHOLD', 5))
+HTTP_CIRCUIT_RESET_TIMEOUT = float(os.getenv('HTTP_CIRCUIT_RESET_TIMEOUT', 30))
+# Per-host AIMD concurrency limit (grows up to HTTP_CLIENT_POOL_SIZE)
+HTTP_CONCURRENCY_INITIAL = int(os.getenv('HTTP_CONCURRENCY_INITIAL', 8))
+HTTP_CONCURRENCY_SLOW_SECONDS = float(os.getenv('HTTP_CONCURRENCY_SLOW_SECONDS', 5))
+HTTP_CONCURRENCY_QUEUE_TIMEOUT = float(os.getenv('HTTP_CONCURRENCY_QUEUE_TIMEOUT', 2))
+
+# Drug interactions
+# Ask DeepSeek about a whole medication list in one prompt instead of pair by pair
+DEEPSEEK_BATCH_INTERACTIONS = os.getenv('DEEPSEEK_BATCH_INTERACTIONS', 'True') == 'True'
+# Known interactions older than this (seconds) are refreshed from upstream
+INTERACTION_KB_MAX_AGE = int(os.getenv('INTERACTION_KB_MAX_AGE', 30 * 24 * 3600))
+# Brand/generic synonym sources (CSV or openFDA NDC JSON, optionally zipped), separated by os.pathsep
+DRUG_INDEX_PATHS = [
+    path for path in os.getenv(
+        'DRUG_INDEX_PATHS', str(BASE_DIR / 'core' / 'data' / 'drug_synonyms.csv')
+    ).split(os.pathsep) if path
+]
+# Local openFDA label interaction index (manage.py ingest_fda_labels); used before the live API
+OPENFDA_LABEL_INDEX_PATH = Path(os.getenv('OPENFDA_LABEL_INDEX_PATH', BASE_DIR / 'openfda_labels.sqlite3'))
+
+# Medication schedules
+# Days ahead for which DoseOccurrence rows are kept materialised
+DOSE_HORIZON_DAYS = int(os.getenv('DOSE_HORIZON_DAYS', 90))
+
+# Reminder dispatcher (manage.py run_reminders)
+REMINDER_LOOKAHEAD_MINUTES = int(os.getenv('REMINDER_LOOKAHEAD_MINUTES', 60))  # Doses held in memory ahead of time
+REMINDER_REFRESH_SECONDS = float(os.getenv('REMINDER_REFRESH_SECONDS', 60))  # How often new doses are picked up from the DB
+REMINDER_GRACE_MINUTES = int(os.getenv('REMINDER_GRACE_MINUTES', 15))  # Later than this a reminder is skipped
+REMINDER_BATCH_SIZE = int(os.getenv('REMINDER_BATCH_SIZE', 500))
+REMINDER_CONCURRENCY = int(os.getenv('REMINDER_CONCURRENCY', 200))  # Reminders in flight; Telegram limits are applied by the send queue
+
+# Most medications accepted by one bulk import (POST /api/medications/import/)
+MEDICATION_IMPORT_MAX = int(os.getenv('MEDICATION_IMPORT_MAX', 100))
+
+# API pagination (api.pagination): page size when ?limit= is absent, and the most a client may ask for
+API_PAGE_SIZE = int(os.getenv('API_PAGE_SIZE', 50))
+API_MAX_PAGE_SIZE = int(os.getenv('API_MAX_PAGE_SIZE', 200))
+
+# Background tasks
+# Run queued tasks inline instead of on the worker thread (local stand-in broker for tests)
+BACKGROUND_TASKS_EAGER = os.getenv('BACKGROUND_TASKS_EAGER', 'False') == 'True'
 
 # Authentication settings
 LOGIN_REDIRECT_URL = 'core:dashboard'
@@ -147,6 +214,42 @@ MEDIA_ROOT = BASE_DIR / 'media'
 # Create directories for media
 VOICE_ALERTS_DIR = MEDIA_ROOT / 'voice_alerts'
 VOICE_ALERTS_DIR.mkdir(parents=True, exist_ok=True)
+# Content-addressed cache of synthesised reminder audio (api.tts_cache)
+TTS_CACHE_DIR = Path(os.getenv('TTS_CACHE_DIR', MEDIA_ROOT / 'tts_cache'))
+TTS_CACHE_MAX_BYTES = int(os.getenv('TTS_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+
+# Two-tier cache: a per-process LRU in front of a tier shared by all workers.
+# CACHE_URL is a Redis URL (redis://, rediss://, unix://), fakeredis:// for tests,
+# or a directory. The directory tier (by default one in the temp dir) is a small
+# development fallback; production deployments should point CACHE_URL at Redis
+CACHES = {
+    'default': {
+        'BACKEND': 'core.cache.TieredCache',
+        'LOCATION': os.getenv('CACHE_URL', str(Path(tempfile.gettempdir()) / 'medicos-cache')),
+        'KEY_PREFIX': 'medicos',
+        # Bump to invalidate every cached value after a format change
+        'VERSION': int(os.getenv('CACHE_VERSION', 1)),
+        'OPTIONS': {
+            'LOCAL_MAX_ENTRIES': int(os.getenv('CACHE_LOCAL_MAX_ENTRIES', 10000)),
+            # Bounds how long a worker can serve a value another worker has replaced
+            'LOCAL_TIMEOUT': int(os.getenv('CACHE_LOCAL_TIMEOUT', 30)),
+            # Interaction reports and their version counters are always read from the shared tier
+            'LOCAL_EXCLUDE_PREFIXES': ['patient_'],
+            'STATS_PREFIXES': ['drug_pair_', 'alt_drugs_', 'patient_'],
+        },
+    }
+}
+
+# Request instrumentation (core.middleware.RequestMetricsMiddleware)
+# Per-request DB/upstream/cache timings in a Server-Timing header; exposes internals, so off unless DEBUG
+SERVER_TIMING = os.getenv('SERVER_TIMING', str(DEBUG)) == 'True'
+# /metrics needs "Authorization: Bearer <token>" or a staff session; without a token only staff get in
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+# Fraction of requests to PROFILE_VIEW_MODULES run under cProfile; 0 disables profiling
+PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', 0))
+PROFILE_SLOW_MS = float(os.getenv('PROFILE_SLOW_MS', 500))  # Only profiles slower than this are saved
+PROFILE_DIR = Path(os.getenv('PROFILE_DIR', BASE_DIR / 'profiles'))
+PROFILE_VIEW_MODULES = ['api.views']
 
 # API Throttling
 REST_FRAMEWORK = {
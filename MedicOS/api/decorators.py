@@ -0,0 +1,75 @@
+from functools import wraps
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.contrib.auth import REDIRECT_FIELD_NAME
+from django.contrib.auth import decorators as auth_decorators
+from django.contrib.auth.views import redirect_to_login
+from django.http import Http404, HttpResponseNotAllowed
+from django.utils.log import log_response
+from django.views.decorators import csrf, http
+
+# Django 4.2's view decorators wrap every view in a sync function, which turns
+# an async view into a sync one returning an unawaited coroutine. These keep
+# async views async and defer to Django's own decorators for sync views.
+
+def csrf_exempt(view_func):
+    if not iscoroutinefunction(view_func):
+        return csrf.csrf_exempt(view_func)
+
+    @wraps(view_func)
+    async def wrapper_view(*args, **kwargs):
+        return await view_func(*args, **kwargs)
+
+    wrapper_view.csrf_exempt = True
+    return wrapper_view
+
+def require_http_methods(request_method_list):
+    def decorator(func):
+        if not iscoroutinefunction(func):
+            return http.require_http_methods(request_method_list)(func)
+
+        @wraps(func)
+        async def inner(request, *args, **kwargs):
+            if request.method not in request_method_list:
+                response = HttpResponseNotAllowed(request_method_list)
+                log_response(
+                    "Method Not Allowed (%s): %s",
+                    request.method,
+                    request.path,
+                    response=response,
+                    request=request,
+                )
+                return response
+            return await func(request, *args, **kwargs)
+
+        return inner
+
+    return decorator
+
+def login_required(function=None, redirect_field_name=REDIRECT_FIELD_NAME, login_url=None):
+    def decorator(view_func):
+        if not iscoroutinefunction(view_func):
+            return auth_decorators.login_required(
+                view_func, redirect_field_name=redirect_field_name, login_url=login_url
+            )
+
+        @wraps(view_func)
+        async def wrapper_view(request, *args, **kwargs):
+            # request.user loads the session and user lazily; resolve it off the event loop
+            is_authenticated = await sync_to_async(lambda: request.user.is_authenticated)()
+            if is_authenticated:
+                return await view_func(request, *args, **kwargs)
+            return redirect_to_login(request.get_full_path(), login_url, redirect_field_name)
+
+        return wrapper_view
+
+    if function:
+        return decorator(function)
+    return decorator
+
+async def aget_object_or_404(klass, *args, **kwargs):
+    """Async get_object_or_404 on the async ORM (built into Django from 5.0)"""
+    queryset = klass._default_manager.all() if hasattr(klass, '_default_manager') else klass
+    try:
+        return await queryset.aget(*args, **kwargs)
+    except queryset.model.DoesNotExist:
+        raise Http404(f"No {queryset.model._meta.object_name} matches the given query.")
@@ -0,0 +1,529 @@
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import re
+import statistics
+import string
+import subprocess
+import tempfile
+import threading
+import time
+import zlib
+from collections import Counter
+from datetime import timedelta
+from urllib.parse import parse_qs
+import django
+import httpx
+from aiohttp import web
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.db.backends.signals import connection_created
+from django.test import Client
+from django.test.utils import override_settings, setup_databases, teardown_databases
+from django.utils import timezone
+from core.models import DrugInteraction, Medication, Patient
+from api.schedule import materialise_doses
+from api.services import check_drug_interactions
+from api.worker import worker
+
+USER_PREFIX = 'bench_interactions_'
+DRUG_POOL_SIZE = 40  # Distinct drugs per medication count; patients draw from the same pool
+SCHEDULE = {'times': ['08:00', '20:00'], 'days': [0, 1, 2, 3, 4, 5, 6]}
+
+# Replies chosen per pair, so the severity mix is stable across runs
+INTERACTION_REPLIES = [
+    "Avoid this combination; it significantly raises the risk of serious bleeding.",
+    "Monitor blood pressure, as the combination may increase hypotensive effects.",
+    "No clinically relevant interaction is expected.",
+    "Use with caution and consider a dose adjustment.",
+]
+
+def letters(number: int) -> str:
+    """0 -> 'a', 25 -> 'z', 26 -> 'ba': names the drug normaliser leaves alone"""
+    name = ''
+    while True:
+        number, digit = divmod(number, 26)
+        name = string.ascii_lowercase[digit] + name
+        if not number:
+            return name
+
+def percentile(values, q: float):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+def latency_summary(latencies, wall: float) -> dict:
+    milliseconds = [latency * 1000 for latency in latencies]
+    return {
+        'requests': len(latencies),
+        'p50_ms': round(percentile(milliseconds, 50), 2) if milliseconds else None,
+        'p99_ms': round(percentile(milliseconds, 99), 2) if milliseconds else None,
+        'mean_ms': round(statistics.mean(milliseconds), 2) if milliseconds else None,
+        'throughput_rps': round(len(latencies) / wall, 1) if wall else None,
+    }
+
+class FakeUpstream:
+    """
+    Local stand-in for DeepSeek chat completions and the openFDA label and NDC
+    endpoints. Every call waits ``latency`` seconds (+/-50%) and fails with a
+    503 at ``error_rate``; calls and injected errors are counted per route.
+    """
+
+    def __init__(self, latency: float, error_rate: float, seed: int):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.calls = Counter()
+        self.errors = Counter()
+
+    def snapshot(self) -> dict:
+        return {'calls': dict(self.calls), 'errors': dict(self.errors)}
+
+    async def _delay_or_fail(self, route: str):
+        self.calls[route] += 1
+        await asyncio.sleep(self.latency * self.random.uniform(0.5, 1.5))
+        if self.random.random() < self.error_rate:
+            self.errors[route] += 1
+            return web.json_response({'error': 'injected failure'}, status=503)
+        return None
+
+    @staticmethod
+    def _reply(drug_a: str, drug_b: str) -> str:
+        key = '|'.join(sorted((drug_a.lower(), drug_b.lower())))
+        return INTERACTION_REPLIES[zlib.crc32(key.encode()) % len(INTERACTION_REPLIES)]
+
+    async def chat(self, request):
+        body = await request.json()
+        failure = await self._delay_or_fail('deepseek_chat')
+        if failure:
+            return failure
+        prompt = body['messages'][0]['content']
+        batch = re.search(r'Pairs to assess: (.*)\n', prompt)
+        single = re.search(r'taking (.+) and (.+) together\?', prompt)
+        if batch:
+            content = json.dumps([
+                {'drug_a': drug_a, 'drug_b': drug_b, 'description': self._reply(drug_a, drug_b)}
+                for drug_a, drug_b in json.loads(batch.group(1))
+            ])
+        elif single:
+            content = self._reply(single.group(1), single.group(2))
+        else:
+            content = 'Alternative one, Alternative two'
+        return web.json_response({'choices': [{'message': {'role': 'assistant', 'content': content}}]})
+
+    async def label(self, request):
+        failure = await self._delay_or_fail('openfda_label')
+        if failure:
+            return failure
+        drug = parse_qs(request.query_string).get('search', [''])[0].partition(':')[2]
+        return web.json_response({'results': [{
+            'id': f"bench-{drug}",
+            'openfda': {'generic_name': [drug]},
+            'drug_interactions': [f"Concomitant use with {drug} may increase exposure. Monitor patients closely."],
+        }]})
+
+    async def ndc(self, request):
+        failure = await self._delay_or_fail('openfda_ndc')
+        if failure:
+            return failure
+        drug = parse_qs(request.query_string).get('search', [''])[0].partition(':')[2]
+        return web.json_response({'results': [
+            {'generic_name': drug, 'brand_name': f"{drug} brand", 'labeler_name': 'Bench Labs'}
+        ]})
+
+    def start(self, port: int) -> int:
+        """Serve on a daemon thread; returns the bound port"""
+        app = web.Application()
+        app.router.add_post('/v1/chat/completions', self.chat)
+        app.router.add_get('/drug/label.json', self.label)
+        app.router.add_get('/drug/ndc.json', self.ndc)
+        loop = asyncio.new_event_loop()
+        runner = web.AppRunner(app)
+        loop.run_until_complete(runner.setup())
+        site = web.TCPSite(runner, '127.0.0.1', port)
+        loop.run_until_complete(site.start())
+        threading.Thread(target=loop.run_forever, name='fake-upstream', daemon=True).start()
+        return runner.addresses[0][1]
+
+class QueryCounter:
+    """Execute wrapper counting queries and their time on every connection this process opens"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.count += 1
+                self.seconds += elapsed
+
+    def attach(self, sender=None, connection=None, **kwargs):
+        if self not in connection.execute_wrappers:
+            connection.execute_wrappers.append(self)
+
+    def install(self):
+        # Sync views and the background worker run on other threads, each with its own connection
+        connection_created.connect(self.attach, weak=False)
+        for existing in connections.all():
+            self.attach(connection=existing)
+
+    def uninstall(self):
+        connection_created.disconnect(self.attach)
+        for existing in connections.all():
+            if self in existing.execute_wrappers:
+                existing.execute_wrappers.remove(self)
+
+    def snapshot(self):
+        with self._lock:
+            return self.count, self.seconds
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark check_drug_interactions and the medication_interactions and medication_schedule '
+        'endpoints across medication counts and concurrent users against a fake DeepSeek/openFDA. '
+        'Writes a JSON artifact (--output) that --compare can diff against a later run. In-process runs '
+        'use a throwaway test database; with --url the fixtures go to that server\'s database and are '
+        'deleted afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--medications', default='2,5,10,20', help='Medication counts per patient')
+        parser.add_argument('--concurrency', default='1,10,50,100,200', help='Concurrent users per level')
+        parser.add_argument('--rounds', type=int, default=3, help='Requests per endpoint per user at each level')
+        parser.add_argument('--schedule-days', type=int, default=7, help='Calendar window requested from medication_schedule')
+        parser.add_argument('--upstream-latency', type=float, default=0.2, help='Fake upstream latency per call (seconds)')
+        parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of fake upstream calls failing with 503')
+        parser.add_argument('--upstream-port', type=int, default=0, help='Port for the fake upstream (0 = any)')
+        parser.add_argument('--url', help='Base URL of a running server instead of the in-process ASGI app')
+        parser.add_argument('--ready-timeout', type=float, default=300, help='Seconds to wait for interaction reports')
+        parser.add_argument('--seed', type=int, default=1, help='Seed for drug assignment and injected failures')
+        parser.add_argument('--output', help='Write the JSON artifact here')
+        parser.add_argument('--compare', help='Earlier JSON artifact to report p50/p99 changes against')
+        parser.add_argument('--json', action='store_true', help='Print the artifact instead of a summary')
+
+    def handle(self, *args, **options):
+        try:
+            medication_counts = [int(value) for value in options['medications'].split(',')]
+            levels = [int(value) for value in options['concurrency'].split(',')]
+        except ValueError:
+            raise CommandError('--medications and --concurrency take comma-separated integers')
+        baseline = self._load(options['compare']) if options['compare'] else None
+
+        upstream = FakeUpstream(options['upstream_latency'], options['error_rate'], options['seed'])
+        upstream_url = f"http://127.0.0.1:{upstream.start(options['upstream_port'])}"
+        if options['url']:
+            self.stderr.write(
+                f"Fake upstream at {upstream_url} (server needs DEEPSEEK_API_URL and OPENFDA_API_URL={upstream_url})"
+            )
+
+        # Run-unique drug names keep every run cold and make cleanup exact
+        self.run_id = ''.join(random.choice(string.ascii_lowercase) for _ in range(6))
+        self.rng = random.Random(options['seed'])
+        test_databases = None if options['url'] else self._setup_test_databases()
+        self.queries = QueryCounter()
+        self.queries.install()
+        self.upstream = upstream
+        self.options = options
+        started = time.perf_counter()
+        try:
+            with override_settings(
+                DEEPSEEK_API_URL=upstream_url,
+                OPENFDA_API_URL=upstream_url,
+                DEEPSEEK_API_KEY='bench',
+                OPENFDA_API_KEY='bench',
+            ):
+                results = [self._bench_medication_count(count, levels) for count in medication_counts]
+        finally:
+            self.queries.uninstall()
+            if test_databases is None:
+                self._cleanup()
+            else:
+                # Let queued report jobs finish before their database goes away
+                worker.join()
+                teardown_databases(test_databases, verbosity=0)
+
+        artifact = {
+            'meta': self._meta(time.perf_counter() - started),
+            'config': {key: options[key] for key in (
+                'medications', 'concurrency', 'rounds', 'schedule_days',
+                'upstream_latency', 'error_rate', 'seed', 'url'
+            )},
+            'results': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as stream:
+                json.dump(artifact, stream, indent=2)
+            self.stderr.write(self.style.SUCCESS(f"Wrote {options['output']}"))
+        if options['json']:
+            self.stdout.write(json.dumps(artifact, indent=2))
+        else:
+            self._print_summary(artifact)
+        if baseline:
+            self._print_comparison(baseline, artifact)
+
+    # Scenarios
+
+    def _drug_names(self, tag: str, count: int):
+        return [f"Bench{self.run_id}{tag}{letters(i)}".capitalize() for i in range(count)]
+
+    def _bench_medication_count(self, count: int, levels):
+        self.stderr.write(f"{count} medications")
+        result = {'medications': count, 'pairs': count * (count - 1) // 2}
+
+        drugs = self._drug_names(f"s{letters(count)}x", count)
+        result['check_drug_interactions'] = {
+            'cold': self._measure_call(lambda: check_drug_interactions(drugs)),
+            'warm': self._measure_call(lambda: check_drug_interactions(drugs)),
+        }
+
+        patients = self._create_patients(count, max(levels))
+        sessions = self._sessions(patients)
+        result['interaction_reports_cold'] = self._measure(lambda: asyncio.run(self._wait_for_reports(sessions)))
+        result['endpoints'] = []
+        for level in levels:
+            result['endpoints'].extend(self._bench_level(sessions[:level], level))
+        return result
+
+    def _measure(self, run) -> dict:
+        """Wall time, upstream calls and DB queries for one run"""
+        queries_before, query_seconds_before = self.queries.snapshot()
+        upstream_before = self.upstream.snapshot()
+        started = time.perf_counter()
+        value = run()
+        seconds = time.perf_counter() - started
+        queries, query_seconds = self.queries.snapshot()
+        upstream_after = self.upstream.snapshot()
+        measured = {
+            'seconds': round(seconds, 4),
+            'upstream_calls': self._delta(upstream_before['calls'], upstream_after['calls']),
+            'upstream_errors': self._delta(upstream_before['errors'], upstream_after['errors']),
+            'db_queries': None if self.options['url'] else queries - queries_before,
+            'db_seconds': None if self.options['url'] else round(query_seconds - query_seconds_before, 4),
+        }
+        if isinstance(value, dict):
+            measured.update(value)
+        return measured
+
+    def _measure_call(self, call) -> dict:
+        def run():
+            interactions = call()
+            return {'fallbacks': sum(1 for interaction in interactions if interaction['source'] == 'Fallback')}
+        return self._measure(run)
+
+    @staticmethod
+    def _delta(before: dict, after: dict) -> dict:
+        return {route: after[route] - before.get(route, 0) for route in after if after[route] != before.get(route, 0)}
+
+    def _bench_level(self, sessions, level: int):
+        """Every user requests both endpoints ``rounds`` times, all users at once"""
+        measured = {}
+
+        def run():
+            measured.update(asyncio.run(self._drive(sessions)))
+
+        totals = self._measure(run)
+        rows = []
+        requests = sum(len(latencies) for latencies, _ in measured['endpoints'].values())
+        for endpoint, (latencies, statuses) in measured['endpoints'].items():
+            rows.append({
+                'endpoint': endpoint,
+                'concurrency': level,
+                **latency_summary(latencies, measured['wall']),
+                'statuses': statuses,
+                'db_queries_per_request': round(totals['db_queries'] / requests, 2) if totals['db_queries'] is not None else None,
+                'upstream_calls': totals['upstream_calls'],
+            })
+        return rows
+
+    # Fixtures
+
+    def _create_patients(self, count: int, users: int):
+        pool = self._drug_names(f"p{letters(count)}x", max(DRUG_POOL_SIZE, count))
+        prefix = f"{USER_PREFIX}{self.run_id}_{count}_"
+        created = User.objects.bulk_create([User(username=f"{prefix}{i}") for i in range(users)])
+        patients = Patient.objects.bulk_create([
+            Patient(user=user, dob='1970-01-01', phone='0') for user in created
+        ])
+        # bulk_create skips the post_save signals, so doses are materialised explicitly
+        medications = Medication.objects.bulk_create([
+            Medication(patient=patient, name=name, dosage='1 tablet', schedule=SCHEDULE)
+            for patient in patients
+            for name in self.rng.sample(pool, count)
+        ])
+        until = timezone.localdate() + timedelta(days=self.options['schedule_days'])
+        for medication in medications:
+            materialise_doses(medication, until=until)
+        return patients
+
+    def _setup_test_databases(self):
+        """
+        Test databases, as the test runner creates them, so the fixtures never
+        touch real data. SQLite gets a file instead of its in-memory default:
+        the ASGI threads and the background worker each open a connection.
+        """
+        settings_dict = connections[DEFAULT_DB_ALIAS].settings_dict
+        if settings_dict['ENGINE'].endswith('sqlite3') and not settings_dict['TEST'].get('NAME'):
+            settings_dict['TEST']['NAME'] = os.path.join(
+                tempfile.gettempdir(), f"bench_interactions_{self.run_id}.sqlite3"
+            )
+        return setup_databases(verbosity=0, interactive=False, aliases={DEFAULT_DB_ALIAS}, serialized_aliases=set())
+
+    def _sessions(self, patients):
+        cookies = []
+        for patient in patients:
+            client = Client()
+            client.force_login(patient.user)
+            cookies.append(f"{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}")
+        return cookies
+
+    def _cleanup(self):
+        User.objects.filter(username__startswith=f"{USER_PREFIX}{self.run_id}_").delete()
+        prefix = f"bench{self.run_id}"
+        DrugInteraction.objects.filter(drug_a__startswith=prefix).delete()
+        DrugInteraction.objects.filter(drug_b__startswith=prefix).delete()
+
+    # HTTP
+
+    def _client(self):
+        if self.options['url']:
+            return httpx.AsyncClient(base_url=self.options['url'], timeout=300)
+        return httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=get_asgi_application()),
+            base_url='http://testserver',
+            timeout=300
+        )
+
+    async def _wait_for_reports(self, sessions):
+        """Request every patient's interaction report until all are computed and current"""
+        deadline = time.monotonic() + self.options['ready_timeout']
+        pending = list(sessions)
+        async with self._client() as client:
+            while pending:
+                responses = await asyncio.gather(*(
+                    client.get('/api/medications/interactions/', headers={'Cookie': cookie}) for cookie in pending
+                ))
+                pending = [
+                    cookie for cookie, response in zip(pending, responses)
+                    if response.status_code != 200 or response.json()['status'] != 'ready' or response.json()['stale']
+                ]
+                if pending and time.monotonic() > deadline:
+                    return {'ready': len(sessions) - len(pending), 'timed_out': len(pending)}
+                if pending:
+                    await asyncio.sleep(0.1)
+        return {'ready': len(sessions), 'timed_out': 0}
+
+    async def _drive(self, sessions):
+        today = timezone.localdate()
+        schedule_query = f"?start={today.isoformat()}&end={(today + timedelta(days=self.options['schedule_days'] - 1)).isoformat()}"
+        endpoints = {
+            'medication_interactions': '/api/medications/interactions/',
+            'medication_schedule': '/api/medications/schedule/' + schedule_query,
+        }
+        results = {name: ([], Counter()) for name in endpoints}
+
+        async def user(client, cookie):
+            for _ in range(self.options['rounds']):
+                for name, path in endpoints.items():
+                    started = time.perf_counter()
+                    response = await client.get(path, headers={'Cookie': cookie})
+                    await response.aread()
+                    latencies, statuses = results[name]
+                    latencies.append(time.perf_counter() - started)
+                    statuses[str(response.status_code)] += 1
+
+        async with self._client() as client:
+            started = time.perf_counter()
+            await asyncio.gather(*(user(client, cookie) for cookie in sessions))
+            wall = time.perf_counter() - started
+        return {
+            'wall': wall,
+            'endpoints': {name: (latencies, dict(statuses)) for name, (latencies, statuses) in results.items()},
+        }
+
+    # Reporting
+
+    def _meta(self, seconds: float) -> dict:
+        try:
+            commit = subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+                capture_output=True, text=True, timeout=10
+            ).stdout.strip() or None
+        except (OSError, subprocess.SubprocessError):
+            commit = None
+        return {
+            'commit': commit,
+            'timestamp': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'cache': settings.CACHES['default']['BACKEND'],
+            'in_process': not self.options['url'],
+            'seconds': round(seconds, 1),
+        }
+
+    @staticmethod
+    def _load(path: str) -> dict:
+        try:
+            with open(path, encoding='utf-8') as stream:
+                return json.load(stream)
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Could not read {path}: {str(e)}")
+
+    @staticmethod
+    def _rows(artifact: dict) -> dict:
+        """{(medications, scenario, concurrency): row} for comparisons"""
+        rows = {}
+        for result in artifact['results']:
+            count = result['medications']
+            for phase, measured in result['check_drug_interactions'].items():
+                rows[(count, f"check_drug_interactions_{phase}", 1)] = {'p50_ms': measured['seconds'] * 1000}
+            for row in result['endpoints']:
+                rows[(count, row['endpoint'], row['concurrency'])] = row
+        return rows
+
+    def _print_summary(self, artifact: dict):
+        for result in artifact['results']:
+            self.stdout.write(f"== {result['medications']} medications ({result['pairs']} pairs)")
+            for phase, measured in result['check_drug_interactions'].items():
+                self.stdout.write(
+                    f"check_drug_interactions {phase}: {measured['seconds'] * 1000:.1f} ms, "
+                    f"upstream {measured['upstream_calls']} (errors {measured['upstream_errors']}), "
+                    f"queries {measured['db_queries']}, fallbacks {measured['fallbacks']}"
+                )
+            reports = result['interaction_reports_cold']
+            self.stdout.write(
+                f"interaction reports cold: {reports['seconds']:.2f} s for {reports['ready']} patients "
+                f"({reports['timed_out']} timed out), upstream {reports['upstream_calls']}, queries {reports['db_queries']}"
+            )
+            for row in result['endpoints']:
+                self.stdout.write(
+                    f"{row['endpoint']:<24} c={row['concurrency']:<4} p50 {row['p50_ms']:>8} ms  "
+                    f"p99 {row['p99_ms']:>8} ms  {row['throughput_rps']:>7} req/s  "
+                    f"queries/req {row['db_queries_per_request']}  statuses {row['statuses']}"
+                )
+
+    def _print_comparison(self, baseline: dict, artifact: dict):
+        before, after = self._rows(baseline), self._rows(artifact)
+        self.stdout.write(f"== Compared with {baseline['meta'].get('commit')} ({baseline['meta'].get('timestamp')})")
+        for key in sorted(after.keys() & before.keys()):
+            changes = []
+            for metric in ('p50_ms', 'p99_ms'):
+                old, new = before[key].get(metric), after[key].get(metric)
+                if old and new is not None:
+                    changes.append(f"{metric} {old:.1f} -> {new:.1f} ({(new - old) / old:+.0%})")
+            if changes:
+                count, scenario, level = key
+                self.stdout.write(f"{count} meds {scenario} c={level}: {', '.join(changes)}")
@@ -0,0 +1,40 @@
+import csv
+import sys
+from django.core.management.base import BaseCommand
+from core.fields import BulkDecryptor
+from core.models import AdverseEvent
+
+COLUMNS = ['id', 'patient_id', 'medication__name', 'reaction', 'severity', 'reported_date', 'notes']
+
+class Command(BaseCommand):
+    help = 'Export adverse events (with decrypted notes) as CSV, decrypting in bulk'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', help='CSV file to write (default: stdout)')
+        parser.add_argument('--since', help='Only events reported on or after this date (YYYY-MM-DD)')
+        parser.add_argument('--workers', type=int, default=4, help='Decryption threads')
+        parser.add_argument('--batch-size', type=int, default=2048, help='Notes decrypted per thread pool task')
+
+    def handle(self, *args, **options):
+        events = AdverseEvent.objects.order_by('id')
+        if options['since']:
+            events = events.filter(reported_date__date__gte=options['since'])
+        decryptor = BulkDecryptor(
+            AdverseEvent._meta.get_field('notes'),
+            batch_size=options['batch_size'],
+            workers=options['workers']
+        )
+
+        stream = open(options['output'], 'w', newline='', encoding='utf-8') if options['output'] else sys.stdout
+        try:
+            writer = csv.writer(stream)
+            writer.writerow(COLUMNS)
+            exported = 0
+            rows = events.values_list(*COLUMNS).ciphertext().iterator(chunk_size=2000)
+            for row in decryptor.iter_rows(rows, COLUMNS.index('notes')):
+                writer.writerow(row)
+                exported += 1
+        finally:
+            if stream is not sys.stdout:
+                stream.close()
+        self.stderr.write(self.style.SUCCESS(f"Exported {exported} adverse events"))
@@ -0,0 +1,120 @@
+import asyncio
+import json
+import statistics
+import threading
+import time
+import httpx
+from aiohttp import web
+from django.contrib.auth.models import User
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from core.models import Patient
+
+USER_PREFIX = 'loadtest_reminders_'
+
+def start_fake_telegram(port: int, latency: float) -> int:
+    """Minimal Bot API answering every call after ``latency`` seconds; returns the bound port"""
+
+    async def handle(request):
+        method = request.match_info['method']
+        await request.read()
+        if method == 'getMe':
+            return web.json_response({'ok': True, 'result': {'id': 1, 'is_bot': True, 'first_name': 'loadtest', 'username': 'loadtest'}})
+        await asyncio.sleep(latency)
+        return web.json_response({'ok': True, 'result': {
+            'message_id': 1, 'date': int(time.time()), 'chat': {'id': 1, 'type': 'private'}
+        }})
+
+    app = web.Application()
+    app.router.add_post('/bot{token}/{method}', handle)
+    loop = asyncio.new_event_loop()
+    runner = web.AppRunner(app)
+    loop.run_until_complete(runner.setup())
+    site = web.TCPSite(runner, '127.0.0.1', port)
+    loop.run_until_complete(site.start())
+    threading.Thread(target=loop.run_forever, name='fake-telegram', daemon=True).start()
+    return runner.addresses[0][1]
+
+class Command(BaseCommand):
+    help = (
+        'Fire concurrent /api/reminders/send/ requests and check they overlap instead of serialising. '
+        'Runs in-process on the ASGI application by default, or against --url (start that server with '
+        'TELEGRAM_API_URL pointing at the fake Telegram this command prints).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50, help='Concurrent reminder sends')
+        parser.add_argument('--latency', type=float, default=0.5, help='Fake Telegram latency per call (seconds)')
+        parser.add_argument('--url', help='Base URL of a running server instead of the in-process ASGI app')
+        parser.add_argument('--telegram-port', type=int, default=0, help='Port for the fake Telegram API (0 = any)')
+        parser.add_argument('--json', action='store_true', help='Print results as JSON')
+
+    def handle(self, *args, **options):
+        count = options['requests']
+        port = start_fake_telegram(options['telegram_port'], options['latency'])
+        telegram_url = f"http://127.0.0.1:{port}/bot"
+        if options['url']:
+            self.stdout.write(f"Fake Telegram API at {telegram_url} (server needs TELEGRAM_API_URL={telegram_url})")
+
+        patients = self._create_patients(count)
+        try:
+            # The send queue's global rate limit would cap throughput, not concurrency
+            with override_settings(TELEGRAM_API_URL=telegram_url, TELEGRAM_TOKEN='0:loadtest', TELEGRAM_GLOBAL_RATE=1000):
+                results = asyncio.run(self._run(patients, options['url']))
+        finally:
+            User.objects.filter(username__startswith=USER_PREFIX).delete()
+
+        latencies = [latency for _, latency in results['responses']]
+        statuses = {}
+        for status, _ in results['responses']:
+            statuses[status] = statuses.get(status, 0) + 1
+        report = {
+            'requests': count,
+            'statuses': statuses,
+            'wall_seconds': round(results['wall'], 3),
+            'mean_latency_seconds': round(statistics.mean(latencies), 3),
+            'serialised_estimate_seconds': round(sum(latencies), 3),
+            # ~requests when sends overlap fully, ~1 when they serialise
+            'effective_concurrency': round(sum(latencies) / results['wall'], 1),
+        }
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            for key, value in report.items():
+                self.stdout.write(f"{key}: {value}")
+
+        if report['effective_concurrency'] < count / 2:
+            self.stderr.write(self.style.WARNING('Reminder sends are serialising'))
+
+    def _create_patients(self, count):
+        User.objects.filter(username__startswith=USER_PREFIX).delete()
+        users = User.objects.bulk_create([User(username=f"{USER_PREFIX}{i}") for i in range(count)])
+        return Patient.objects.bulk_create([
+            Patient(user=user, dob='1970-01-01', phone='0', telegram_chat_id=str(1000 + i))
+            for i, user in enumerate(users)
+        ])
+
+    async def _run(self, patients, url):
+        if url:
+            client = httpx.AsyncClient(base_url=url, timeout=120)
+        else:
+            client = httpx.AsyncClient(
+                transport=httpx.ASGITransport(app=get_asgi_application()),
+                base_url='http://testserver',
+                timeout=120
+            )
+
+        async def send(patient):
+            started = time.perf_counter()
+            response = await client.post('/api/reminders/send/', json={
+                'patient_id': patient.id,
+                'medication': 'Loadtestamol',
+                'dosage': '1 tablet'
+            })
+            return response.status_code, time.perf_counter() - started
+
+        async with client:
+            started = time.perf_counter()
+            responses = await asyncio.gather(*(send(patient) for patient in patients))
+            return {'responses': responses, 'wall': time.perf_counter() - started}
@@ -0,0 +1,9 @@
+from django.core.management.base import BaseCommand
+from api.schedule import extend_dose_horizon
+
+class Command(BaseCommand):
+    help = 'Roll the materialised DoseOccurrence horizon forward for every medication (run daily)'
+
+    def handle(self, *args, **options):
+        written = extend_dose_horizon()
+        self.stdout.write(self.style.SUCCESS(f"Materialised {written} dose occurrences"))
@@ -0,0 +1,25 @@
+from datetime import datetime, timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from core.http_client import http_client
+from api.reminders import prerender_voice_reminders, upcoming_voice_reminders
+from api.tts_cache import get_tts_cache
+
+class Command(BaseCommand):
+    help = "Render tomorrow's voice reminders into the TTS cache (run off-peak, e.g. nightly)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=1, help='Number of days ahead, starting tomorrow')
+        parser.add_argument('--concurrency', type=int, default=4, help='TTS requests in flight')
+
+    def handle(self, *args, **options):
+        tomorrow = timezone.localdate() + timedelta(days=1)
+        tz = timezone.get_current_timezone()
+        start = timezone.make_aware(datetime.combine(tomorrow, datetime.min.time()), tz)
+        end = start + timedelta(days=options['days'])
+
+        reminders = upcoming_voice_reminders(start, end)
+        rendered = http_client.run(prerender_voice_reminders(reminders, options['concurrency']))
+        self.stdout.write(self.style.SUCCESS(
+            f"Rendered {rendered} of {len(reminders)} voice reminders; cache {get_tts_cache().stats()}"
+        ))
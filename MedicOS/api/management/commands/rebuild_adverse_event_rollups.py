@@ -0,0 +1,9 @@
+from django.core.management.base import BaseCommand
+from api.pharmacovigilance import rebuild_rollups
+
+class Command(BaseCommand):
+    help = 'Recompute the adverse event rollup tables from the raw events (backfill or repair)'
+
+    def handle(self, *args, **options):
+        rows = rebuild_rollups()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} adverse event rollup rows"))
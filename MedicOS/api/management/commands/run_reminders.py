@@ -0,0 +1,19 @@
+import asyncio
+from django.core.management.base import BaseCommand
+from api.reminders import ReminderDispatcher
+from api.telegram_sender import telegram_sender
+
+class Command(BaseCommand):
+    help = 'Run the medication reminder dispatcher (one process is enough; extra ones never double-send)'
+
+    def handle(self, *args, **options):
+        dispatcher = ReminderDispatcher()
+        self.stdout.write('Reminder dispatcher started')
+        try:
+            asyncio.run(dispatcher.run())
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(
+            f"Reminder dispatcher stopped: {dispatcher.sent} sent, {dispatcher.failed} failed, "
+            f"{telegram_sender.partial_failures} sent without their voice note"
+        ))
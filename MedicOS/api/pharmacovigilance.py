@@ -0,0 +1,181 @@
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+from core.models import AdverseEvent, AdverseEventRollup, Medication
+from .services import canonical_drug_name
+
+# Evans et al. signal criteria: at least 3 cases with PRR >= 2, plus a 95% ROR
+# interval that excludes 1
+SIGNAL_MIN_CASES = 3
+SIGNAL_MIN_PRR = 2.0
+Z_95 = 1.96
+
+def week_start(moment) -> date:
+    day = timezone.localdate(moment)
+    return day - timedelta(days=day.weekday())
+
+def normalize_reaction(reaction: str) -> str:
+    return ' '.join(reaction.lower().split())[:255]
+
+def rollup_keys(event: AdverseEvent, co_medications: List[str]) -> List[Tuple[str, str, str]]:
+    """The drug and drug pair rows an event counts towards"""
+    drug = canonical_drug_name(event.medication.name)
+    reaction = normalize_reaction(event.reaction)
+    keys = [(drug, '', reaction)]
+    for other in sorted({canonical_drug_name(name) for name in co_medications} - {drug}):
+        drug_a, drug_b = sorted((drug, other))
+        keys.append((drug_a, drug_b, reaction))
+    return keys
+
+def _co_medications(event: AdverseEvent) -> List[str]:
+    # Medications the patient was already taking when the event was reported
+    return list(Medication.objects.filter(
+        patient_id=event.patient_id,
+        created_at__lte=event.reported_date
+    ).exclude(id=event.medication_id).values_list('name', flat=True))
+
+def _rollup_entry(event: AdverseEvent) -> Dict:
+    return {
+        'period': week_start(event.reported_date).isoformat(),
+        'severity': event.severity,
+        'keys': [list(key) for key in rollup_keys(event, _co_medications(event))],
+    }
+
+def _apply_entry(entry: Dict, delta: int):
+    AdverseEventRollup.objects.increment(
+        [tuple(key) for key in entry['keys']],
+        entry['severity'],
+        date.fromisoformat(entry['period']),
+        delta
+    )
+
+def record_adverse_event(event: AdverseEvent):
+    """
+    Fold a reported (or edited) event into the rollups and remember the rows
+    it was counted in on the event itself.
+    """
+    entry = _rollup_entry(event)
+    if entry == event.rollup_entry:
+        return
+    with transaction.atomic():
+        if event.rollup_entry:
+            _apply_entry(event.rollup_entry, -1)
+        _apply_entry(entry, 1)
+        # update() rather than save() so post_save does not fire again
+        AdverseEvent.objects.filter(pk=event.pk).update(rollup_entry=entry)
+    event.rollup_entry = entry
+
+def forget_adverse_event(event: AdverseEvent):
+    """
+    Take a deleted event back out of the rows it was recorded in. The keys are
+    not recomputed: the patient's medications may have changed since.
+    """
+    if not event.rollup_entry:
+        # Counted before entries were kept; rebuild_rollups() settles these
+        return
+    with transaction.atomic():
+        _apply_entry(event.rollup_entry, -1)
+
+def rebuild_rollups() -> int:
+    """Recompute every rollup row from the raw events; returns the number of rows"""
+    totals: Dict[Tuple[str, str, str, date], Dict[str, int]] = {}
+    events = list(AdverseEvent.objects.select_related('medication').only(
+        'patient_id', 'medication__name', 'reaction', 'severity', 'reported_date', 'rollup_entry'
+    ).iterator())
+    for event in events:
+        event.rollup_entry = _rollup_entry(event)
+        period = date.fromisoformat(event.rollup_entry['period'])
+        for drug_a, drug_b, reaction in event.rollup_entry['keys']:
+            row = totals.setdefault((drug_a, drug_b, reaction, period), {'count': 0, 'mild': 0, 'moderate': 0, 'severe': 0})
+            row['count'] += 1
+            row[AdverseEventRollup.SEVERITY_FIELDS[event.severity]] += 1
+
+    with transaction.atomic():
+        AdverseEventRollup.objects.all().delete()
+        AdverseEventRollup.objects.bulk_create([
+            AdverseEventRollup(drug_a=drug_a, drug_b=drug_b, reaction=reaction, period=period, **row)
+            for (drug_a, drug_b, reaction, period), row in totals.items()
+        ], batch_size=1000)
+        AdverseEvent.objects.bulk_update(events, ['rollup_entry'], batch_size=1000)
+    return len(totals)
+
+def disproportionality(a: np.ndarray, drug_totals: np.ndarray, reaction_totals: np.ndarray, total: int) -> Dict[str, np.ndarray]:
+    """
+    PRR and ROR for every (drug, reaction) cell at once, from the 2x2 table
+    a = drug & reaction, b = drug & other reactions, c = other drugs & reaction,
+    d = everything else. Undefined ratios come out as NaN.
+    """
+    a = a.astype(float)
+    b = drug_totals - a
+    c = reaction_totals - a
+    d = total - a - b - c
+    with np.errstate(divide='ignore', invalid='ignore'):
+        prr = (a / (a + b)) / (c / (c + d))
+        ror = (a * d) / (b * c)
+        se = np.sqrt(1 / a + 1 / b + 1 / c + 1 / d)
+        ror_lower = np.exp(np.log(ror) - Z_95 * se)
+        ror_upper = np.exp(np.log(ror) + Z_95 * se)
+    finite = np.isfinite(prr) & np.isfinite(ror_lower)
+    signal = finite & (a >= SIGNAL_MIN_CASES) & (prr >= SIGNAL_MIN_PRR) & (ror_lower > 1)
+    return {'prr': prr, 'ror': ror, 'ror_lower': ror_lower, 'ror_upper': ror_upper, 'signal': signal}
+
+def _rounded(value) -> Optional[float]:
+    return round(float(value), 3) if np.isfinite(value) else None
+
+def signal_report(start: date, end: date, pairs: bool = False, min_count: int = 1) -> Dict:
+    """
+    Reaction counts, severity mix and disproportionality per drug (or drug
+    pair) over the weeks in [start, end], read from the rollup rows only.
+    """
+    # Whole weeks: every week that overlaps the window counts
+    rollups = AdverseEventRollup.objects.filter(period__gte=start - timedelta(days=start.weekday()), period__lte=end)
+    rollups = rollups.exclude(drug_b='') if pairs else rollups.filter(drug_b='')
+    rows = list(rollups.values_list('drug_a', 'drug_b', 'reaction').annotate(
+        n=Sum('count'), n_mild=Sum('mild'), n_moderate=Sum('moderate'), n_severe=Sum('severe')
+    ))
+    if not rows:
+        return {'signals': [], 'drugs': []}
+
+    drugs = np.array([f"{row[0]}\t{row[1]}" if pairs else row[0] for row in rows])
+    reactions = np.array([row[2] for row in rows])
+    counts = np.array([row[3] for row in rows], dtype=float)
+    severities = np.array([row[4:7] for row in rows], dtype=np.int64)
+
+    drug_names, drug_codes = np.unique(drugs, return_inverse=True)
+    _, reaction_codes = np.unique(reactions, return_inverse=True)
+    drug_totals = np.bincount(drug_codes, weights=counts)
+    reaction_totals = np.bincount(reaction_codes, weights=counts)
+    stats = disproportionality(counts, drug_totals[drug_codes], reaction_totals[reaction_codes], counts.sum())
+
+    signals = []
+    for i in np.argsort(-counts, kind='stable'):
+        if counts[i] < min_count:
+            continue
+        drug_a, drug_b, reaction = rows[i][:3]
+        signals.append({
+            'drug': drug_a,
+            **({'drug_b': drug_b} if pairs else {}),
+            'reaction': reaction,
+            'count': int(counts[i]),
+            'severity': dict(zip(('mild', 'moderate', 'severe'), severities[i].tolist())),
+            'prr': _rounded(stats['prr'][i]),
+            'ror': _rounded(stats['ror'][i]),
+            'ror_ci': [_rounded(stats['ror_lower'][i]), _rounded(stats['ror_upper'][i])],
+            'signal': bool(stats['signal'][i]),
+        })
+
+    severity_by_drug = np.zeros((len(drug_names), 3), dtype=np.int64)
+    np.add.at(severity_by_drug, drug_codes, severities)
+    drug_summary = []
+    for code in np.argsort(-drug_totals, kind='stable'):
+        drug_a, _, drug_b = str(drug_names[code]).partition('\t')
+        drug_summary.append({
+            'drug': drug_a,
+            **({'drug_b': drug_b} if pairs else {}),
+            'events': int(drug_totals[code]),
+            'severity': dict(zip(('mild', 'moderate', 'severe'), severity_by_drug[code].tolist())),
+        })
+    return {'signals': signals, 'drugs': drug_summary}
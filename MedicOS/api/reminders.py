@@ -0,0 +1,229 @@
+import asyncio
+import heapq
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import List, Optional, Set, Tuple
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils import timezone
+from core.models import DoseOccurrence, Medication
+from .schedule import ParsedSchedule, extend_dose_horizon, materialise_doses
+from .services import generate_voice_message, send_telegram_reminder
+
+logger = logging.getLogger(__name__)
+
+def build_reminder_message(medication: str, dosage: str, instructions: Optional[str] = None) -> str:
+    message = f"🔔 Medication Reminder\n\n"
+    message += f"Time to take: {medication}\n"
+    message += f"Dosage: {dosage}\n"
+    if instructions:
+        message += f"\nInstructions: {instructions}"
+    return message
+
+def voice_reminder_text(medication: str, dosage: str) -> str:
+    # Kept identical across days so the TTS cache can serve it
+    return f"Time to take {medication}. Dosage: {dosage}"
+
+def schedule_is_valid(schedule) -> bool:
+    parsed = ParsedSchedule.from_json(schedule)
+    return parsed is not None and bool(parsed.weekdays) and bool(len(parsed.minutes))
+
+def schedule_medication_reminders(medication: Medication, voice_reminder: bool = False, upcoming: int = 5) -> List[datetime]:
+    """
+    Make sure the medication's doses are materialised (the dispatcher picks
+    them up from there) and return the next ``upcoming`` reminder times.
+    """
+    if medication.voice_reminder != voice_reminder:
+        # A plain update: toggling voice is not an edit the save signals need to react to
+        Medication.objects.filter(pk=medication.pk).update(voice_reminder=voice_reminder)
+        medication.voice_reminder = voice_reminder
+    materialise_doses(medication)
+
+    return list(DoseOccurrence.objects.filter(
+        medication=medication,
+        scheduled_at__gte=timezone.now(),
+        reminder_sent_at__isnull=True
+    ).order_by('scheduled_at').values_list('scheduled_at', flat=True)[:upcoming])
+
+def upcoming_voice_reminders(start: datetime, end: datetime) -> Set[Tuple[str, str]]:
+    """Distinct (text, language) pairs of voice reminders due in [start, end)"""
+    rows = DoseOccurrence.objects.filter(
+        scheduled_at__gte=start,
+        scheduled_at__lt=end,
+        reminder_sent_at__isnull=True,
+        medication__voice_reminder=True
+    ).values_list('medication__name', 'medication__dosage', 'patient__language').distinct()
+    return {(voice_reminder_text(name, dosage), language) for name, dosage, language in rows}
+
+async def prerender_voice_reminders(reminders: Set[Tuple[str, str]], concurrency: int = 4) -> int:
+    """Synthesise reminder audio into the TTS cache ahead of time; returns how many rendered"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def render(text, language):
+        async with semaphore:
+            return await generate_voice_message(text, language) is not None
+
+    results = await asyncio.gather(*(render(text, language) for text, language in reminders))
+    return sum(results)
+
+def claim_doses(dose_ids: List[int]) -> Tuple[datetime, List[DoseOccurrence]]:
+    """
+    Atomically mark unsent doses as sent and return the ones this call won.
+    Claiming before sending means a crash or a second dispatcher can never
+    deliver the same reminder twice (a crash mid-send loses it instead).
+    """
+    claimed_at = timezone.now()
+    DoseOccurrence.objects.filter(
+        id__in=dose_ids,
+        reminder_sent_at__isnull=True
+    ).update(reminder_sent_at=claimed_at)
+    claimed = DoseOccurrence.objects.filter(
+        id__in=dose_ids,
+        reminder_sent_at=claimed_at
+    ).select_related('medication', 'patient')
+    return claimed_at, list(claimed)
+
+def release_doses(dose_ids: List[int], claimed_at: datetime):
+    """Undo a claim for reminders that could not be delivered so they are retried"""
+    DoseOccurrence.objects.filter(id__in=dose_ids, reminder_sent_at=claimed_at).update(reminder_sent_at=None)
+
+class ReminderDispatcher:
+    """
+    Single-process reminder scheduler.
+    Unsent doses due within the next REMINDER_LOOKAHEAD_MINUTES are kept in a
+    min-heap of (timestamp, dose id), reloaded from the DB at startup and every
+    REMINDER_REFRESH_SECONDS. Each refresh first rolls the dose horizon forward,
+    so medications without doses yet (created before doses were materialised,
+    or by bulk import) and the next day of every schedule get their rows. The loop sleeps until the earliest dose is due,
+    then claims and sends everything due in batches of REMINDER_BATCH_SIZE with
+    at most REMINDER_CONCURRENCY sends in flight. Doses more than
+    REMINDER_GRACE_MINUTES late (e.g. after downtime) are skipped.
+    """
+
+    def __init__(self):
+        self.lookahead = timedelta(minutes=settings.REMINDER_LOOKAHEAD_MINUTES)
+        self.grace = timedelta(minutes=settings.REMINDER_GRACE_MINUTES)
+        self.batch_size = settings.REMINDER_BATCH_SIZE
+        self.refresh_seconds = settings.REMINDER_REFRESH_SECONDS
+        self.concurrency = settings.REMINDER_CONCURRENCY
+        self._heap: List[Tuple[float, int]] = []
+        self._known: Set[int] = set()
+        self._stopped = asyncio.Event()
+        self.sent = 0
+        self.failed = 0
+
+    def __len__(self):
+        return len(self._heap)
+
+    def refresh(self, now: Optional[datetime] = None) -> int:
+        """Extend the dose horizon where it has fallen behind, then load(); returns load()'s count"""
+        try:
+            written = extend_dose_horizon()
+            if written:
+                logger.info(f"Materialised {written} doses")
+        except Exception as e:
+            # Doses already in the DB still go out
+            logger.error(f"Error extending the dose horizon: {str(e)}")
+        return self.load(now)
+
+    def load(self, now: Optional[datetime] = None) -> int:
+        """Add unsent doses in [now - grace, now + lookahead) to the heap; returns how many were new"""
+        now = now or timezone.now()
+        rows = DoseOccurrence.objects.filter(
+            reminder_sent_at__isnull=True,
+            scheduled_at__gte=now - self.grace,
+            scheduled_at__lt=now + self.lookahead,
+            patient__telegram_chat_id__isnull=False
+        ).exclude(patient__telegram_chat_id='').values_list('id', 'scheduled_at')
+
+        added = 0
+        for dose_id, scheduled_at in rows.iterator():
+            if dose_id not in self._known:
+                self._known.add(dose_id)
+                heapq.heappush(self._heap, (scheduled_at.timestamp(), dose_id))
+                added += 1
+        return added
+
+    def pop_due(self, now: Optional[datetime] = None) -> List[int]:
+        """Remove and return the ids of every dose due by ``now`` that is not too late"""
+        now = now or timezone.now()
+        due_by = now.timestamp()
+        too_late = (now - self.grace).timestamp()
+        due = []
+        while self._heap and self._heap[0][0] <= due_by:
+            scheduled, dose_id = heapq.heappop(self._heap)
+            self._known.discard(dose_id)
+            if scheduled >= too_late:
+                due.append(dose_id)
+            else:
+                logger.warning(f"Skipping reminder for dose {dose_id}: more than {self.grace} late")
+        return due
+
+    def seconds_until_next(self, now: Optional[datetime] = None) -> Optional[float]:
+        if not self._heap:
+            return None
+        return max(0.0, self._heap[0][0] - (now or timezone.now()).timestamp())
+
+    async def _send(self, dose: DoseOccurrence, semaphore: asyncio.Semaphore) -> bool:
+        medication = dose.medication
+        async with semaphore:
+            audio_file = None
+            if medication.voice_reminder:
+                audio_file = await generate_voice_message(
+                    voice_reminder_text(medication.name, medication.dosage),
+                    dose.patient.language
+                )
+            return await send_telegram_reminder(
+                chat_id=dose.patient.telegram_chat_id,
+                message=build_reminder_message(medication.name, medication.dosage),
+                audio_file=audio_file
+            )
+
+    async def dispatch(self, dose_ids: List[int]):
+        semaphore = asyncio.Semaphore(self.concurrency)
+        for offset in range(0, len(dose_ids), self.batch_size):
+            batch = dose_ids[offset:offset + self.batch_size]
+            claimed_at, doses = await sync_to_async(claim_doses)(batch)
+            if len(doses) < len(batch):
+                logger.info(f"{len(batch) - len(doses)} reminders were already sent or rescheduled")
+            if not doses:
+                continue
+
+            results = await asyncio.gather(
+                *(self._send(dose, semaphore) for dose in doses),
+                return_exceptions=True
+            )
+            failed = [dose.id for dose, ok in zip(doses, results) if ok is not True]
+            self.sent += len(doses) - len(failed)
+            self.failed += len(failed)
+            if failed:
+                # Back to unsent; the next refresh reloads them while still within the grace period
+                await sync_to_async(release_doses)(failed, claimed_at)
+                logger.error(f"Failed to send {len(failed)} of {len(doses)} reminders")
+
+    async def run(self):
+        next_refresh = 0.0
+        while not self._stopped.is_set():
+            if time.monotonic() >= next_refresh:
+                added = await sync_to_async(self.refresh)()
+                if added:
+                    logger.info(f"Loaded {added} upcoming reminders ({len(self)} pending)")
+                next_refresh = time.monotonic() + self.refresh_seconds
+
+            due = self.pop_due()
+            if due:
+                await self.dispatch(due)
+                continue
+
+            wait = next_refresh - time.monotonic()
+            until_next = self.seconds_until_next()
+            if until_next is not None:
+                wait = min(wait, until_next)
+            try:
+                await asyncio.wait_for(self._stopped.wait(), timeout=max(wait, 0.0))
+            except asyncio.TimeoutError:
+                pass
+
+    def stop(self):
+        self._stopped.set()
@@ -0,0 +1,208 @@
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from core.models import DoseOccurrence, Medication
+
+ONE_DAY = np.timedelta64(1, 'D')
+ONE_WEEK = np.timedelta64(7, 'D')
+EMPTY_DATES = np.array([], dtype='datetime64[D]')
+EMPTY_TIMES = np.array([], dtype='datetime64[m]')
+
+def _parse_date(value) -> Optional[date]:
+    if not value:
+        return None
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+def _parse_time(value: str) -> int:
+    """'HH:MM' -> minutes after midnight"""
+    hours, minutes = value.split(':')[:2]
+    return int(hours) * 60 + int(minutes)
+
+def _weekday(day: np.datetime64) -> int:
+    # 1970-01-01 was a Thursday; Monday == 0 like datetime.weekday()
+    return int((day.astype('int64') + 3) % 7)
+
+class ParsedSchedule:
+    """
+    Medication.schedule parsed once:
+    {'time': 'HH:MM' or 'times': ['HH:MM', ...], 'days': [0-6], 'startDate', 'endDate'}.
+    Occurrences are computed arithmetically, one 7-day stride per active
+    weekday, so cost follows the number of doses rather than days in range.
+    """
+
+    __slots__ = ('weekdays', 'minutes', 'start', 'end')
+
+    def __init__(self, weekdays: List[int], minutes: List[int], start: Optional[date] = None, end: Optional[date] = None):
+        self.weekdays = sorted(set(weekdays))
+        self.minutes = np.array(sorted(set(minutes)), dtype='timedelta64[m]')
+        self.start = start
+        self.end = end
+
+    @classmethod
+    def from_json(cls, schedule) -> Optional['ParsedSchedule']:
+        """None when the schedule is missing times or days or is malformed"""
+        if not isinstance(schedule, dict) or 'days' not in schedule:
+            return None
+        times = schedule.get('times') or ([schedule['time']] if schedule.get('time') else [])
+        try:
+            return cls(
+                weekdays=[int(day) for day in schedule['days'] if 0 <= int(day) <= 6],
+                minutes=[_parse_time(value) for value in times],
+                start=_parse_date(schedule.get('startDate')),
+                end=_parse_date(schedule.get('endDate'))
+            )
+        except (TypeError, ValueError):
+            return None
+
+    def dates(self, start: date, end: date) -> np.ndarray:
+        """Sorted datetime64[D] days in [start, end] on which a dose is due"""
+        first = np.datetime64(max(start, self.start) if self.start else start, 'D')
+        last = np.datetime64(min(end, self.end) if self.end else end, 'D')
+        if first > last or not self.weekdays:
+            return EMPTY_DATES
+
+        first_weekday = _weekday(first)
+        strides = [
+            np.arange(first + np.timedelta64((weekday - first_weekday) % 7, 'D'), last + ONE_DAY, ONE_WEEK)
+            for weekday in self.weekdays
+        ]
+        return np.sort(np.concatenate(strides))
+
+    def occurrences(self, start: date, end: date) -> np.ndarray:
+        """Sorted datetime64[m] dose times within [start, end] (whole days)"""
+        days = self.dates(start, end)
+        if not len(days) or not len(self.minutes):
+            return EMPTY_TIMES
+        return (days.astype('datetime64[m]')[:, None] + self.minutes[None, :]).ravel()
+
+
+def _aware(occurrences: np.ndarray) -> List[datetime]:
+    tz = timezone.get_default_timezone()
+    return [timezone.make_aware(value, tz) for value in occurrences.astype('datetime64[us]').tolist()]
+
+def horizon_end() -> date:
+    """Last day the rolling dose horizon should cover"""
+    return timezone.localdate() + timedelta(days=settings.DOSE_HORIZON_DAYS)
+
+def materialise_doses(medication: Medication, until: Optional[date] = None, not_before: Optional[datetime] = None) -> int:
+    """
+    Extend a medication's DoseOccurrence rows through ``until`` (default: the
+    rolling horizon), continuing from where the previous run stopped.
+    Returns the number of rows written.
+    """
+    until = until or horizon_end()
+    if medication.doses_until and medication.doses_until >= until:
+        return 0
+
+    schedule = ParsedSchedule.from_json(medication.schedule)
+    doses_from = medication.doses_from
+    if medication.doses_until:
+        first = medication.doses_until + timedelta(days=1)
+    else:
+        first = (schedule.start if schedule and schedule.start else None) or timezone.localdate(medication.created_at)
+        # A start beyond the horizon leaves an empty window right after ``until``
+        doses_from = min(first, until + timedelta(days=1))
+
+    doses = []
+    if schedule is not None and first <= until:
+        doses = [
+            DoseOccurrence(patient_id=medication.patient_id, medication=medication, scheduled_at=scheduled_at)
+            for scheduled_at in _aware(schedule.occurrences(first, until))
+            if not_before is None or scheduled_at >= not_before
+        ]
+    
+    with transaction.atomic():
+        DoseOccurrence.objects.bulk_create(doses, batch_size=1000, ignore_conflicts=True)
+        Medication.objects.filter(pk=medication.pk).update(doses_from=doses_from, doses_until=until)
+    medication.doses_from, medication.doses_until = doses_from, until
+    return len(doses)
+
+def rebuild_doses(medication: Medication) -> int:
+    """
+    Re-materialise after a schedule change: unsent future doses are replaced,
+    past doses stay as the history of the old schedule
+    """
+    now = timezone.now()
+    today = timezone.localdate()
+    with transaction.atomic():
+        DoseOccurrence.objects.filter(
+            medication=medication,
+            scheduled_at__gte=now,
+            reminder_sent_at__isnull=True
+        ).delete()
+        if medication.doses_until is not None:
+            # Continue from today; doses before now keep the old schedule
+            medication.doses_until = min(medication.doses_until, today - timedelta(days=1))
+            if medication.doses_from and medication.doses_from > medication.doses_until:
+                medication.doses_from = None
+                medication.doses_until = None
+        return materialise_doses(medication, not_before=now)
+
+def extend_dose_horizon(until: Optional[date] = None) -> int:
+    """Roll every medication's materialised window forward; run daily"""
+    until = until or horizon_end()
+    written = 0
+    stale = Medication.objects.filter(
+        Q(doses_until__isnull=True) | Q(doses_until__lt=until)
+    ).only('id', 'patient_id', 'schedule', 'created_at', 'doses_from', 'doses_until')
+    for medication in stale.iterator():
+        written += materialise_doses(medication, until)
+    return written
+
+def _local_starts(occurrences: np.ndarray) -> List[str]:
+    """
+    Engine wall times formatted the way materialised rows read back, so a
+    time inside a DST gap shifts exactly as it does once stored
+    """
+    if not len(occurrences):
+        return []
+    tz = timezone.get_default_timezone()
+    # Via the timestamp: astimezone() into the same zone would leave gap times as they are
+    return [
+        datetime.fromtimestamp(value.timestamp(), tz).strftime('%Y-%m-%dT%H:%M:%S')
+        for value in _aware(occurrences)
+    ]
+
+def schedule_events(medications: List[Medication], start: date, end: date) -> Dict[int, List[str]]:
+    """
+    Dose start times ('YYYY-MM-DDTHH:MM:SS', local time) per medication id in
+    [start, end]. The materialised window is answered by one indexed range scan
+    over (patient, scheduled_at); days outside it (far past, beyond the
+    horizon, not materialised yet) fall back to the recurrence engine.
+    Read-only: extending the window is left to the reminder dispatcher.
+    """
+    if not medications:
+        return {}
+
+    tz = timezone.get_default_timezone()
+    window_start = timezone.make_aware(datetime.combine(start, datetime.min.time()), tz)
+    window_end = timezone.make_aware(datetime.combine(end + timedelta(days=1), datetime.min.time()), tz)
+    events = {medication.id: [] for medication in medications}
+    rows = DoseOccurrence.objects.filter(
+        patient_id=medications[0].patient_id,
+        scheduled_at__gte=window_start,
+        scheduled_at__lt=window_end
+    ).order_by('scheduled_at').values_list('medication_id', 'scheduled_at')
+    for medication_id, scheduled_at in rows:
+        if medication_id in events:
+            events[medication_id].append(timezone.localtime(scheduled_at, tz).strftime('%Y-%m-%dT%H:%M:%S'))
+
+    for medication in medications:
+        schedule = ParsedSchedule.from_json(medication.schedule)
+        if schedule is None:
+            continue
+        if medication.doses_from is None or medication.doses_until is None:
+            events[medication.id] = _local_starts(schedule.occurrences(start, end))
+            continue
+        before, after = EMPTY_TIMES, EMPTY_TIMES
+        if start < medication.doses_from:
+            before = schedule.occurrences(start, min(end, medication.doses_from - timedelta(days=1)))
+        if end > medication.doses_until:
+            after = schedule.occurrences(max(start, medication.doses_until + timedelta(days=1)), end)
+        if len(before) or len(after):
+            events[medication.id] = _local_starts(before) + events[medication.id] + _local_starts(after)
+    return events
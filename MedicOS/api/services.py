@@ -1,80 +1,83 @@
-import os
-import io
-import requests
-import logging
-import hashlib
+import asyncio
+import random
+import threading
 import time
-import unicodedata
-import re
-import aiohttp
+import logging
 import json
 from typing import Optional, Dict, List
-from datetime import datetime
-from gtts import gTTS
-from telegram import Bot
+from datetime import timedelta
 from telegram.error import TelegramError
 from django.conf import settings
 from django.core.cache import cache
+from django.utils import timezone
 from django.utils.text import slugify
+from core.drug_index import canonical_drug_name
+from core.http_client import CircuitOpenError, ConcurrencyLimitError, UpstreamError, http_client
 from core.models import DrugInteraction
-from itertools import combinations
+from core.severity import classify_severity
+from .telegram_sender import telegram_sender
+from .tts_cache import get_tts_cache
 
 logger = logging.getLogger(__name__)
 
-def sanitize_drug_name(name):
-    """Normalize and sanitize drug names for API calls"""
-    # Normalize unicode characters (e.g., combining diacritical marks)
-    normalized = unicodedata.normalize('NFKD', name)
-    # Remove non-ASCII characters
-    ascii_name = normalized.encode('ASCII', 'ignore').decode()
-    # Clean up any double spaces and trim
-    cleaned = re.sub(r'\s+', ' ', ascii_name).strip()
-    return cleaned
+def deepseek_chat_url():
+    return f"{settings.DEEPSEEK_API_URL.rstrip('/')}/v1/chat/completions"
+
+# Interaction matrix fan-out limits
+INTERACTION_CONCURRENCY = 8  # Simultaneous DeepSeek calls
+INTERACTION_REQUEST_TIMEOUT = 10  # Seconds per HTTP attempt
+INTERACTION_PAIR_DEADLINE = 25  # Seconds per pair, retries included
+INTERACTION_MAX_RETRIES = 3
+INTERACTION_RETRY_BASE_DELAY = 1  # Seconds, doubled on every retry
+INTERACTION_FALLBACK_TTL = 300  # Seconds a fallback answer is cached after the upstream itself failed
+
+# Batch mode: many pairs answered by a single chat completion
+INTERACTION_BATCH_MAX_PAIRS = 45  # Keeps the JSON reply within the completion budget
+INTERACTION_BATCH_TOKENS_PER_PAIR = 80
+INTERACTION_BATCH_DEADLINE = 60  # Seconds per batch, retries included
+
+# Confidence recorded in the local knowledge base per finding source
+SOURCE_CONFIDENCE = {
+    'OpenFDA': 0.9,
+    'DeepSeek': 0.6,
+}
+
+# Alternatives cache (stale-while-revalidate)
+ALTERNATIVES_FRESH_FOR = 86400  # Served without refreshing for 24 hours
+ALTERNATIVES_STALE_FOR = 7 * 86400  # Then served stale while a refresh runs
+ALTERNATIVES_NEGATIVE_TTL = 300  # Errors and empty results are retried after 5 minutes
+
+FALLBACK_DESCRIPTION = 'Unable to fetch detailed interaction data. Please consult with your healthcare provider.'
+
+
+
+def canonical_pairs(drug_list):
+    """
+    Every unordered pair of distinct drugs in ``drug_list``, de-duplicated by
+    canonical name. Returns [(orig_a, orig_b)] in list order.
+    """
+    drugs = {}
+    for drug in drug_list:
+        drugs.setdefault(canonical_drug_name(drug), drug)
+    unique = list(drugs.values())
+    return [
+        (orig_a, orig_b)
+        for i, orig_a in enumerate(unique)
+        for orig_b in unique[i + 1:]
+    ]
 
 def calculate_severity(description):
     """Calculate interaction severity based on description content"""
-    description_lower = description.lower()
-    
-    high_risk_phrases = [
-        'severe', 'significant', 'dangerous', 'avoid', 'contraindicated',
-        'high risk', 'stop', 'do not', 'fatal', 'life-threatening'
-    ]
-    
-    medium_risk_phrases = [
-        'moderate', 'monitor', 'caution', 'may increase', 'watch for',
-        'be careful', 'adjust', 'consider'
-    ]
-    
-    if any(phrase in description_lower for phrase in high_risk_phrases):
-        return 3
-    elif any(phrase in description_lower for phrase in medium_risk_phrases):
-        return 2
-    return 1
+    return classify_severity(description)
 
 async def send_telegram_reminder(chat_id: str, message: str, audio_file: Optional[bytes] = None) -> bool:
     """
     Send a reminder message and optionally an audio file via Telegram
+    Delivery goes through the shared rate-limited send queue.
     Returns True if successful, False otherwise
     """
     try:
-        bot = Bot(token=settings.TELEGRAM_TOKEN)
-        
-        # Send text message
-        await bot.send_message(
-            chat_id=chat_id,
-            text=message,
-            parse_mode='HTML'
-        )
-        
-        # If audio file is provided, send it
-        if audio_file:
-            await bot.send_voice(
-                chat_id=chat_id,
-                voice=audio_file,
-                caption="Voice reminder"
-            )
-        
-        return True
+        return await telegram_sender.send(chat_id, message, audio_file)
     except TelegramError as e:
         logger.error(f"Telegram error: {str(e)}")
         return False
@@ -82,123 +85,173 @@ async def send_telegram_reminder(chat_id: str, message: str, audio_file: Optiona
         logger.error(f"Error sending Telegram message: {str(e)}")
         return False
 
+async def _synthesize_marytts(text: str, lang: str) -> Optional[bytes]:
+    params = {
+        'INPUT_TYPE': 'TEXT',
+        'OUTPUT_TYPE': 'AUDIO',
+        'LOCALE': lang,
+        'INPUT_TEXT': text,
+        'AUDIO': 'WAVE'
+    }
+    response = await http_client.request("POST", settings.MARYTTS_URL, data=params)
+    return response.body if response.status == 200 else None
+
+async def _synthesize_voicerss(text: str, lang: str) -> Optional[bytes]:
+    # VoiceRSS offers a free tier
+    if not settings.VOICERSS_API_KEY:
+        return None
+    params = {
+        'key': settings.VOICERSS_API_KEY,
+        'hl': lang,
+        'src': text,
+        'c': 'WAV',
+        'f': '16khz_16bit_mono'
+    }
+    response = await http_client.request("GET", "https://api.voicerss.org/", params=params)
+    return response.body if response.status == 200 else None
+
+# (engine, audio format, synthesiser) in order of preference
+TTS_ENGINES = (
+    ('marytts', 'wave', _synthesize_marytts),
+    ('voicerss', 'wav_16khz_16bit_mono', _synthesize_voicerss),
+)
+
 async def generate_voice_message(text: str, lang: str = 'en') -> Optional[bytes]:
     """
     Generate voice message using various TTS services with fallback options
+    Audio is served from the content-addressed TTS cache when any engine
+    has rendered this text before.
     Returns audio file bytes if successful, None otherwise
     """
-    try:
-        # First try MaryTTS
-        marytts_url = settings.MARYTTS_URL
-        
-        params = {
-            'INPUT_TYPE': 'TEXT',
-            'OUTPUT_TYPE': 'AUDIO',
-            'LOCALE': lang,
-            'INPUT_TEXT': text,
-            'AUDIO': 'WAVE'
-        }
-        
+    tts_cache = get_tts_cache()
+    for engine, audio_format, _ in TTS_ENGINES:
+        audio = await tts_cache.aget(text, lang, engine, audio_format)
+        if audio:
+            return audio
+
+    for engine, audio_format, synthesize in TTS_ENGINES:
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(marytts_url, data=params) as response:
-                    if response.status == 200:
-                        return await response.read()
-        except Exception as marytts_error:
-            logger.warning(f"MaryTTS error, trying fallback: {str(marytts_error)}")
-            
-        # Fallback to VoiceRSS (they offer free tier)
-        voice_rss_key = settings.VOICERSS_API_KEY
-        if voice_rss_key:
-            voice_rss_url = "https://api.voicerss.org/"
-            params = {
-                'key': voice_rss_key,
-                'hl': lang,
-                'src': text,
-                'c': 'WAV',
-                'f': '16khz_16bit_mono'
-            }
-            
-            async with aiohttp.ClientSession() as session:
-                async with session.get(voice_rss_url, params=params) as response:
-                    if response.status == 200:
-                        return await response.read()
-        
-        # If both services fail, log warning and return None
-        logger.warning("All TTS services failed, sending text-only notification")
-        return None
-                    
-    except Exception as e:
-        logger.error(f"Error generating voice message: {str(e)}")
-        return None
+            audio = await synthesize(text, lang)
+        except Exception as e:
+            logger.warning(f"{engine} TTS error, trying fallback: {str(e)}")
+            continue
+        if audio:
+            await tts_cache.aput(text, lang, engine, audio_format, audio)
+            return audio
+
+    # If all services fail, log warning and return None
+    logger.warning("All TTS services failed, sending text-only notification")
+    return None
 
 async def get_alternative_drugs(drug_name: str, conditions: Optional[List[str]] = None) -> Dict:
     """
-    Get alternative drug suggestions using FDA API first, fallback to cached data
+    Get alternative drug suggestions using FDA API first, DeepSeek as fallback.
+    Cached stale-while-revalidate: an expired value is returned immediately
+    while one background refresh per drug replaces it.
     """
     cache_key = f"alt_drugs_{slugify(drug_name)}_{slugify('_'.join(conditions or []))}"
-    cached_result = cache.get(cache_key)
+    entry = await cache.aget(cache_key)
     
-    if cached_result:
-        return cached_result
+    if isinstance(entry, dict) and 'fresh_until' in entry:
+        if entry['fresh_until'] <= time.time():
+            _refresh_alternatives(cache_key, drug_name, conditions)
+        return entry['value']
+
+    # Shielded: the refresh is shared, so one caller going away must not cancel it for the rest
+    return await asyncio.shield(asyncio.wrap_future(_refresh_alternatives(cache_key, drug_name, conditions)))
 
+_alternative_refreshes = {}
+_alternative_refreshes_lock = threading.Lock()
+
+def _refresh_alternatives(cache_key: str, drug_name: str, conditions: Optional[List[str]]):
+    """
+    Single-flight refresh on the shared HTTP loop: concurrent misses or stale
+    hits for the same key all share one upstream fetch
+    """
+    with _alternative_refreshes_lock:
+        future = _alternative_refreshes.get(cache_key)
+        if future is None:
+            future = http_client.submit(_fetch_alternatives(cache_key, drug_name, conditions))
+            _alternative_refreshes[cache_key] = future
+
+            def forget(_):
+                with _alternative_refreshes_lock:
+                    _alternative_refreshes.pop(cache_key, None)
+            future.add_done_callback(forget)
+    return future
+
+async def _fetch_alternatives(cache_key: str, drug_name: str, conditions: Optional[List[str]]) -> Dict:
     try:
         # First try FDA API
-        fda_alternatives = await _get_fda_alternatives(drug_name)
-        if (fda_alternatives):
-            cache.set(cache_key, fda_alternatives, timeout=86400)  # Cache for 24 hours
-            return fda_alternatives
-            
+        result = await _get_fda_alternatives(drug_name)
+        
         # Fallback to DeepSeek if FDA fails
-        if settings.DEEPSEEK_API_KEY:
-            return await _get_deepseek_alternatives(drug_name, conditions)
+        if not result and settings.DEEPSEEK_API_KEY:
+            result = await _get_deepseek_alternatives(drug_name, conditions)
             
-        return {
-            "status": "error",
-            "message": "No alternative suggestions available"
-        }
+        if not result:
+            result = {
+                "status": "error",
+                "message": "No alternative suggestions available"
+            }
         
     except Exception as e:
         logger.error(f"Error getting alternative drugs: {str(e)}")
-        return {
+        result = {
             "status": "error",
             "message": f"Error fetching alternatives: {str(e)}"
         }
 
+    now = time.time()
+    if result.get('status') == 'success' and result.get('alternatives'):
+        await cache.aset(cache_key, {'value': result, 'fresh_until': now + ALTERNATIVES_FRESH_FOR},
+                         timeout=ALTERNATIVES_FRESH_FOR + ALTERNATIVES_STALE_FOR)
+        return result
+
+    previous = await cache.aget(cache_key)
+    if isinstance(previous, dict) and previous.get('value', {}).get('status') == 'success':
+        # Keep serving the last good answer; try again after the negative TTL
+        previous['fresh_until'] = now + ALTERNATIVES_NEGATIVE_TTL
+        await cache.aset(cache_key, previous, timeout=ALTERNATIVES_NEGATIVE_TTL + ALTERNATIVES_STALE_FOR)
+        return previous['value']
+
+    await cache.aset(cache_key, {'value': result, 'fresh_until': now + ALTERNATIVES_NEGATIVE_TTL},
+                     timeout=ALTERNATIVES_NEGATIVE_TTL)
+    return result
+
 async def _get_fda_alternatives(drug_name: str) -> Optional[Dict]:
     """
     Get alternative drugs from FDA API
     """
-    if not settings.OPENFDA_KEY:
+    if not settings.OPENFDA_API_KEY:
         return None
         
     try:
-        url = "https://api.fda.gov/drug/ndc.json"
+        url = f"{settings.OPENFDA_API_URL.rstrip('/')}/drug/ndc.json"
         params = {
-            "api_key": settings.OPENFDA_KEY,
+            "api_key": settings.OPENFDA_API_KEY,
             "search": f"generic_name:{drug_name}",
             "limit": 5
         }
         
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, params=params) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    alternatives = []
-                    
-                    for result in data.get('results', []):
-                        if 'generic_name' in result:
-                            alternatives.append({
-                                'name': result['generic_name'],
-                                'brand_name': result.get('brand_name', ''),
-                                'manufacturer': result.get('labeler_name', ''),
-                                'source': 'FDA'
-                            })
-                    
-                    return {
-                        "status": "success",
-                        "alternatives": alternatives
-                    }
+        response = await http_client.request("GET", url, params=params)
+        if response.status == 200:
+            data = response.json()
+            alternatives = []
+            
+            for result in data.get('results', []):
+                if 'generic_name' in result:
+                    alternatives.append({
+                        'name': result['generic_name'],
+                        'brand_name': result.get('brand_name', ''),
+                        'manufacturer': result.get('labeler_name', ''),
+                        'source': 'FDA'
+                    })
+            
+            return {
+                "status": "success",
+                "alternatives": alternatives
+            }
                     
         return None
         
@@ -215,35 +268,35 @@ async def _get_deepseek_alternatives(drug_name: str, conditions: Optional[List[s
         if conditions:
             prompt += f" considering these conditions: {', '.join(conditions)}"
         
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                "https://api.deepseek.com/v1/chat/completions",
-                headers={
-                    "Authorization": f"Bearer {settings.DEEPSEEK_API_KEY}",
-                    "Content-Type": "application/json"
-                },
-                json={
-                    "model": "deepseek-chat",
-                    "messages": [{"role": "user", "content": prompt}],
-                    "max_tokens": 150
-                }
-            ) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    suggestions = data['choices'][0]['message']['content']
-                    
-                    return {
-                        "status": "success",
-                        "alternatives": [{
-                            "name": suggestion.strip(),
-                            "source": "DeepSeek"
-                        } for suggestion in suggestions.split(',')]
-                    }
-                else:
-                    return {
-                        "status": "error",
-                        "message": "Failed to get alternatives from DeepSeek"
-                    }
+        response = await http_client.request(
+            "POST",
+            deepseek_chat_url(),
+            headers={
+                "Authorization": f"Bearer {settings.DEEPSEEK_API_KEY}",
+                "Content-Type": "application/json"
+            },
+            json={
+                "model": "deepseek-chat",
+                "messages": [{"role": "user", "content": prompt}],
+                "max_tokens": 150
+            }
+        )
+        if response.status == 200:
+            data = response.json()
+            suggestions = data['choices'][0]['message']['content']
+            
+            return {
+                "status": "success",
+                "alternatives": [{
+                    "name": suggestion.strip(),
+                    "source": "DeepSeek"
+                } for suggestion in suggestions.split(',')]
+            }
+        else:
+            return {
+                "status": "error",
+                "message": "Failed to get alternatives from DeepSeek"
+            }
                     
     except Exception as e:
         logger.error(f"DeepSeek API error: {str(e)}")
@@ -252,100 +305,298 @@ async def _get_deepseek_alternatives(drug_name: str, conditions: Optional[List[s
             "message": str(e)
         }
 
-def check_drug_interactions(drug_list):
-    """Check drug interactions using DeepSeek API"""
-    if not drug_list or len(drug_list) < 2:
-        return []
-    
-    # Sanitize drug names while preserving original names
-    drug_pairs = [(drug, sanitize_drug_name(drug)) for drug in drug_list]
-    cache_key = f"drug_int_{'_'.join(sorted([pair[1] for pair in drug_pairs]))}"
-    
-    cached_result = cache.get(cache_key)
-    if (cached_result):
-        return cached_result
+def _pair_cache_key(clean_a, clean_b):
+    return f"drug_pair_{min(clean_a, clean_b)}_{max(clean_a, clean_b)}"
+
+def _fallback_interaction(orig_a, orig_b):
+    return {
+        'drugs': [orig_a, orig_b],
+        'description': FALLBACK_DESCRIPTION,
+        'severity': 2,
+        'source': 'Fallback'
+    }
+
+def _interaction_from_record(record: DrugInteraction, orig_a, orig_b):
+    return {
+        'drugs': [orig_a, orig_b],
+        'description': record.description,
+        'severity': record.severity,
+        'source': record.source
+    }
+
+def _persist_interactions(findings: List[tuple]):
+    """Write-through of upstream findings, given as (clean_a, clean_b, interaction)"""
+    try:
+        DrugInteraction.objects.record([
+            {
+                'drug_a': clean_a,
+                'drug_b': clean_b,
+                'severity': interaction['severity'],
+                'description': interaction['description'],
+                'source': interaction['source'],
+                'confidence_score': SOURCE_CONFIDENCE.get(interaction['source'], 0.0)
+            }
+            for clean_a, clean_b, interaction in findings
+            if interaction['source'] != 'Fallback'
+        ])
+    except Exception as e:
+        logger.error(f"Failed to persist drug interactions: {str(e)}")
+
+def _build_interaction(orig_a, orig_b, description):
+    return {
+        'drugs': [orig_a, orig_b],
+        'description': description,
+        'severity': calculate_severity(description),
+        'source': 'DeepSeek'
+    }
+
+async def _deepseek_chat(prompt: str, max_tokens: int) -> str:
+    """Run one DeepSeek chat completion, retrying with jittered exponential backoff"""
+    for attempt in range(INTERACTION_MAX_RETRIES):
+        try:
+            response = await http_client.request(
+                "POST",
+                deepseek_chat_url(),
+                headers={
+                    "Authorization": f"Bearer {settings.DEEPSEEK_API_KEY}",
+                    "Content-Type": "application/json",
+                },
+                json={
+                    "model": "deepseek-chat",
+                    "messages": [{"role": "user", "content": prompt}],
+                    "max_tokens": max_tokens,
+                    "temperature": 0.1
+                },
+                timeout=INTERACTION_REQUEST_TIMEOUT
+            )
+            response.raise_for_status()
+            data = response.json()
+
+            if not data or 'choices' not in data:
+                raise ValueError("DeepSeek response has no choices")
+
+            return data['choices'][0]['message']['content'].strip()
+
+        except (CircuitOpenError, ConcurrencyLimitError):
+            # Rejected locally; retrying against an open breaker or a full queue only burns the deadline
+            raise
+        except Exception as e:
+            # A 4xx other than 429 (bad key, bad request) fails the same way every time
+            client_error = isinstance(e, UpstreamError) and e.status is not None and 400 <= e.status < 500 and e.status != 429
+            if client_error or attempt == INTERACTION_MAX_RETRIES - 1:
+                raise
+            # Full jitter keeps concurrent retries from hitting the API in lockstep
+            delay = INTERACTION_RETRY_BASE_DELAY * (2 ** attempt)
+            await asyncio.sleep(random.uniform(delay / 2, delay * 1.5))
+
+async def _request_pair_interaction(orig_a: str, orig_b: str) -> Dict:
+    """Ask DeepSeek about a single drug pair"""
+    prompt = (
+        f"What are the specific clinical concerns when taking {orig_a} and {orig_b} together?\n"
+        "Focus ONLY on:\n"
+        "1. Direct interaction risks\n"
+        "2. Clear recommendation\n"
+        "Keep it under 2 sentences. Avoid general drug descriptions."
+    )
+    description = await _deepseek_chat(prompt, max_tokens=100)
+    return _build_interaction(orig_a, orig_b, description)
+
+async def _fetch_pair_interaction(semaphore: asyncio.Semaphore, orig_a: str, orig_b: str) -> Optional[Dict]:
+    """
+    Fetch one pair under the shared concurrency limit and per-pair deadline.
+    None when the call was rejected locally (open circuit, concurrency queue
+    full), which says nothing about the pair and must not be cached.
+    """
+    async with semaphore:
+        try:
+            return await asyncio.wait_for(
+                _request_pair_interaction(orig_a, orig_b),
+                timeout=INTERACTION_PAIR_DEADLINE
+            )
+        except (CircuitOpenError, ConcurrencyLimitError) as e:
+            logger.warning(f"Interaction lookup for {orig_a} and {orig_b} rejected locally: {str(e)}")
+            return None
+        except Exception as e:
+            logger.error(f"API error for {orig_a} and {orig_b}: {type(e).__name__} {str(e)}")
+            return _fallback_interaction(orig_a, orig_b)
+
+async def _fetch_pair_interactions(pairs: List[tuple]) -> List[Optional[Dict]]:
+    """Fan out all pairs concurrently; results keep the order of ``pairs``"""
+    semaphore = asyncio.Semaphore(INTERACTION_CONCURRENCY)
+    return await asyncio.gather(*(
+        _fetch_pair_interaction(semaphore, orig_a, orig_b) for orig_a, orig_b in pairs
+    ))
+
+def _parse_batch_interactions(content: str, pairs: List[tuple]) -> Dict[tuple, Dict]:
+    """
+    Split a batch reply back into per-pair findings.
+    Returns {(orig_a, orig_b): interaction} for every requested pair the reply covered.
+    """
+    # Tolerate markdown code fences or prose around the JSON array
+    start, end = content.find('['), content.rfind(']')
+    if start == -1 or end <= start:
+        raise ValueError("Batch response contains no JSON array")
+    findings = json.loads(content[start:end + 1])
+
+    requested = {}
+    for orig_a, orig_b in pairs:
+        names = frozenset((canonical_drug_name(orig_a), canonical_drug_name(orig_b)))
+        requested[names] = (orig_a, orig_b)
+
+    parsed = {}
+    for finding in findings:
+        if not isinstance(finding, dict):
+            continue
+        description = str(finding.get('description') or '').strip()
+        names = frozenset((
+            canonical_drug_name(str(finding.get('drug_a', ''))),
+            canonical_drug_name(str(finding.get('drug_b', '')))
+        ))
+        pair = requested.get(names)
+        if pair and description:
+            parsed[pair] = _build_interaction(pair[0], pair[1], description)
+    return parsed
+
+async def _request_batch_interactions(pairs: List[tuple]) -> Dict[tuple, Dict]:
+    """Ask DeepSeek about many drug pairs in one structured prompt"""
+    drugs = list(dict.fromkeys(drug for pair in pairs for drug in pair))
+    prompt = (
+        "You are checking a patient's medication list for drug-drug interactions.\n"
+        f"Medications: {json.dumps(drugs)}\n"
+        f"Pairs to assess: {json.dumps([list(pair) for pair in pairs])}\n"
+        "For EVERY pair, describe the specific clinical concerns when both are taken together, "
+        "focusing ONLY on direct interaction risks and a clear recommendation, in under 2 sentences. "
+        "Avoid general drug descriptions.\n"
+        "Respond with ONLY a JSON array, one object per pair, using the medication names exactly as given:\n"
+        '[{"drug_a": "<name>", "drug_b": "<name>", "description": "<text>"}]'
+    )
+    content = await _deepseek_chat(
+        prompt, max_tokens=INTERACTION_BATCH_TOKENS_PER_PAIR * len(pairs) + 50
+    )
+    return _parse_batch_interactions(content, pairs)
+
+async def _fetch_batch_interactions(pairs: List[tuple]) -> Dict[tuple, Dict]:
+    """Resolve pairs with as few batch prompts as possible; failed batches yield nothing"""
+    chunks = [
+        pairs[i:i + INTERACTION_BATCH_MAX_PAIRS]
+        for i in range(0, len(pairs), INTERACTION_BATCH_MAX_PAIRS)
+    ]
+    results = await asyncio.gather(*(
+        asyncio.wait_for(_request_batch_interactions(chunk), timeout=INTERACTION_BATCH_DEADLINE)
+        for chunk in chunks
+    ), return_exceptions=True)
+
+    found = {}
+    for result in results:
+        if isinstance(result, Exception):
+            logger.warning(f"Batch interaction request failed: {type(result).__name__} {str(result)}")
+            continue
+        found.update(result)
+    return found
+
+async def _fetch_interactions(pairs: List[tuple], batch: bool) -> List[Optional[Dict]]:
+    """
+    Resolve pairs via batch prompts first (when enabled), then fall back to
+    concurrent per-pair calls for whatever the batch reply left out.
+    Pairs rejected locally come back as None.
+    """
+    found = {}
+    if batch and len(pairs) > 1:
+        found = await _fetch_batch_interactions(pairs)
+
+    missing = [pair for pair in pairs if pair not in found]
+    if missing:
+        logger.info(f"Fetching {len(missing)} of {len(pairs)} interaction pairs individually")
+        found.update(zip(missing, await _fetch_pair_interactions(missing)))
+
+    return [found[pair] for pair in pairs]
+
+def get_pair_interactions(pairs, batch: Optional[bool] = None):
+    """
+    Resolve interactions for explicit (drug_a, drug_b) pairs.
+    Pairs are answered from the per-pair cache, then from the knowledge base with
+    a single bulk query, and whatever is left goes upstream in one engine call.
+    With ``batch`` (defaults to settings.DEEPSEEK_BATCH_INTERACTIONS) upstream
+    pairs are sent in a single prompt instead of one call per pair.
+    """
+    if batch is None:
+        batch = settings.DEEPSEEK_BATCH_INTERACTIONS
 
     interactions = []
+    pending = []  # (position in interactions, orig_a, orig_b, clean_a, clean_b)
     
-    for i, (orig_a, clean_a) in enumerate(drug_pairs):
-        for orig_b, clean_b in drug_pairs[i+1:]:
-            try:
-                # Use cleaned names for cache key
-                pair_key = f"drug_pair_{min(clean_a, clean_b)}_{max(clean_a, clean_b)}"
-                cached_pair = cache.get(pair_key)
-                
-                if cached_pair:
-                    # Update with original drug names
-                    cached_pair['drugs'] = [orig_a, orig_b]
-                    interactions.append(cached_pair)
-                    continue
-                
-                prompt = (
-                    f"What are the specific clinical concerns when taking {orig_a} and {orig_b} together?\n"
-                    "Focus ONLY on:\n"
-                    "1. Direct interaction risks\n"
-                    "2. Clear recommendation\n"
-                    "Keep it under 2 sentences. Avoid general drug descriptions."
-                )
-                
-                max_retries = 3
-                retry_delay = 2
-                
-                for attempt in range(max_retries):
-                    try:
-                        response = requests.post(
-                            "https://api.deepseek.com/v1/chat/completions",
-                            headers={
-                                "Authorization": f"Bearer {settings.DEEPSEEK_API_KEY}",
-                                "Content-Type": "application/json",
-                            },
-                            json={
-                                "model": "deepseek-chat",
-                                "messages": [{"role": "user", "content": prompt}],
-                                "max_tokens": 100,
-                                "temperature": 0.1
-                            },
-                            timeout=10
-                        )
-                        
-                        response.raise_for_status()
-                        data = response.json()
-                        
-                        if data and 'choices' in data:
-                            description = data['choices'][0]['message']['content'].strip()
-                            severity = calculate_severity(description)
-                            
-                            interaction = {
-                                'drugs': [orig_a, orig_b],
-                                'description': description,
-                                'severity': severity,
-                                'source': 'DeepSeek'
-                            }
-                            
-                            cache.set(pair_key, interaction, timeout=3600)
-                            interactions.append(interaction)
-                            break
-                            
-                    except Exception as e:
-                        if attempt < max_retries - 1:
-                            time.sleep(retry_delay)
-                            continue
-                        
-                        logger.error(f"API error for {orig_a} and {orig_b}: {str(e)}")
-                        interaction = {
-                            'drugs': [orig_a, orig_b],
-                            'description': 'Unable to fetch detailed interaction data. Please consult with your healthcare provider.',
-                            'severity': 2,
-                            'source': 'Fallback'
-                        }
-                        cache.set(pair_key, interaction, timeout=1800)
-                        interactions.append(interaction)
-                        
-            except Exception as e:
-                logger.error(f"Unexpected error processing {orig_a} and {orig_b}: {str(e)}")
+    for orig_a, orig_b in pairs:
+        clean_a, clean_b = canonical_drug_name(orig_a), canonical_drug_name(orig_b)
+        cached_pair = cache.get(_pair_cache_key(clean_a, clean_b))
+        
+        if cached_pair:
+            # Update with original drug names
+            cached_pair['drugs'] = [orig_a, orig_b]
+            interactions.append(cached_pair)
+        else:
+            pending.append((len(interactions), orig_a, orig_b, clean_a, clean_b))
+            interactions.append(None)
+    
+    if pending:
+        # The local knowledge base answers known pairs; upstream only refreshes
+        # pairs that are missing or older than INTERACTION_KB_MAX_AGE
+        known = DrugInteraction.objects.lookup((clean_a, clean_b) for _, _, _, clean_a, clean_b in pending)
+        refresh_before = timezone.now() - timedelta(seconds=settings.INTERACTION_KB_MAX_AGE)
+        stale = {}
+        to_fetch = []
+        
+        for entry in pending:
+            position, orig_a, orig_b, clean_a, clean_b = entry
+            record = known.get(tuple(sorted((clean_a, clean_b))))
+            if record is None:
+                to_fetch.append(entry)
                 continue
+            interaction = _interaction_from_record(record, orig_a, orig_b)
+            if record.last_updated >= refresh_before:
+                cache.set(_pair_cache_key(clean_a, clean_b), interaction, timeout=3600)
+                interactions[position] = interaction
+            else:
+                stale[position] = interaction
+                to_fetch.append(entry)
+        
+        if to_fetch:
+            upstream_pairs = [(orig_a, orig_b) for _, orig_a, orig_b, _, _ in to_fetch]
+            if http_client.circuit_open(deepseek_chat_url()):
+                # DeepSeek is failing: answer from known or fallback records without queueing doomed calls
+                logger.warning(f"DeepSeek circuit open, skipping {len(upstream_pairs)} interaction lookups")
+                results = [None] * len(upstream_pairs)
+            else:
+                try:
+                    results = http_client.run(_fetch_interactions(upstream_pairs, batch))
+                except Exception as e:
+                    logger.error(f"Unexpected error fetching interactions: {str(e)}")
+                    results = [None] * len(upstream_pairs)
+            
+            findings = []
+            for (position, orig_a, orig_b, clean_a, clean_b), interaction in zip(to_fetch, results):
+                if interaction is None:
+                    # Nothing was learnt about the pair: answer this request only, cache nothing
+                    interactions[position] = stale.get(position) or _fallback_interaction(orig_a, orig_b)
+                    continue
+                if interaction['source'] == 'Fallback':
+                    # An outdated known finding beats the generic fallback text
+                    interaction = stale.get(position, interaction)
+                    timeout = INTERACTION_FALLBACK_TTL
+                else:
+                    findings.append((clean_a, clean_b, interaction))
+                    timeout = 3600
+                cache.set(_pair_cache_key(clean_a, clean_b), interaction, timeout=timeout)
+                interactions[position] = interaction
+            
+            _persist_interactions(findings)
     
-    if interactions:
-        cache.set(cache_key, interactions, timeout=3600)
+    return interactions
+
+def check_drug_interactions(drug_list, batch: Optional[bool] = None):
+    """Check drug interactions for every pair in ``drug_list`` (see get_pair_interactions)"""
+    if not drug_list or len(drug_list) < 2:
+        return []
     
-    return interactions
\ No newline at end of file
+    # No whole-list cache: every pair is cached individually, so a changed
+    # list only pays for the pairs it has not seen before
+    return get_pair_interactions(canonical_pairs(drug_list), batch=batch)
@@ -0,0 +1,43 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from core.models import AdverseEvent, Medication
+from .pharmacovigilance import forget_adverse_event, record_adverse_event
+from .schedule import materialise_doses, rebuild_doses
+from .tasks import check_new_medication_interactions, mark_interactions_stale, update_patient_interactions
+from .worker import enqueue
+
+@receiver(pre_save, sender=Medication)
+def medication_saving(sender, instance, update_fields=None, **kwargs):
+    # Doses only need rebuilding when the schedule itself changed, not on name/dosage edits
+    if instance.pk is None or (update_fields is not None and 'schedule' not in update_fields):
+        instance._schedule_changed = False
+        return
+    previous = Medication.objects.filter(pk=instance.pk).values_list('schedule', flat=True).first()
+    instance._schedule_changed = previous != instance.schedule
+
+@receiver(post_save, sender=Medication)
+def medication_saved(sender, instance, created, **kwargs):
+    mark_interactions_stale(instance.patient_id)
+    if created:
+        transaction.on_commit(lambda: materialise_doses(instance))
+        transaction.on_commit(
+            lambda: enqueue(check_new_medication_interactions, instance.patient_id, instance.name)
+        )
+    else:
+        if getattr(instance, '_schedule_changed', True):
+            transaction.on_commit(lambda: rebuild_doses(instance))
+        transaction.on_commit(lambda: enqueue(update_patient_interactions, instance.patient_id))
+
+@receiver(post_delete, sender=Medication)
+def medication_deleted(sender, instance, **kwargs):
+    mark_interactions_stale(instance.patient_id)
+    transaction.on_commit(lambda: enqueue(update_patient_interactions, instance.patient_id))
+
+@receiver(post_save, sender=AdverseEvent)
+def adverse_event_saved(sender, instance, created, **kwargs):
+    record_adverse_event(instance)
+
+@receiver(post_delete, sender=AdverseEvent)
+def adverse_event_deleted(sender, instance, **kwargs):
+    forget_adverse_event(instance)
@@ -1,37 +1,157 @@
 from django.core.cache import cache
+from django.utils import timezone
 from core.models import Patient, Medication
-from .services import check_drug_interactions
+from .schedule import materialise_doses
+from .services import canonical_drug_name, canonical_pairs, get_pair_interactions
+from .worker import enqueue, worker
 import logging
+import uuid
 
 logger = logging.getLogger(__name__)
 
+REPORT_TIMEOUT = 86400  # Reports are refreshed on every medication change, not by expiry
+
+def _report_key(patient_id):
+    return f"patient_{patient_id}_interactions"
+
+def _version_key(patient_id):
+    return f"patient_{patient_id}_interactions_version"
+
+def _import_key(patient_id, job_id):
+    return f"patient_{patient_id}_import_{job_id}"
+
+def _current_version(patient_id):
+    return cache.get(_version_key(patient_id), 0)
+
+def mark_interactions_stale(patient_id):
+    """Bump the patient's medication version so the stored report reads as stale"""
+    key = _version_key(patient_id)
+    cache.add(key, 0, timeout=None)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Evicted between add and incr
+        cache.set(key, 1, timeout=None)
+        return 1
+
+def get_interaction_report(patient_id):
+    """
+    Precomputed interaction report for a patient, or None if none exists yet.
+    The report carries 'stale' when medications changed after it was computed.
+    """
+    report = cache.get(_report_key(patient_id))
+    if report is None:
+        return None
+    report['stale'] = report['version'] < _current_version(patient_id)
+    return report
+
+def _store_report(patient_id, version, medications, interactions):
+    cache.set(_report_key(patient_id), {
+        'interactions': interactions,
+        'medications': medications,
+        'computed_at': timezone.now().isoformat(),
+        'version': version
+    }, timeout=REPORT_TIMEOUT)
+
+def _patch_interactions(report, med_names):
+    """
+    Bring a stored report in line with the current medication list.
+    Pairs involving removed drugs are dropped, only pairs touching added drugs
+    (plus earlier fallbacks) are fetched, and everything else is kept as is.
+    Returns (medications, interactions) where medications maps canonical name
+    to the name as entered.
+    """
+    medications = {}
+    for name in med_names:
+        medications.setdefault(canonical_drug_name(name), name)
+
+    previous = report.get('medications', {}) if report else {}
+    kept = {}
+    for interaction in (report or {}).get('interactions', []):
+        drugs = frozenset(canonical_drug_name(drug) for drug in interaction['drugs'])
+        if drugs <= medications.keys() and interaction['source'] != 'Fallback':
+            kept[drugs] = interaction
+
+    new_pairs = [
+        pair for pair in canonical_pairs(med_names)
+        if frozenset(canonical_drug_name(drug) for drug in pair) not in kept
+    ]
+    if new_pairs:
+        added = [name for key, name in medications.items() if key not in previous]
+        logger.info(f"Fetching {len(new_pairs)} interaction pairs for {len(added)} added medications")
+        fetched = get_pair_interactions(new_pairs)
+    else:
+        fetched = []
+
+    return medications, list(kept.values()) + fetched
+
 def check_new_medication_interactions(patient_id, new_medication_name):
     """Check interactions for a newly added medication"""
-    try:
-        patient = Patient.objects.get(id=patient_id)
-        medications = Medication.objects.filter(patient=patient)
-        med_names = list(medications.values_list('name', flat=True))
-        
-        interactions = check_drug_interactions(med_names)
-        if interactions:
-            cache_key = f"patient_{patient_id}_interactions"
-            cache.set(cache_key, interactions, timeout=3600)  # Cache for 1 hour
-            
-    except Exception as e:
-        logger.error(f"Error in check_new_medication_interactions: {str(e)}")
+    update_patient_interactions(patient_id)
 
 def update_patient_interactions(patient_id):
     """Update all interactions for a patient's medications"""
     try:
-        patient = Patient.objects.get(id=patient_id)
-        medications = Medication.objects.filter(patient=patient)
-        med_names = list(medications.values_list('name', flat=True))
-        
-        if len(med_names) >= 2:
-            interactions = check_drug_interactions(med_names)
-            if interactions:
-                cache_key = f"patient_{patient_id}_interactions"
-                cache.set(cache_key, interactions, timeout=3600)
-                
+        version = _current_version(patient_id)
+        if not Patient.objects.filter(id=patient_id).exists():
+            cache.delete_many([_report_key(patient_id), _version_key(patient_id)])
+            return
+
+        med_names = list(Medication.objects.filter(patient_id=patient_id).values_list('name', flat=True))
+
+        medications, interactions = _patch_interactions(cache.get(_report_key(patient_id)), med_names)
+        _store_report(patient_id, version, medications, interactions)
+
+    except Exception as e:
+        logger.error(f"Error in update_patient_interactions: {str(e)}")
+
+def request_interaction_report(patient_id):
+    """
+    Serve the precomputed report, queueing a refresh when it is missing or stale.
+    Never computes interactions on the caller's thread (unless the worker is eager).
+    """
+    report = get_interaction_report(patient_id)
+    if report is None or report['stale']:
+        enqueue(update_patient_interactions, patient_id)
+        report = get_interaction_report(patient_id) or report
+    if report is not None:
+        report['pending'] = worker.is_queued(update_patient_interactions, patient_id)
+    return report
+
+def start_medication_import(patient_id, medication_ids):
+    """
+    Record a pending import job for medications created with bulk_create and
+    queue its follow-up work. Returns the job id.
+    """
+    job_id = uuid.uuid4().hex
+    cache.set(_import_key(patient_id, job_id), {
+        'status': 'pending',
+        'medication_ids': list(medication_ids),
+        'created_at': timezone.now().isoformat(),
+        'completed_at': None,
+        'error': None
+    }, timeout=REPORT_TIMEOUT)
+    enqueue(complete_medication_import, patient_id, job_id, tuple(medication_ids))
+    return job_id
+
+def complete_medication_import(patient_id, job_id, medication_ids):
+    """
+    What the Medication post_save signal would have done for each imported row,
+    done once for the batch: materialise doses, then one interaction update
+    """
+    key = _import_key(patient_id, job_id)
+    job = cache.get(key) or {'medication_ids': list(medication_ids), 'created_at': None}
+    try:
+        for medication in Medication.objects.filter(id__in=medication_ids, patient_id=patient_id):
+            materialise_doses(medication)
+        update_patient_interactions(patient_id)
+        job.update(status='complete', error=None)
     except Exception as e:
-        logger.error(f"Error in update_patient_interactions: {str(e)}")
\ No newline at end of file
+        logger.error(f"Error completing medication import {job_id}: {str(e)}")
+        job.update(status='failed', error=str(e))
+    job['completed_at'] = timezone.now().isoformat()
+    cache.set(key, job, timeout=REPORT_TIMEOUT)
+
+def get_medication_import(patient_id, job_id):
+    """The patient's import job, or None if unknown or expired"""
+    return cache.get(_import_key(patient_id, job_id))
@@ -0,0 +1,189 @@
+import asyncio
+import hashlib
+import logging
+import time
+from typing import Dict, Optional
+from django.conf import settings
+from django.core.cache import cache
+from telegram import Bot
+from telegram.error import BadRequest, RetryAfter, TelegramError
+from telegram.request import HTTPXRequest
+from core.http_client import http_client
+from core.resilience import RateLimiter
+
+logger = logging.getLogger(__name__)
+
+VOICE_CAPTION = "Voice reminder"
+
+def _file_id_key(audio: bytes) -> str:
+    return f"telegram_file_{hashlib.sha256(audio).hexdigest()}"
+
+def _seconds(retry_after) -> float:
+    # RetryAfter.retry_after is an int or a timedelta depending on the library version
+    return retry_after.total_seconds() if hasattr(retry_after, 'total_seconds') else float(retry_after)
+
+class TelegramSender:
+    """
+    Process-wide Telegram delivery queue.
+    One long-lived Bot lives on the shared HTTP client loop, and
+    TELEGRAM_SEND_WORKERS workers drain the queue within Telegram's limits:
+    TELEGRAM_GLOBAL_RATE messages/second overall and one message per
+    TELEGRAM_PER_CHAT_INTERVAL seconds per chat. A 429 pauses every worker for
+    its Retry-After. Voice notes are uploaded once per distinct audio and then
+    re-sent by file_id, which is cached across processes (through the async
+    cache API, so a slow shared cache never blocks the client loop).
+    """
+
+    def __init__(self):
+        self._bot: Optional[Bot] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._limiter: Optional[RateLimiter] = None
+        self._chat_ready: Dict[str, float] = {}
+        self._uploads: Dict[str, asyncio.Future] = {}
+        self._start_lock: Optional[asyncio.Lock] = None
+        self.partial_failures = 0  # Text delivered, voice note given up on
+
+    async def _start(self):
+        # Runs on the client loop; everything below is single-threaded
+        if self._bot is not None:
+            return
+        if self._start_lock is None:
+            self._start_lock = asyncio.Lock()
+        async with self._start_lock:
+            if self._bot is None:
+                await self._create_bot()
+
+    async def _create_bot(self):
+        bot = Bot(
+            token=settings.TELEGRAM_TOKEN,
+            base_url=settings.TELEGRAM_API_URL,
+            request=HTTPXRequest(connection_pool_size=settings.TELEGRAM_SEND_WORKERS)
+        )
+        await bot.initialize()
+        self._bot = bot
+        # Smooth pacing (no burst) keeps every 1s window under the limit
+        self._limiter = RateLimiter(settings.TELEGRAM_GLOBAL_RATE, burst=1)
+        self._queue = asyncio.Queue()
+        for _ in range(settings.TELEGRAM_SEND_WORKERS):
+            asyncio.ensure_future(self._worker())
+
+    async def send(self, chat_id: str, message: str, audio_file: Optional[bytes] = None) -> bool:
+        """Queue a reminder and wait for it to be delivered; callable from any event loop"""
+        return await http_client.run_async(self._enqueue(str(chat_id), message, audio_file))
+
+    async def _enqueue(self, chat_id: str, message: str, audio_file: Optional[bytes]) -> bool:
+        await self._start()
+        delivered = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((chat_id, message, audio_file, delivered))
+        return await delivered
+
+    async def _worker(self):
+        while True:
+            chat_id, message, audio_file, delivered = await self._queue.get()
+            try:
+                result = await self._deliver(chat_id, message, audio_file)
+            finally:
+                self._queue.task_done()
+            if not delivered.done():
+                delivered.set_result(result)
+
+    async def _deliver(self, chat_id: str, message: str, audio_file: Optional[bytes]) -> bool:
+        """
+        Send the text, then the voice note. True once the text is delivered:
+        a failed voice note is retried on its own and otherwise counted as a
+        partial failure, since retrying the reminder would repeat the text.
+        """
+        try:
+            await self._call(self._bot.send_message, chat_id=chat_id, text=message, parse_mode='HTML')
+        except TelegramError as e:
+            logger.error(f"Telegram error: {str(e)}")
+            return False
+        except Exception as e:
+            logger.error(f"Error sending Telegram message: {str(e)}")
+            return False
+
+        if audio_file and not await self._deliver_voice(chat_id, audio_file):
+            self.partial_failures += 1
+        return True
+
+    async def _deliver_voice(self, chat_id: str, audio_file: bytes) -> bool:
+        for attempt in range(1, settings.TELEGRAM_MAX_RETRIES + 1):
+            try:
+                await self._send_voice(chat_id, audio_file)
+                return True
+            except Exception as e:
+                # Retries are spaced by the per-chat interval in _call
+                error = e
+                logger.warning(f"Voice note to {chat_id} failed (attempt {attempt}): {str(e)}")
+        logger.error(f"Reminder text delivered to {chat_id} but the voice note failed: {str(error)}")
+        return False
+
+    async def _wait_for_chat(self, chat_id: str):
+        # Reserve the chat's next slot before sleeping so concurrent sends queue up behind it
+        now = time.monotonic()
+        slot = max(now, self._chat_ready.get(chat_id, 0.0))
+        self._chat_ready[chat_id] = slot + settings.TELEGRAM_PER_CHAT_INTERVAL
+        if len(self._chat_ready) > 10000:
+            self._chat_ready = {chat: ready for chat, ready in self._chat_ready.items() if ready > now}
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    async def _call(self, method, **kwargs):
+        chat_id = kwargs['chat_id']
+        for attempt in range(settings.TELEGRAM_MAX_RETRIES):
+            await self._wait_for_chat(chat_id)
+            await self._limiter.acquire()
+            # A long wait for the global limit may have eaten the chat's spacing
+            self._chat_ready[chat_id] = max(
+                self._chat_ready.get(chat_id, 0.0),
+                time.monotonic() + settings.TELEGRAM_PER_CHAT_INTERVAL
+            )
+            try:
+                return await method(**kwargs)
+            except RetryAfter as e:
+                delay = _seconds(e.retry_after)
+                logger.warning(f"Telegram rate limit hit, pausing sends for {delay}s")
+                self._limiter.pause(delay)
+                if attempt == settings.TELEGRAM_MAX_RETRIES - 1:
+                    raise
+
+    async def _send_voice(self, chat_id: str, audio: bytes):
+        key = _file_id_key(audio)
+        file_id = await cache.aget(key)
+        if file_id is None and key in self._uploads:
+            # Someone is uploading this exact audio right now; reuse their file_id
+            file_id = await asyncio.shield(self._uploads[key])
+
+        if file_id:
+            try:
+                await self._call(self._bot.send_voice, chat_id=chat_id, voice=file_id, caption=VOICE_CAPTION)
+                return
+            except BadRequest:
+                # file_id no longer valid; upload again
+                await cache.adelete(key)
+
+        upload = self._uploads[key] = asyncio.get_running_loop().create_future()
+        file_id = None
+        try:
+            sent = await self._call(self._bot.send_voice, chat_id=chat_id, voice=audio, caption=VOICE_CAPTION)
+            if sent.voice:
+                file_id = sent.voice.file_id
+                # Release concurrent senders of the same audio before the cache write
+                upload.set_result(file_id)
+                await cache.aset(key, file_id, timeout=None)
+        finally:
+            if not upload.done():
+                upload.set_result(file_id)
+            if self._uploads.get(key) is upload:
+                del self._uploads[key]
+
+    def metrics(self) -> Dict:
+        return {
+            'queued': self._queue.qsize() if self._queue else 0,
+            'rate_limit': self._limiter.snapshot() if self._limiter else None,
+            'uploads_in_flight': len(self._uploads),
+            'partial_failures': self.partial_failures,
+        }
+
+
+telegram_sender = TelegramSender()
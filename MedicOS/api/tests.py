@@ -1,3 +1,961 @@
-from django.test import TestCase
+import asyncio
+import json
+import tempfile
+from datetime import date, timedelta
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from core.cache import _fake_server
+from core.http_client import ConcurrencyLimitError, UpstreamError, UpstreamResponse
+from core.models import AdverseEvent, AdverseEventRollup, DoseOccurrence, DrugInteraction, Medication, Patient
+from . import services
+from .pharmacovigilance import rebuild_rollups
+from .reminders import (
+    ReminderDispatcher,
+    claim_doses,
+    release_doses,
+    schedule_medication_reminders,
+    upcoming_voice_reminders,
+    voice_reminder_text
+)
+from .tasks import (
+    _patch_interactions,
+    get_interaction_report,
+    mark_interactions_stale,
+    request_interaction_report,
+    update_patient_interactions
+)
+from .schedule import ParsedSchedule, materialise_doses, schedule_events
+from .worker import BackgroundWorker
+from .services import canonical_drug_name, canonical_pairs, get_pair_interactions
+from .telegram_sender import TelegramSender
+from .tts_cache import AudioCache
 
-# Create your tests here.
+# Keeps tests away from the configured shared cache
+LOCAL_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+class CanonicalPairsTests(SimpleTestCase):
+    def test_combination_product_kept_next_to_parent(self):
+        medications = ['Tylenol', 'Tylenol with Codeine', 'Warfarin']
+        self.assertNotEqual(canonical_drug_name('Tylenol with Codeine'), canonical_drug_name('Tylenol'))
+        self.assertEqual(canonical_pairs(medications), [
+            ('Tylenol', 'Tylenol with Codeine'),
+            ('Tylenol', 'Warfarin'),
+            ('Tylenol with Codeine', 'Warfarin'),
+        ])
+
+    def test_synonyms_are_deduplicated(self):
+        self.assertEqual(
+            canonical_pairs(['Tylenol 500mg', 'Paracetamol', 'Warfarin']),
+            [('Tylenol 500mg', 'Warfarin')]
+        )
+
+@override_settings(CACHES=LOCAL_CACHES)
+class UpstreamFailureTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_local_rejection_is_not_cached(self):
+        rejected = mock.AsyncMock(side_effect=ConcurrencyLimitError('Concurrency limit reached', host='api.deepseek.com'))
+        with mock.patch.object(services, '_request_pair_interaction', rejected):
+            [interaction] = get_pair_interactions([('Warfarin', 'Aspirin')], batch=False)
+        self.assertEqual(interaction['source'], 'Fallback')
+        key = services._pair_cache_key(canonical_drug_name('Warfarin'), canonical_drug_name('Aspirin'))
+        self.assertIsNone(cache.get(key))
+
+    def test_client_error_is_not_retried(self):
+        response = UpstreamResponse('https://api.deepseek.com/v1/chat/completions', 401, {}, b'{}')
+        request = mock.AsyncMock(return_value=response)
+        with mock.patch.object(services.http_client, 'request', request):
+            with self.assertRaises(UpstreamError):
+                asyncio.run(services._deepseek_chat('prompt', max_tokens=10))
+        self.assertEqual(request.await_count, 1)
+
+@override_settings(CACHES=LOCAL_CACHES, OPENFDA_API_KEY='test')
+class AlternativesRefreshTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_cancelled_waiter_does_not_cancel_shared_refresh(self):
+        result = {'status': 'success', 'alternatives': [{'name': 'Naproxen'}], 'source': 'FDA'}
+
+        async def slow_fetch(drug_name):
+            await asyncio.sleep(0.2)
+            return result
+        fetch = mock.AsyncMock(side_effect=slow_fetch)
+
+        async def scenario():
+            first = asyncio.ensure_future(services.get_alternative_drugs('Ibuprofen'))
+            second = asyncio.ensure_future(services.get_alternative_drugs('Ibuprofen'))
+            await asyncio.sleep(0.05)
+            first.cancel()
+            return await second
+
+        with mock.patch.object(services, '_get_fda_alternatives', fetch):
+            self.assertEqual(asyncio.run(scenario()), result)
+        self.assertEqual(fetch.await_count, 1)
+
+@override_settings(CACHES=LOCAL_CACHES)
+class MedicationScheduleViewTests(TestCase):
+    def test_events_are_a_json_array(self):
+        user = User.objects.create_user('patient', password='secret')
+        patient = Patient.objects.create(user=user, dob=date(1970, 1, 1), phone='1')
+        medication = Medication.objects.create(
+            patient=patient, name='Warfarin', dosage='5mg',
+            schedule={'times': ['08:00', '20:00'], 'days': [0, 1, 2, 3, 4, 5, 6]}
+        )
+        self.client.force_login(user)
+        response = self.client.get('/api/medications/schedule/', {'start': '2030-01-07', 'end': '2030-01-13'})
+        self.assertEqual(response.status_code, 200)
+        events = json.loads(response.content)
+        self.assertEqual(len(events), 14)
+        self.assertEqual(events[0], {
+            'title': 'Warfarin - 5mg',
+            'start': '2030-01-07T08:00:00',
+            'allDay': False,
+            'extendedProps': {'medication_id': medication.id}
+        })
+
+@override_settings(CACHES=LOCAL_CACHES)
+class DoseRebuildTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user('patient')
+        patient = Patient.objects.create(user=user, dob=date(1970, 1, 1), phone='1')
+        with mock.patch('api.signals.enqueue'), self.captureOnCommitCallbacks(execute=True):
+            self.medication = Medication.objects.create(
+                patient=patient, name='Warfarin', dosage='5mg',
+                schedule={'times': ['08:00'], 'days': [0, 1, 2, 3, 4, 5, 6]}
+            )
+        self.dose_ids = set(DoseOccurrence.objects.filter(medication=self.medication).values_list('id', flat=True))
+        self.assertTrue(self.dose_ids)
+
+    def _save(self, **kwargs):
+        with mock.patch('api.signals.enqueue'), self.captureOnCommitCallbacks(execute=True):
+            self.medication.save(**kwargs)
+        return set(DoseOccurrence.objects.filter(medication=self.medication).values_list('id', flat=True))
+
+    def test_dosage_edit_keeps_doses(self):
+        self.medication.dosage = '7.5mg'
+        self.assertEqual(self._save(), self.dose_ids)
+
+    def test_schedule_change_rebuilds_doses(self):
+        self.medication.schedule = {'times': ['09:00'], 'days': [0, 1, 2, 3, 4, 5, 6]}
+        self.assertNotEqual(self._save(update_fields=['schedule']), self.dose_ids)
+
+@override_settings(CACHES=LOCAL_CACHES)
+class ReminderDispatcherTests(TestCase):
+    def test_refresh_materialises_medications_without_doses(self):
+        user = User.objects.create_user('patient')
+        patient = Patient.objects.create(user=user, dob=date(1970, 1, 1), phone='1', telegram_chat_id='42')
+        # bulk_create skips the signal that materialises doses, like rows that predate DoseOccurrence
+        [medication] = Medication.objects.bulk_create([Medication(
+            patient=patient, name='Warfarin', dosage='5mg',
+            schedule={'times': ['08:00'], 'days': [0, 1, 2, 3, 4, 5, 6]}
+        )])
+        dispatcher = ReminderDispatcher()
+        dispatcher.lookahead = timedelta(days=2)
+        self.assertGreater(dispatcher.refresh(), 0)
+        medication.refresh_from_db()
+        self.assertIsNotNone(medication.doses_until)
+        self.assertTrue(DoseOccurrence.objects.filter(medication=medication, scheduled_at__gt=timezone.now()).exists())
+
+class TelegramDeliveryTests(SimpleTestCase):
+    def setUp(self):
+        self.sender = TelegramSender()
+        self.sender._bot = mock.Mock()
+        self.sender._call = mock.AsyncMock()
+
+    @override_settings(TELEGRAM_MAX_RETRIES=3)
+    def test_failed_voice_note_is_a_partial_failure(self):
+        self.sender._send_voice = mock.AsyncMock(side_effect=RuntimeError('upload failed'))
+        with self.assertLogs('api.telegram_sender', 'ERROR') as logs:
+            self.assertTrue(asyncio.run(self.sender._deliver('42', 'Take Warfarin', b'audio')))
+        # The text went out once and is not retried; only the voice note is
+        self.sender._call.assert_awaited_once()
+        self.assertEqual(self.sender._send_voice.await_count, 3)
+        self.assertEqual(self.sender.partial_failures, 1)
+        self.assertEqual(self.sender.metrics()['partial_failures'], 1)
+        self.assertIn('voice note failed', logs.output[-1])
+
+    def test_voice_note_retried_alone(self):
+        self.sender._send_voice = mock.AsyncMock(side_effect=[RuntimeError('timed out'), None])
+        with self.assertLogs('api.telegram_sender', 'WARNING'):
+            self.assertTrue(asyncio.run(self.sender._deliver('42', 'Take Warfarin', b'audio')))
+        self.sender._call.assert_awaited_once()
+        self.assertEqual(self.sender._send_voice.await_count, 2)
+        self.assertEqual(self.sender.partial_failures, 0)
+
+    def test_failed_text_is_not_delivered(self):
+        self.sender._call.side_effect = RuntimeError('network down')
+        self.sender._send_voice = mock.AsyncMock()
+        self.assertFalse(asyncio.run(self.sender._deliver('42', 'Take Warfarin', b'audio')))
+        self.sender._send_voice.assert_not_awaited()
+
+class AudioCacheTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.cache = AudioCache(directory.name, max_bytes=10)
+
+    def test_round_trip(self):
+        self.cache.put('Take Warfarin', 'en', 'marytts', 'wave', b'RIFF1234')
+        self.assertEqual(self.cache.get('Take Warfarin', 'en', 'marytts', 'wave'), b'RIFF1234')
+        self.assertEqual(asyncio.run(self.cache.aget('Take Warfarin', 'en', 'marytts', 'wave')), b'RIFF1234')
+        self.assertIsNone(self.cache.get('Take Warfarin', 'fr', 'marytts', 'wave'))
+
+    def test_least_recently_used_blob_is_evicted(self):
+        self.cache.put('a', 'en', 'marytts', 'wave', b'11111')
+        self.cache.put('b', 'en', 'marytts', 'wave', b'22222')
+        self.cache.get('a', 'en', 'marytts', 'wave')
+        asyncio.run(self.cache.aput('c', 'en', 'marytts', 'wave', b'33333'))
+        self.assertIsNone(self.cache.get('b', 'en', 'marytts', 'wave'))
+        self.assertEqual(self.cache.get('a', 'en', 'marytts', 'wave'), b'11111')
+
+@override_settings(CACHES=LOCAL_CACHES)
+class TelegramVoiceTests(SimpleTestCase):
+    def test_file_id_is_reused_after_upload(self):
+        sender = TelegramSender()
+        sender._bot = mock.Mock()
+        sent = mock.Mock()
+        sent.voice.file_id = 'file-1'
+        sender._call = mock.AsyncMock(return_value=sent)
+
+        async def scenario():
+            await sender._send_voice('1', b'audio')
+            await sender._send_voice('2', b'audio')
+
+        cache.clear()
+        asyncio.run(scenario())
+        voices = [call.kwargs['voice'] for call in sender._call.await_args_list]
+        self.assertEqual(voices, [b'audio', 'file-1'])
+
+def _not_on_event_loop(method):
+    def guarded(self, *args, **kwargs):
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return method(self, *args, **kwargs)
+        raise AssertionError(f"Blocking cache.{method.__name__}() called on an event loop")
+    return guarded
+
+@override_settings(CACHES=LOCAL_CACHES, OPENFDA_API_KEY='test')
+class AsyncViewBlockingTests(TestCase):
+    """Async views and the HTTP client loop must reach the cache through its async API"""
+
+    def setUp(self):
+        cache.clear()
+        for name in ('get', 'set', 'add', 'delete', 'get_many'):
+            patcher = mock.patch.object(LocMemCache, name, _not_on_event_loop(getattr(LocMemCache, name)))
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.user = User.objects.create_user('patient')
+        self.patient = Patient.objects.create(user=self.user, dob=date(1970, 1, 1), phone='1', telegram_chat_id='42')
+        self.async_client.force_login(self.user)
+
+    async def test_get_alternatives(self):
+        result = {'status': 'success', 'alternatives': [{'name': 'Naproxen'}], 'source': 'FDA'}
+        with mock.patch.object(services, '_get_fda_alternatives', mock.AsyncMock(return_value=result)):
+            for _ in range(2):  # miss, then hit
+                response = await self.async_client.get('/api/drugs/alternatives/', {'drug': 'Ibuprofen'})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.json()['alternatives'], result)
+
+    async def test_send_voice_reminder(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        engines = (('marytts', 'wave', mock.AsyncMock(return_value=b'audio')),)
+        send = mock.AsyncMock(return_value=True)
+        with mock.patch.object(services, 'TTS_ENGINES', engines), \
+                mock.patch.object(services, 'get_tts_cache', return_value=AudioCache(directory.name, 1024)), \
+                mock.patch('api.views.send_telegram_reminder', send):
+            for _ in range(2):  # synthesised, then from the audio cache
+                response = await self.async_client.post('/api/reminders/send/', {
+                    'patient_id': self.patient.id, 'medication': 'Warfarin', 'dosage': '5mg', 'voice_reminder': True
+                }, content_type='application/json')
+                self.assertEqual(response.status_code, 200)
+        self.assertEqual(send.await_args.kwargs['audio_file'], b'audio')
+
+class AdverseEventRollupTests(TestCase):
+    def setUp(self):
+        patcher = mock.patch('api.signals.enqueue')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        user = User.objects.create_user('pv', password='x')
+        self.patient = Patient.objects.create(user=user, dob=date(1970, 1, 1), phone='1')
+        self.warfarin = Medication.objects.create(patient=self.patient, name='warfarin', dosage='5mg', schedule={})
+        self.aspirin = Medication.objects.create(patient=self.patient, name='aspirin', dosage='81mg', schedule={})
+
+    def counts(self):
+        return {
+            (row.drug_a, row.drug_b, row.reaction): (row.count, row.mild, row.moderate, row.severe)
+            for row in AdverseEventRollup.objects.all()
+        }
+
+    def report(self, severity=2):
+        return AdverseEvent.objects.create(
+            patient=self.patient, medication=self.aspirin, reaction='Bleeding', severity=severity
+        )
+
+    def test_report_counts_drug_and_pair(self):
+        self.report()
+        self.assertEqual(self.counts(), {
+            ('aspirin', '', 'bleeding'): (1, 0, 1, 0),
+            ('aspirin', 'warfarin', 'bleeding'): (1, 0, 1, 0),
+        })
+
+    def test_delete_takes_back_recorded_rows_after_co_medication_changes(self):
+        first, second = self.report(), self.report(severity=3)
+        self.warfarin.delete()
+        Medication.objects.create(patient=self.patient, name='ibuprofen', dosage='200mg', schedule={})
+        first.delete()
+        self.assertEqual(self.counts(), {
+            ('aspirin', '', 'bleeding'): (1, 0, 0, 1),
+            ('aspirin', 'warfarin', 'bleeding'): (1, 0, 0, 1),
+        })
+        second.delete()
+        self.assertEqual(self.counts(), {})
+
+    def test_edit_moves_the_count(self):
+        event = self.report(severity=1)
+        event.severity = 3
+        event.save()
+        self.assertEqual(self.counts()[('aspirin', '', 'bleeding')], (1, 0, 0, 1))
+
+    def test_delete_after_rebuild_does_not_go_negative(self):
+        event = self.report()
+        AdverseEvent.objects.filter(pk=event.pk).update(rollup_entry=None)
+        AdverseEventRollup.objects.all().delete()
+        self.assertEqual(rebuild_rollups(), 2)
+        event.refresh_from_db()
+        AdverseEventRollup.objects.all().delete()
+        event.delete()
+        self.assertEqual(self.counts(), {})
+
+    def test_rebuild_matches_incremental(self):
+        self.report()
+        self.report(severity=3)
+        incremental = self.counts()
+        rebuild_rollups()
+        self.assertEqual(self.counts(), incremental)
+
+@override_settings(CACHES={'default': {
+    'BACKEND': 'core.cache.TieredCache',
+    'LOCATION': 'fakeredis://interaction-version-tests',
+    'OPTIONS': {'LOCAL_EXCLUDE_PREFIXES': ['patient_']},
+}})
+class InteractionVersionTests(SimpleTestCase):
+    def setUp(self):
+        self.server = _fake_server('fakeredis://interaction-version-tests')
+        self.server.connected = True
+        self.addCleanup(setattr, self.server, 'connected', True)
+        cache.clear()
+
+    def test_versions_count_up(self):
+        self.assertEqual(mark_interactions_stale(1), 1)
+        self.assertEqual(mark_interactions_stale(1), 2)
+        self.assertEqual(mark_interactions_stale(2), 1)
+
+    def test_shared_cache_outage_does_not_raise(self):
+        self.server.connected = False
+        with self.assertLogs('core.cache', 'WARNING'):
+            self.assertEqual(mark_interactions_stale(1), 1)
+
+    def test_version_survives_eviction_between_add_and_incr(self):
+        with mock.patch.object(cache, 'incr', side_effect=ValueError):
+            self.assertEqual(mark_interactions_stale(3), 1)
+        self.assertEqual(mark_interactions_stale(3), 2)
+
+def fake_pair_interactions(pairs):
+    return [
+        {'drugs': list(pair), 'description': f"{pair[0]} + {pair[1]}", 'severity': 1, 'source': 'API'}
+        for pair in pairs
+    ]
+
+class BackgroundWorkerTests(SimpleTestCase):
+    def test_identical_jobs_coalesce(self):
+        worker = BackgroundWorker()
+        task = mock.Mock(__name__='task')
+        with mock.patch.object(worker, '_ensure_thread'):
+            self.assertTrue(worker.enqueue(task, 1))
+            self.assertFalse(worker.enqueue(task, 1))
+            self.assertTrue(worker.enqueue(task, 2))
+        self.assertTrue(worker.is_queued(task, 1))
+        task.assert_not_called()
+
+    @override_settings(BACKGROUND_TASKS_EAGER=True)
+    def test_eager_mode_runs_inline(self):
+        worker = BackgroundWorker()
+        task = mock.Mock(__name__='task', side_effect=[None, RuntimeError('boom')])
+        self.assertTrue(worker.enqueue(task, 1))
+        with self.assertLogs('api.worker', 'ERROR'):
+            self.assertTrue(worker.enqueue(task, 1))
+        self.assertEqual(task.call_count, 2)
+        self.assertFalse(worker.is_queued(task, 1))
+
+@override_settings(CACHES=LOCAL_CACHES, BACKGROUND_TASKS_EAGER=True)
+class InteractionReportTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        for patcher in (
+            mock.patch('api.signals.enqueue'),
+            mock.patch('api.tasks.get_pair_interactions', side_effect=fake_pair_interactions),
+        ):
+            self.fetch = patcher.start()
+            self.addCleanup(patcher.stop)
+        user = User.objects.create_user('interactions', password='x')
+        self.patient = Patient.objects.create(user=user, dob=date(1970, 1, 1), phone='1')
+        for name in ('Warfarin', 'Aspirin'):
+            Medication.objects.create(patient=self.patient, name=name, dosage='1', schedule={})
+
+    def test_missing_report_is_computed(self):
+        self.assertIsNone(get_interaction_report(self.patient.id))
+        report = request_interaction_report(self.patient.id)
+        self.assertFalse(report['stale'])
+        self.assertFalse(report['pending'])
+        self.assertEqual(len(report['interactions']), 1)
+
+    def test_stale_report_is_regenerated(self):
+        request_interaction_report(self.patient.id)
+        Medication.objects.create(patient=self.patient, name='Ibuprofen', dosage='1', schedule={})
+        self.assertTrue(get_interaction_report(self.patient.id)['stale'])
+
+        report = request_interaction_report(self.patient.id)
+        self.assertFalse(report['stale'])
+        self.assertEqual(len(report['interactions']), 3)
+        # Only the pairs involving the new drug were fetched again
+        self.assertEqual(len(self.fetch.call_args.args[0]), 2)
+
+    def test_report_computed_before_a_change_stays_stale(self):
+        update_patient_interactions(self.patient.id)
+        mark_interactions_stale(self.patient.id)
+        self.assertTrue(get_interaction_report(self.patient.id)['stale'])
+
+    def test_deleted_patient_report_is_dropped(self):
+        update_patient_interactions(self.patient.id)
+        patient_id = self.patient.id
+        self.patient.user.delete()
+        update_patient_interactions(patient_id)
+        self.assertIsNone(get_interaction_report(patient_id))
+
+class PatchInteractionsTests(SimpleTestCase):
+    def report(self):
+        return {
+            'medications': {'warfarin': 'Warfarin', 'aspirin': 'Aspirin', 'ibuprofen': 'Ibuprofen'},
+            'interactions': [
+                {'drugs': ['Warfarin', 'Aspirin'], 'source': 'API'},
+                {'drugs': ['Warfarin', 'Ibuprofen'], 'source': 'API'},
+                {'drugs': ['Aspirin', 'Ibuprofen'], 'source': 'Fallback'},
+            ],
+        }
+
+    def test_only_added_drugs_and_fallbacks_are_fetched(self):
+        with mock.patch('api.tasks.get_pair_interactions', side_effect=fake_pair_interactions) as fetch:
+            medications, interactions = _patch_interactions(
+                self.report(), ['Warfarin', 'Aspirin', 'Ibuprofen', 'Metformin']
+            )
+        fetched = [frozenset(pair) for pair in fetch.call_args.args[0]]
+        self.assertCountEqual(fetched, [
+            {'Aspirin', 'Ibuprofen'}, {'Warfarin', 'Metformin'}, {'Aspirin', 'Metformin'}, {'Ibuprofen', 'Metformin'},
+        ])
+        self.assertEqual(len(interactions), 6)
+        self.assertEqual(medications['metformin'], 'Metformin')
+
+    def test_removed_drug_pairs_are_dropped_without_fetching(self):
+        with mock.patch('api.tasks.get_pair_interactions') as fetch:
+            medications, interactions = _patch_interactions(self.report(), ['Warfarin', 'Aspirin'])
+        fetch.assert_not_called()
+        self.assertEqual(interactions, [{'drugs': ['Warfarin', 'Aspirin'], 'source': 'API'}])
+        self.assertEqual(medications, {'warfarin': 'Warfarin', 'aspirin': 'Aspirin'})
+
+@override_settings(CACHES=LOCAL_CACHES, API_PAGE_SIZE=2)
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        patcher = mock.patch('api.signals.enqueue')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        user = User.objects.create_user('pages', password='x')
+        self.patient = Patient.objects.create(user=user, dob=date(1970, 1, 1), phone='1')
+        self.medications = [
+            Medication.objects.create(patient=self.patient, name=f'Drug{i}', dosage='1', schedule={})
+            for i in range(5)
+        ]
+        # Ties on created_at must still page by id without skipping or repeating rows
+        created = timezone.now()
+        Medication.objects.filter(id__in=[m.id for m in self.medications[:3]]).update(created_at=created)
+        Medication.objects.filter(id__in=[m.id for m in self.medications[3:]]).update(
+            created_at=created + timedelta(seconds=1)
+        )
+        self.client.force_login(user)
+        self.url = '/api/medications/'
+
+    def test_pages_cover_every_row_once(self):
+        seen, cursor, pages = [], None, 0
+        while True:
+            response = self.client.get(self.url, {'cursor': cursor} if cursor else {})
+            self.assertEqual(response.status_code, 200)
+            body = response.json()
+            self.assertLessEqual(len(body['medications']), 2)
+            seen.extend(row['id'] for row in body['medications'])
+            pages += 1
+            cursor = body['next_cursor']
+            if cursor is None:
+                break
+        self.assertEqual(seen, [m.id for m in self.medications])
+        self.assertEqual(pages, 3)
+
+    def test_descending_pages(self):
+        medication = self.medications[0]
+        events = [
+            AdverseEvent.objects.create(patient=self.patient, medication=medication, reaction=f'r{i}', severity=1)
+            for i in range(3)
+        ]
+        url = f'/api/medications/{medication.id}/details/'
+        first = self.client.get(url).json()
+        second = self.client.get(url, {'cursor': first['next_cursor']}).json()
+        reactions = [row['reaction'] for row in first['adverse_events'] + second['adverse_events']]
+        self.assertEqual(reactions, [event.reaction for event in reversed(events)])
+        self.assertIsNone(second['next_cursor'])
+
+    def test_fields_and_bad_parameters(self):
+        body = self.client.get(self.url, {'fields': 'name', 'limit': 1}).json()
+        self.assertEqual(body['medications'], [{'name': 'Drug0'}])
+        for params in ({'cursor': 'not-a-cursor'}, {'limit': '0'}, {'limit': 'x'}, {'fields': 'password'}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get(self.url, params).status_code, 400)
+
+    def test_etag_revalidation(self):
+        response = self.client.get(self.url)
+        etag = response['ETag']
+        self.assertIn('no-cache', response['Cache-Control'])
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        Medication.objects.filter(id=self.medications[0].id).update(name='Renamed')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+@override_settings(CACHES=LOCAL_CACHES)
+class DoseClaimTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user('claims')
+        patient = Patient.objects.create(user=user, dob=date(1970, 1, 1), phone='1')
+        [medication] = Medication.objects.bulk_create([
+            Medication(patient=patient, name='Warfarin', dosage='5mg', schedule={})
+        ])
+        now = timezone.now()
+        self.doses = DoseOccurrence.objects.bulk_create([
+            DoseOccurrence(patient=patient, medication=medication, scheduled_at=now + timedelta(hours=i))
+            for i in range(3)
+        ])
+        self.ids = [dose.id for dose in self.doses]
+
+    def test_each_dose_is_claimed_once(self):
+        claimed_at, claimed = claim_doses(self.ids)
+        self.assertCountEqual([dose.id for dose in claimed], self.ids)
+        _, again = claim_doses(self.ids)
+        self.assertEqual(again, [])
+        self.assertEqual(DoseOccurrence.objects.filter(reminder_sent_at=claimed_at).count(), 3)
+
+    def test_release_only_undoes_that_claim(self):
+        claim_doses(self.ids[:1])
+        second_at, _ = claim_doses(self.ids)
+        release_doses(self.ids, second_at)
+        self.assertEqual(
+            list(DoseOccurrence.objects.filter(reminder_sent_at__isnull=False).values_list('id', flat=True)),
+            self.ids[:1]
+        )
+        _, retried = claim_doses(self.ids)
+        self.assertCountEqual([dose.id for dose in retried], self.ids[1:])
+
+@override_settings(CACHES=LOCAL_CACHES)
+class MedicationImportViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user('importer', password='x')
+        self.patient = Patient.objects.create(user=user, dob=date(1970, 1, 1), phone='1')
+        self.client.force_login(user)
+
+    def _import(self, medications):
+        return self.client.post(
+            '/api/medications/import/', json.dumps({'medications': medications}), content_type='application/json'
+        )
+
+    def _medication(self, name):
+        return {'name': name, 'dosage': '5mg', 'schedule': {'times': ['08:00'], 'days': [0, 1, 2, 3, 4, 5, 6]}}
+
+    def test_invalid_entry_rejects_whole_import(self):
+        with mock.patch('api.tasks.enqueue') as enqueue:
+            response = self._import([self._medication('Warfarin'), {'name': 'Aspirin', 'dosage': '', 'schedule': {}}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(json.loads(response.content)['details'], [{'index': 1, 'error': 'dosage is required'}])
+        self.assertFalse(Medication.objects.filter(patient=self.patient).exists())
+        enqueue.assert_not_called()
+
+    def test_import_completes_in_background(self):
+        with mock.patch('api.tasks.enqueue') as enqueue:
+            response = self._import([self._medication(name) for name in ('Warfarin', 'Aspirin', 'Ibuprofen')])
+        self.assertEqual(response.status_code, 202)
+        body = json.loads(response.content)
+        self.assertEqual(len(body['medications']), 3)
+        self.assertEqual(Medication.objects.filter(patient=self.patient).count(), 3)
+
+        status = self.client.get(body['status_url'])
+        self.assertEqual(json.loads(status.content)['status'], 'pending')
+
+        # Run the queued follow-up the worker would have picked up
+        [(task, *args)] = [call.args for call in enqueue.call_args_list]
+        with mock.patch('api.tasks.get_pair_interactions', side_effect=fake_pair_interactions):
+            task(*args)
+
+        status = json.loads(self.client.get(body['status_url']).content)
+        self.assertEqual(status['job_id'], body['job_id'])
+        self.assertEqual(status['status'], 'complete')
+        self.assertEqual(len(status['interactions']), 3)
+        self.assertFalse(status['interactions_stale'])
+        self.assertTrue(DoseOccurrence.objects.filter(medication__patient=self.patient).exists())
+
+    def test_interactions_marked_stale_once_per_import(self):
+        with mock.patch('api.tasks.enqueue'), \
+                mock.patch('api.views.mark_interactions_stale') as view_stale, \
+                mock.patch('api.signals.mark_interactions_stale') as signal_stale:
+            response = self._import([self._medication(name) for name in ('Warfarin', 'Aspirin', 'Ibuprofen')])
+        self.assertEqual(response.status_code, 202)
+        view_stale.assert_called_once_with(self.patient.id)
+        signal_stale.assert_not_called()
+
+    def test_unknown_job_is_404(self):
+        response = self.client.get('/api/medications/import/missing/')
+        self.assertEqual(response.status_code, 404)
+
+def batch_reply(findings):
+    return json.dumps([
+        {'drug_a': drug_a, 'drug_b': drug_b, 'description': f'{drug_a} and {drug_b}: monitor closely.'}
+        for drug_a, drug_b in findings
+    ])
+
+class BatchInteractionTests(SimpleTestCase):
+    pairs = [('Warfarin', 'Aspirin'), ('Warfarin', 'Ibuprofen'), ('Aspirin', 'Ibuprofen')]
+
+    def test_prose_and_fences_around_array(self):
+        content = (
+            'Here is the assessment you asked for:\n```json\n'
+            + batch_reply([('warfarin', 'ASPIRIN'), ('Ibuprofen', 'Warfarin')])
+            + '\n```\nConsult a pharmacist before changing anything.'
+        )
+        parsed = services._parse_batch_interactions(content, self.pairs)
+        # Names are matched regardless of case and order, and keyed by the requested pair
+        self.assertEqual(set(parsed), {('Warfarin', 'Aspirin'), ('Warfarin', 'Ibuprofen')})
+        self.assertEqual(parsed[('Warfarin', 'Aspirin')]['drugs'], ['Warfarin', 'Aspirin'])
+        self.assertEqual(parsed[('Warfarin', 'Aspirin')]['source'], 'DeepSeek')
+
+    def test_unrequested_and_empty_findings_are_ignored(self):
+        content = json.dumps([
+            {'drug_a': 'Warfarin', 'drug_b': 'Metformin', 'description': 'Not asked for.'},
+            {'drug_a': 'Warfarin', 'drug_b': 'Aspirin', 'description': '  '},
+            'Warfarin and Ibuprofen',
+        ])
+        self.assertEqual(services._parse_batch_interactions(content, self.pairs), {})
+
+    def test_malformed_or_truncated_array(self):
+        complete = batch_reply([('Warfarin', 'Aspirin'), ('Warfarin', 'Ibuprofen')])
+        for content in (
+            complete[:len(complete) // 2],
+            "[{'drug_a': 'Warfarin', 'drug_b': 'Aspirin', 'description': 'Bleeding risk.'}]",
+            'I cannot assess these medications.',
+        ):
+            with self.subTest(content=content):
+                with self.assertRaises(ValueError):
+                    services._parse_batch_interactions(content, self.pairs)
+
+    async def test_malformed_reply_falls_back_to_pairs(self):
+        truncated = batch_reply(self.pairs)[:40]
+        per_pair = mock.AsyncMock(side_effect=lambda a, b: services._build_interaction(a, b, 'Checked alone.'))
+        with mock.patch.object(services, '_deepseek_chat', mock.AsyncMock(return_value=truncated)), \
+                mock.patch.object(services, '_request_pair_interaction', per_pair), \
+                self.assertLogs('api.services', 'WARNING'):
+            results = await services._fetch_interactions(self.pairs, batch=True)
+        self.assertEqual(per_pair.await_count, 3)
+        self.assertEqual([result['drugs'] for result in results], [list(pair) for pair in self.pairs])
+
+    async def test_partial_coverage_fetches_only_missing_pairs(self):
+        reply = batch_reply([('Warfarin', 'Aspirin'), ('Aspirin', 'Ibuprofen')])
+        per_pair = mock.AsyncMock(side_effect=lambda a, b: services._build_interaction(a, b, 'Checked alone.'))
+        with mock.patch.object(services, '_deepseek_chat', mock.AsyncMock(return_value=reply)), \
+                mock.patch.object(services, '_request_pair_interaction', per_pair):
+            results = await services._fetch_interactions(self.pairs, batch=True)
+        per_pair.assert_awaited_once_with('Warfarin', 'Ibuprofen')
+        self.assertEqual(
+            [result['description'] for result in results],
+            ['Warfarin and Aspirin: monitor closely.', 'Checked alone.', 'Aspirin and Ibuprofen: monitor closely.']
+        )
+
+    async def test_large_lists_are_chunked(self):
+        pairs = [(f'Drug{i}', f'Other{i}') for i in range(100)]
+        prompts = []
+
+        async def chat(prompt, max_tokens):
+            asked = json.loads(prompt.split('Pairs to assess: ', 1)[1].split('\n', 1)[0])
+            prompts.append((len(asked), max_tokens))
+            return batch_reply(asked)
+
+        per_pair = mock.AsyncMock()
+        with mock.patch.object(services, '_deepseek_chat', chat), \
+                mock.patch.object(services, '_request_pair_interaction', per_pair):
+            results = await services._fetch_interactions(pairs, batch=True)
+        self.assertEqual(sorted(size for size, _ in prompts), [10, 45, 45])
+        self.assertIn((45, services.INTERACTION_BATCH_TOKENS_PER_PAIR * 45 + 50), prompts)
+        self.assertEqual(len(results), 100)
+        per_pair.assert_not_awaited()
+
+@override_settings(CACHES=LOCAL_CACHES)
+class PairFanOutTests(TestCase):
+    pairs = [('Warfarin', 'Aspirin'), ('Warfarin', 'Ibuprofen'), ('Aspirin', 'Ibuprofen'), ('Warfarin', 'Metformin')]
+
+    def setUp(self):
+        cache.clear()
+        # Run the engine coroutine on the test thread instead of the client loop
+        patcher = mock.patch.object(services.http_client, 'run', side_effect=asyncio.run)
+        self.run = patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(services.http_client, 'circuit_open', return_value=False)
+        self.circuit_open = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_concurrency_is_bounded(self):
+        active = 0
+        peak = 0
+
+        async def request(orig_a, orig_b):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+            return services._build_interaction(orig_a, orig_b, 'Monitor closely.')
+
+        with mock.patch.object(services, 'INTERACTION_CONCURRENCY', 2), \
+                mock.patch.object(services, '_request_pair_interaction', request):
+            interactions = get_pair_interactions(self.pairs, batch=False)
+        self.assertEqual(peak, 2)
+        self.assertEqual([interaction['source'] for interaction in interactions], ['DeepSeek'] * 4)
+        self.run.assert_called_once()
+
+    def test_pair_deadline_answers_with_short_lived_fallback(self):
+        async def request(orig_a, orig_b):
+            if orig_b == 'Metformin':
+                await asyncio.sleep(5)
+            return services._build_interaction(orig_a, orig_b, 'Monitor closely.')
+
+        with mock.patch.object(services, 'INTERACTION_PAIR_DEADLINE', 0.05), \
+                mock.patch.object(services, '_request_pair_interaction', request), \
+                mock.patch('api.services.cache', wraps=cache) as tracked, \
+                self.assertLogs('api.services', 'ERROR'):
+            interactions = get_pair_interactions(self.pairs, batch=False)
+        self.assertEqual(interactions[3]['source'], 'Fallback')
+        self.assertEqual(interactions[3]['drugs'], ['Warfarin', 'Metformin'])
+
+        timeouts = {call.args[0]: call.kwargs['timeout'] for call in tracked.set.call_args_list}
+        key = services._pair_cache_key(canonical_drug_name('Warfarin'), canonical_drug_name('Metformin'))
+        self.assertEqual(timeouts.pop(key), services.INTERACTION_FALLBACK_TTL)
+        self.assertEqual(set(timeouts.values()), {3600})
+        # The fallback was not written through to the knowledge base
+        self.assertEqual(DrugInteraction.objects.count(), 3)
+
+    def test_open_circuit_skips_upstream(self):
+        self.circuit_open.return_value = True
+        with mock.patch.object(services, '_request_pair_interaction') as request, \
+                self.assertLogs('api.services', 'WARNING'):
+            interactions = get_pair_interactions(self.pairs, batch=False)
+        self.run.assert_not_called()
+        request.assert_not_called()
+        self.assertEqual({interaction['source'] for interaction in interactions}, {'Fallback'})
+        # Nothing was learnt, so the next request asks again
+        key = services._pair_cache_key(canonical_drug_name('Warfarin'), canonical_drug_name('Aspirin'))
+        self.assertIsNone(cache.get(key))
+
+@override_settings(CACHES=LOCAL_CACHES)
+class InteractionKnowledgeBaseTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        for patcher in (
+            mock.patch.object(services.http_client, 'run', side_effect=asyncio.run),
+            mock.patch.object(services.http_client, 'circuit_open', return_value=False),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.request = mock.AsyncMock(
+            side_effect=lambda orig_a, orig_b: services._build_interaction(orig_a, orig_b, 'Avoid this combination.')
+        )
+        patcher = mock.patch.object(services, '_request_pair_interaction', self.request)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _age(self, seconds):
+        DrugInteraction.objects.update(last_updated=timezone.now() - timedelta(seconds=seconds))
+        cache.clear()
+
+    def test_findings_are_written_through(self):
+        [interaction] = get_pair_interactions([('Coumadin 5mg', 'Aspirin')], batch=False)
+        self.assertEqual(interaction['drugs'], ['Coumadin 5mg', 'Aspirin'])
+        row = DrugInteraction.objects.get()
+        self.assertEqual((row.drug_a, row.drug_b), ('aspirin', 'warfarin'))
+        self.assertEqual((row.description, row.severity, row.source), ('Avoid this combination.', 3, 'DeepSeek'))
+        self.assertEqual(row.confidence_score, services.SOURCE_CONFIDENCE['DeepSeek'])
+
+    def test_fresh_rows_answer_without_upstream(self):
+        get_pair_interactions([('Warfarin', 'Aspirin')], batch=False)
+        self._age(60)
+        self.request.reset_mock()
+
+        [interaction] = get_pair_interactions([('Jantoven', 'Aspirin')], batch=False)
+        self.request.assert_not_awaited()
+        self.assertEqual(interaction['description'], 'Avoid this combination.')
+        self.assertEqual(interaction['drugs'], ['Jantoven', 'Aspirin'])
+
+    @override_settings(INTERACTION_KB_MAX_AGE=3600)
+    def test_stale_rows_are_refetched(self):
+        get_pair_interactions([('Warfarin', 'Aspirin')], batch=False)
+        self._age(3601)
+        self.request.side_effect = lambda orig_a, orig_b: services._build_interaction(orig_a, orig_b, 'Monitor INR.')
+
+        [interaction] = get_pair_interactions([('Warfarin', 'Aspirin')], batch=False)
+        self.request.assert_awaited_with('Warfarin', 'Aspirin')
+        self.assertEqual(interaction['description'], 'Monitor INR.')
+        row = DrugInteraction.objects.get()
+        self.assertEqual(row.description, 'Monitor INR.')
+        self.assertGreater(row.last_updated, timezone.now() - timedelta(minutes=1))
+
+    @override_settings(INTERACTION_KB_MAX_AGE=3600)
+    def test_stale_row_beats_fallback(self):
+        get_pair_interactions([('Warfarin', 'Aspirin')], batch=False)
+        self._age(3601)
+        self.request.side_effect = UpstreamError('503 response', status=503)
+
+        with self.assertLogs('api.services', 'ERROR'):
+            [interaction] = get_pair_interactions([('Warfarin', 'Aspirin')], batch=False)
+        self.assertEqual(interaction['description'], 'Avoid this combination.')
+        self.assertEqual(interaction['source'], 'DeepSeek')
+        self.assertEqual(DrugInteraction.objects.get().description, 'Avoid this combination.')
+
+@override_settings(CACHES=LOCAL_CACHES)
+class VoiceReminderToggleTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user('voice')
+        self.patient = Patient.objects.create(user=user, dob=date(1970, 1, 1), phone='1', language='de')
+        self.schedule = {'times': ['08:00'], 'days': [0, 1, 2, 3, 4, 5, 6]}
+        with mock.patch('api.signals.enqueue'), self.captureOnCommitCallbacks(execute=True):
+            self.medication = Medication.objects.create(
+                patient=self.patient, name='Warfarin', dosage='5mg', schedule=self.schedule
+            )
+        self.dose_ids = set(DoseOccurrence.objects.filter(medication=self.medication).values_list('id', flat=True))
+
+    def test_toggle_keeps_schedule_and_doses(self):
+        with mock.patch('api.signals.mark_interactions_stale') as stale:
+            upcoming = schedule_medication_reminders(self.medication, voice_reminder=True)
+        self.assertTrue(upcoming)
+        stale.assert_not_called()
+
+        self.medication.refresh_from_db()
+        self.assertTrue(self.medication.voice_reminder)
+        self.assertEqual(self.medication.schedule, self.schedule)
+        self.assertEqual(
+            set(DoseOccurrence.objects.filter(medication=self.medication).values_list('id', flat=True)),
+            self.dose_ids
+        )
+
+    def test_upcoming_voice_reminders_follow_the_flag(self):
+        start = timezone.now()
+        end = start + timedelta(days=2)
+        self.assertEqual(upcoming_voice_reminders(start, end), set())
+
+        schedule_medication_reminders(self.medication, voice_reminder=True)
+        self.assertEqual(
+            upcoming_voice_reminders(start, end),
+            {(voice_reminder_text('Warfarin', '5mg'), 'de')}
+        )
+
+@override_settings(CACHES=LOCAL_CACHES)
+class ScheduleRecurrenceTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user('recurrence', password='x')
+        self.patient = Patient.objects.create(user=user, dob=date(1970, 1, 1), phone='1')
+        self.client.force_login(user)
+
+    def medication(self, schedule):
+        # bulk_create skips the signal, so each test decides what is materialised
+        [medication] = Medication.objects.bulk_create([
+            Medication(patient=self.patient, name='Warfarin', dosage='5mg', schedule=schedule)
+        ])
+        return medication
+
+    def test_weekday_filtering(self):
+        # Mondays and Wednesdays; 2030-01-07 is a Monday
+        medication = self.medication({'times': ['08:00'], 'days': [0, 2]})
+        events = schedule_events([medication], date(2030, 1, 7), date(2030, 1, 20))
+        self.assertEqual(events[medication.id], [
+            '2030-01-07T08:00:00', '2030-01-09T08:00:00', '2030-01-14T08:00:00', '2030-01-16T08:00:00'
+        ])
+
+    def test_multiple_times_are_ordered_per_day(self):
+        schedule = ParsedSchedule.from_json({'times': ['20:00', '08:00', '08:00', '13:30'], 'days': [5]})
+        occurrences = schedule.occurrences(date(2030, 1, 11), date(2030, 1, 12))
+        self.assertEqual([str(value) for value in occurrences], [
+            '2030-01-12T08:00', '2030-01-12T13:30', '2030-01-12T20:00'
+        ])
+        self.assertIsNone(ParsedSchedule.from_json({'times': ['8am'], 'days': [0]}))
+
+    def test_window_crossing_materialised_range(self):
+        schedule = {'times': ['08:00', '20:00'], 'days': [0, 1, 2, 3, 4, 5, 6], 'startDate': '2030-01-01'}
+        medication = self.medication(schedule)
+        materialise_doses(medication, until=date(2030, 1, 5))
+        self.assertEqual((medication.doses_from, medication.doses_until), (date(2030, 1, 1), date(2030, 1, 5)))
+
+        events = schedule_events([medication], date(2030, 1, 4), date(2030, 1, 7))[medication.id]
+        engine_only = schedule_events([self.medication(schedule)], date(2030, 1, 4), date(2030, 1, 7))
+        self.assertEqual(events, list(engine_only.values())[0])
+        self.assertEqual(len(events), 8)
+        self.assertEqual(events[3:5], ['2030-01-05T20:00:00', '2030-01-06T08:00:00'])
+
+    @override_settings(TIME_ZONE='Europe/Berlin')
+    def test_dst_boundary(self):
+        # Clocks go forward at 02:00 on 2030-03-31 and back at 03:00 on 2030-10-27
+        schedule = {'times': ['02:30', '08:00'], 'days': [0, 1, 2, 3, 4, 5, 6], 'startDate': '2030-03-30'}
+        medication = self.medication(schedule)
+        materialise_doses(medication, until=date(2030, 3, 31))
+        stored = DoseOccurrence.objects.filter(medication=medication).order_by('scheduled_at')
+        # Rows come back in UTC
+        utc_times = [at.strftime('%d %H:%M') for at in stored.values_list('scheduled_at', flat=True)]
+        self.assertEqual(utc_times, ['30 01:30', '30 07:00', '31 01:30', '31 06:00'])
+
+        expected = [
+            '2030-03-30T02:30:00', '2030-03-30T08:00:00',
+            '2030-03-31T03:30:00', '2030-03-31T08:00:00',
+            '2030-04-01T02:30:00', '2030-04-01T08:00:00',
+        ]
+        # The same local times whether the day is materialised or computed by the engine
+        self.assertEqual(schedule_events([medication], date(2030, 3, 30), date(2030, 4, 1))[medication.id], expected)
+        unmaterialised = self.medication(schedule)
+        self.assertEqual(schedule_events([unmaterialised], date(2030, 3, 30), date(2030, 4, 1))[unmaterialised.id], expected)
+
+        autumn = schedule_events([unmaterialised], date(2030, 10, 26), date(2030, 10, 27))[unmaterialised.id]
+        self.assertEqual(autumn, [
+            '2030-10-26T02:30:00', '2030-10-26T08:00:00', '2030-10-27T02:30:00', '2030-10-27T08:00:00'
+        ])
+
+    def test_get_is_read_only(self):
+        medication = self.medication({'times': ['08:00'], 'days': [0, 1, 2, 3, 4, 5, 6]})
+        today = timezone.localdate()
+        materialise_doses(medication, until=today + timedelta(days=1))
+        doses = DoseOccurrence.objects.count()
+
+        response = self.client.get('/api/medications/schedule/', {
+            'start': today.isoformat(), 'end': (today + timedelta(days=6)).isoformat()
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(json.loads(response.content)), 7)
+        medication.refresh_from_db()
+        self.assertEqual(medication.doses_until, today + timedelta(days=1))
+        self.assertEqual(DoseOccurrence.objects.count(), doses)
@@ -0,0 +1,132 @@
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+class AudioCache:
+    """
+    Content-addressed store for synthesised speech.
+    Blobs live on disk under sha256(engine, format, lang, text); async callers
+    use aget/aput, which do the file I/O on a pool thread. Total size is capped at ``max_bytes``; the least recently
+    used blobs are evicted first (recency is the file mtime, bumped on hit,
+    so it survives restarts and is shared between processes).
+    """
+
+    def __init__(self, root: Path, max_bytes: int):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self._entries: 'OrderedDict[str, int]' = OrderedDict()  # key -> size, oldest first
+        self._size = 0
+        self._lock = threading.Lock()
+        self._loaded = False
+
+    @staticmethod
+    def key(text: str, lang: str, engine: str, audio_format: str) -> str:
+        return hashlib.sha256('\0'.join((engine, audio_format, lang, text)).encode('utf-8')).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / key
+
+    def _load(self):
+        # Rebuild the LRU order from disk once per process
+        if self._loaded:
+            return
+        self.root.mkdir(parents=True, exist_ok=True)
+        blobs = []
+        for path in self.root.glob('??/*'):
+            if path.suffix == '.tmp':
+                continue
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            blobs.append((stat.st_mtime, path.name, stat.st_size))
+        for _, key, size in sorted(blobs):
+            self._entries[key] = size
+            self._size += size
+        self._loaded = True
+
+    def get(self, text: str, lang: str, engine: str, audio_format: str) -> Optional[bytes]:
+        key = self.key(text, lang, engine, audio_format)
+        path = self._path(key)
+        try:
+            audio = path.read_bytes()
+            os.utime(path)
+        except OSError:
+            # Missing or evicted by another process
+            return None
+        if not audio:
+            return None
+
+        with self._lock:
+            self._load()
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            else:
+                self._entries[key] = len(audio)
+                self._size += len(audio)
+        return audio
+
+    async def aget(self, text: str, lang: str, engine: str, audio_format: str) -> Optional[bytes]:
+        return await sync_to_async(self.get, thread_sensitive=False)(text, lang, engine, audio_format)
+
+    async def aput(self, text: str, lang: str, engine: str, audio_format: str, audio: bytes):
+        await sync_to_async(self.put, thread_sensitive=False)(text, lang, engine, audio_format, audio)
+
+    def put(self, text: str, lang: str, engine: str, audio_format: str, audio: bytes):
+        if not audio or len(audio) > self.max_bytes:
+            return
+        key = self.key(text, lang, engine, audio_format)
+        path = self._path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Write then rename so readers never see a half-written blob
+            fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as tmp:
+                tmp.write(audio)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not cache TTS audio: {str(e)}")
+            return
+
+        with self._lock:
+            self._load()
+            self._size += len(audio) - self._entries.pop(key, 0)
+            self._entries[key] = len(audio)
+            self._evict()
+
+    def _evict(self):
+        while self._size > self.max_bytes and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self._size -= size
+            try:
+                self._path(key).unlink()
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"Could not evict TTS audio {key}: {str(e)}")
+
+    def stats(self):
+        with self._lock:
+            self._load()
+            return {'entries': len(self._entries), 'bytes': self._size, 'max_bytes': self.max_bytes}
+
+
+_cache: Optional[AudioCache] = None
+_cache_lock = threading.Lock()
+
+def get_tts_cache() -> AudioCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = AudioCache(settings.TTS_CACHE_DIR, settings.TTS_CACHE_MAX_BYTES)
+    return _cache
@@ -7,6 +7,8 @@ urlpatterns = [
     path('medications/', views.medication_list, name='medication_list'),
     path('medications/<int:medication_id>/', views.remove_medication, name='remove_medication'),
     path('medications/<int:medication_id>/details/', views.medication_details, name='medication_details'),
+    path('medications/import/', views.import_medications, name='import_medications'),
+    path('medications/import/<str:job_id>/', views.medication_import_status, name='medication_import_status'),
     path('medications/schedule/', views.medication_schedule, name='medication_schedule'),
     path('medications/interactions/', views.medication_interactions, name='medication_interactions'),
     path('reminders/send/', views.send_reminder, name='send_reminder'),
@@ -14,4 +16,5 @@ urlpatterns = [
     path('drugs/alternatives/', views.get_alternatives, name='get_alternatives'),
     path('drugs/interactions/check/', views.check_current_interactions, name='check_interactions'),
     path('adverse-events/report/', views.report_adverse_event, name='report_adverse_event'),
+    path('adverse-events/signals/', views.adverse_event_signals, name='adverse_event_signals'),
 ]
\ No newline at end of file
@@ -1,40 +1,78 @@
+from django.conf import settings
+from django.db import transaction
 from django.shortcuts import render, get_object_or_404
-from django.http import JsonResponse
-from django.views.decorators.http import require_http_methods
-from django.contrib.auth.decorators import login_required
-from django.views.decorators.csrf import csrf_exempt
+from django.urls import reverse
+from django.http import HttpResponse, JsonResponse
+from django.utils import timezone
+from asgiref.sync import sync_to_async
 import json
 import logging
 from datetime import datetime, timedelta
-from core.models import Patient, Medication, AdverseEvent, DrugInteraction
+from core.models import Patient, Medication, AdverseEvent
 from .services import (
-    check_drug_interactions, 
     send_telegram_reminder, 
     generate_voice_message,
     get_alternative_drugs
 )
+from .decorators import aget_object_or_404, csrf_exempt, login_required, require_http_methods
+from .pagination import PaginationError, conditional_json, keyset_page, page_limit, requested_fields
+from .pharmacovigilance import signal_report
+from .reminders import (
+    build_reminder_message,
+    schedule_is_valid,
+    schedule_medication_reminders,
+    voice_reminder_text
+)
+from .schedule import schedule_events
+from .tasks import (
+    get_interaction_report,
+    get_medication_import,
+    mark_interactions_stale,
+    request_interaction_report,
+    start_medication_import
+)
 
 logger = logging.getLogger(__name__)
 
-# core/views.py
+# Columns clients may request with ?fields=; the defaults are served otherwise
+MEDICATION_FIELDS = ('id', 'name', 'dosage', 'schedule', 'created_at', 'doses_from', 'doses_until')
+MEDICATION_DEFAULT_FIELDS = ('id', 'name', 'dosage', 'schedule', 'created_at')
+ADVERSE_EVENT_FIELDS = ('reaction', 'severity', 'reported_date')
 
-from django.shortcuts import render, get_object_or_404
-from django.contrib.auth.decorators import login_required
-from .models import Patient
-
-@login_required
-def patient_detail(request, pk):
-    patient = get_object_or_404(Patient, pk=pk)
-    return render(request, 'core/patient_detail.html', {'patient': patient})
+def _interaction_report_response(patient):
+    """Serve the precomputed interaction report; computation happens in the background worker"""
+    report = request_interaction_report(patient.id)
+    if report is None:
+        return JsonResponse({
+            'interactions': [],
+            'status': 'pending',
+            'stale': True,
+            'computed_at': None
+        }, status=202)
+    
+    return JsonResponse({
+        'interactions': report['interactions'],
+        'status': 'pending' if report['pending'] else 'ready',
+        'stale': report['stale'],
+        'computed_at': report['computed_at']
+    })
 
 @login_required
 @require_http_methods(["GET", "POST"])
 def medication_list(request):
     if request.method == "GET":
-        patient = get_object_or_404(Patient, user=request.user)
-        medications = Medication.objects.filter(patient=patient)
-        return JsonResponse({
-            'medications': list(medications.values())
+        try:
+            patient = get_object_or_404(Patient, user=request.user)
+            fields = requested_fields(request, MEDICATION_FIELDS, MEDICATION_DEFAULT_FIELDS)
+            medications, next_cursor = keyset_page(
+                Medication.objects.filter(patient=patient), 'created_at', fields,
+                limit=page_limit(request), cursor=request.GET.get('cursor')
+            )
+        except PaginationError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        return conditional_json(request, {
+            'medications': medications,
+            'next_cursor': next_cursor
         })
     
     elif request.method == "POST":
@@ -64,25 +102,122 @@ def medication_list(request):
             logger.error(f"Error adding medication: {str(e)}")
             return JsonResponse({'error': 'An error occurred while adding medication.'}, status=500)
 
+def _medication_error(item):
+    """Why an entry of a bulk import cannot be created, or None"""
+    if not isinstance(item, dict):
+        return 'Expected an object'
+    for field, max_length in (('name', 255), ('dosage', 50)):
+        value = item.get(field)
+        if not isinstance(value, str) or not value.strip():
+            return f'{field} is required'
+        if len(value) > max_length:
+            return f'{field} is longer than {max_length} characters'
+    if not schedule_is_valid(item.get('schedule')):
+        return 'Invalid medication schedule'
+    return None
+
+@login_required
+@require_http_methods(["POST"])
+def import_medications(request):
+    """
+    Add a whole regimen in one request: every entry is validated, the rows are
+    inserted together, and doses plus one combined interaction check are
+    computed in the background under the returned job id
+    """
+    patient = get_object_or_404(Patient, user=request.user)
+    try:
+        data = json.loads(request.body)
+        items = data.get('medications') if isinstance(data, dict) else None
+        if not isinstance(items, list) or not items:
+            return JsonResponse({'error': 'medications must be a non-empty list'}, status=400)
+        if len(items) > settings.MEDICATION_IMPORT_MAX:
+            return JsonResponse({
+                'error': f'At most {settings.MEDICATION_IMPORT_MAX} medications per import'
+            }, status=400)
+
+        errors = [
+            {'index': index, 'error': error}
+            for index, error in ((index, _medication_error(item)) for index, item in enumerate(items))
+            if error
+        ]
+        if errors:
+            return JsonResponse({'error': 'Invalid medications', 'details': errors}, status=400)
+
+        # bulk_create skips the post_save signal; its work is done once for the batch below
+        with transaction.atomic():
+            medications = Medication.objects.bulk_create([
+                Medication(
+                    patient=patient,
+                    name=item['name'].strip(),
+                    dosage=item['dosage'].strip(),
+                    schedule=item['schedule']
+                )
+                for item in items
+            ])
+        mark_interactions_stale(patient.id)
+        job_id = start_medication_import(patient.id, [medication.id for medication in medications])
+
+        return JsonResponse({
+            'job_id': job_id,
+            'status': 'pending',
+            'status_url': reverse('api:medication_import_status', args=[job_id]),
+            'medications': [
+                {
+                    'id': medication.id,
+                    'name': medication.name,
+                    'dosage': medication.dosage,
+                    'schedule': medication.schedule
+                }
+                for medication in medications
+            ]
+        }, status=202)
+
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+    except Exception as e:
+        logger.error(f"Error importing medications: {str(e)}")
+        return JsonResponse({'error': 'An error occurred while importing medications.'}, status=500)
+
+@login_required
+@require_http_methods(["GET"])
+def medication_import_status(request, job_id):
+    patient = get_object_or_404(Patient, user=request.user)
+    job = get_medication_import(patient.id, job_id)
+    if job is None:
+        return JsonResponse({'error': 'Unknown import job'}, status=404)
+
+    response = {'job_id': job_id, **job}
+    if job['status'] == 'complete':
+        report = get_interaction_report(patient.id)
+        response['interactions'] = report['interactions'] if report else []
+        response['interactions_stale'] = report['stale'] if report else True
+    return JsonResponse(response)
+
 # Split interaction checking into a separate endpoint
 @login_required
 @require_http_methods(["GET"])
 def check_current_interactions(request):
     try:
         patient = get_object_or_404(Patient, user=request.user)
-        medications = Medication.objects.filter(patient=patient)
-        med_names = list(medications.values_list('name', flat=True))
-        
-        if len(med_names) < 2:
-            return JsonResponse({'interactions': []})
-            
-        interactions = check_drug_interactions(med_names)
-        return JsonResponse({'interactions': interactions})
+        return _interaction_report_response(patient)
         
     except Exception as e:
         logger.error(f"Error checking interactions: {str(e)}")
         return JsonResponse({'error': str(e)}, status=500)
 
+def _schedule_events_json(medications, events):
+    """The calendar events JSON array, built as text one medication at a time"""
+    chunks = []
+    for medication in medications:
+        starts = events.get(medication.id)
+        if not starts:
+            continue
+        # Everything but the start time is constant per medication
+        prefix = '{"title": %s, "start": "' % json.dumps(f"{medication.name} - {medication.dosage}")
+        suffix = '", "allDay": false, "extendedProps": {"medication_id": %d}}' % medication.id
+        chunks.append(', '.join(prefix + start + suffix for start in starts))
+    return '[' + ', '.join(chunks) + ']'
+
 @login_required
 @require_http_methods(["GET"])
 def medication_schedule(request):
@@ -91,55 +226,20 @@ def medication_schedule(request):
     
     try:
         patient = get_object_or_404(Patient, user=request.user)
-        medications = Medication.objects.filter(patient=patient)
-        events = []
         
-        if start and end:
-            start_date = datetime.strptime(start.split('T')[0], '%Y-%m-%d')
-            end_date = datetime.strptime(end.split('T')[0], '%Y-%m-%d')
-            
-            for medication in medications:
-                schedule = medication.schedule
-                if not isinstance(schedule, dict) or 'time' not in schedule or 'days' not in schedule:
-                    continue
-                    
-                # Get medication date range
-                med_start = schedule.get('startDate')
-                med_end = schedule.get('endDate')
-                
-                if med_start:
-                    med_start = datetime.strptime(med_start, '%Y-%m-%d')
-                    if med_start > end_date:
-                        continue
-                else:
-                    med_start = start_date
-                
-                if med_end:
-                    med_end = datetime.strptime(med_end, '%Y-%m-%d')
-                    if med_end < start_date:
-                        continue
-                
-                # Generate events only within valid date range
-                time = schedule['time']
-                current = max(start_date, med_start)
-                
-                while current <= end_date and (not med_end or current <= med_end):
-                    if current.weekday() in schedule['days']:
-                        event_time = current.replace(
-                            hour=int(time.split(':')[0]),
-                            minute=int(time.split(':')[1])
-                        )
-                        events.append({
-                            'title': f"{medication.name} - {medication.dosage}",
-                            'start': event_time.isoformat(),
-                            'allDay': False,
-                            'extendedProps': {
-                                'medication_id': medication.id
-                            }
-                        })
-                    current += timedelta(days=1)
-                    
-        return JsonResponse(events, safe=False)
+        if not (start and end):
+            return JsonResponse([], safe=False)
+        
+        start_date = datetime.strptime(start.split('T')[0], '%Y-%m-%d').date()
+        end_date = datetime.strptime(end.split('T')[0], '%Y-%m-%d').date()
+        
+        medications = list(Medication.objects.filter(patient=patient))
+        # Materialised doses come from one range scan over (patient, scheduled_at)
+        events = schedule_events(medications, start_date, end_date)
+        
+        # Events are all computed by now, so one plain response (streaming would only
+        # be buffered by the ASGI handler); building the text skips per-event dicts
+        return HttpResponse(_schedule_events_json(medications, events), content_type='application/json')
         
     except Exception as e:
         logger.error(f"Error fetching medication schedule: {str(e)}")
@@ -150,52 +250,7 @@ def medication_schedule(request):
 def medication_interactions(request):
     try:
         patient = get_object_or_404(Patient, user=request.user)
-        medications = Medication.objects.filter(patient=patient)
-        med_names = list(medications.values_list('name', flat=True))
-        
-        if len(med_names) < 2:
-            return JsonResponse({
-                'interactions': []
-            })
-        
-        # Get interactions from both database and API
-        interactions = []
-        
-        # 1. Database interactions
-        for i in range(len(med_names)):
-            for j in range(i + 1, len(med_names)):
-                drug_a, drug_b = sorted([med_names[i], med_names[j]])
-                interaction = DrugInteraction.objects.filter(
-                    drug_a=drug_a,
-                    drug_b=drug_b,
-                    active=True
-                ).first()
-                
-                if interaction:
-                    interactions.append({
-                        'drugs': [drug_a, drug_b],
-                        'severity': interaction.severity,
-                        'description': interaction.description,
-                        'source': interaction.source
-                    })
-        
-        # 2. API interactions (with timeout and chunking)
-        try:
-            # Check interactions in smaller groups to avoid timeouts
-            chunk_size = 3
-            for i in range(0, len(med_names), chunk_size):
-                chunk = med_names[i:i + chunk_size]
-                api_interactions = check_drug_interactions(chunk)
-                if api_interactions and isinstance(api_interactions, list):
-                    interactions.extend(api_interactions)
-        except Exception as api_error:
-            logger.warning(f"API interaction check failed: {str(api_error)}")
-            # Continue with database results if API fails
-            pass
-        
-        return JsonResponse({
-            'interactions': interactions
-        }, safe=False)
+        return _interaction_report_response(patient)
     except Exception as e:
         logger.error(f"Error fetching medication interactions: {str(e)}")
         return JsonResponse({'error': str(e)}, status=500)
@@ -205,7 +260,7 @@ def medication_interactions(request):
 async def send_reminder(request):
     try:
         data = json.loads(request.body)
-        patient = get_object_or_404(Patient, id=data['patient_id'])
+        patient = await aget_object_or_404(Patient, id=data['patient_id'])
         
         if not patient.telegram_chat_id:
             return JsonResponse({
@@ -214,17 +269,13 @@ async def send_reminder(request):
             }, status=400)
         
         # Generate the reminder message
-        message = f"🔔 Medication Reminder\n\n"
-        message += f"Time to take: {data['medication']}\n"
-        message += f"Dosage: {data['dosage']}\n"
-        if 'instructions' in data:
-            message += f"\nInstructions: {data['instructions']}"
+        message = build_reminder_message(data['medication'], data['dosage'], data.get('instructions'))
         
         # Generate voice message if requested
         audio_file = None
         if data.get('voice_reminder', False):
             audio_file = await generate_voice_message(
-                f"Time to take {data['medication']}. Dosage: {data['dosage']}", 
+                voice_reminder_text(data['medication'], data['dosage']),
                 patient.language
             )
         
@@ -258,37 +309,33 @@ async def send_reminder(request):
 async def schedule_reminders(request):
     try:
         data = json.loads(request.body)
-        patient = get_object_or_404(Patient, user=request.user)
-        medication = get_object_or_404(Medication, id=data['medication_id'], patient=patient)
+        patient = await aget_object_or_404(Patient, user=request.user)
+        medication = await aget_object_or_404(Medication, id=data['medication_id'], patient=patient)
         
         # Validate schedule data
-        if not medication.schedule or 'time' not in medication.schedule:
+        if not schedule_is_valid(medication.schedule):
             return JsonResponse({
                 'status': 'error',
                 'message': 'Invalid medication schedule'
             }, status=400)
         
         # Schedule format: {'time': 'HH:MM', 'days': [0,1,2,3,4,5,6], 'startDate': 'YYYY-MM-DD', 'endDate': 'YYYY-MM-DD'}
+        # Doses are materialised here and sent by the run_reminders dispatcher
+        upcoming = await sync_to_async(schedule_medication_reminders)(
+            medication,
+            bool(data.get('voice_reminder', False))
+        )
         schedule = medication.schedule
         
-        # Create reminder message
-        message = {
-            'patient_id': patient.id,
-            'medication': medication.name,
-            'dosage': medication.dosage,
-            'schedule': schedule,
-            'voice_reminder': data.get('voice_reminder', False)
-        }
-        
-        # Here you would typically add this to a task queue (e.g., Celery)
-        # For now, we'll just return the scheduled confirmation
         return JsonResponse({
             'status': 'success',
             'message': 'Reminders scheduled successfully',
             'details': {
                 'medication': medication.name,
-                'time': schedule['time'],
-                'days': schedule['days']
+                'time': schedule.get('time'),
+                'times': schedule.get('times', [schedule['time']] if schedule.get('time') else []),
+                'days': schedule['days'],
+                'next_reminders': [timezone.localtime(at).isoformat() for at in upcoming]
             }
         })
         
@@ -309,7 +356,7 @@ async def get_alternatives(request):
             'message': 'Drug name is required'
         })
     
-    patient = get_object_or_404(Patient, user=request.user)
+    patient = await aget_object_or_404(Patient, user=request.user)
     conditions = request.GET.getlist('conditions', None)
     
     suggestions = await get_alternative_drugs(drug_name, conditions)
@@ -340,6 +387,27 @@ def report_adverse_event(request):
         'event_id': event.id
     })
 
+@login_required
+@require_http_methods(["GET"])
+def adverse_event_signals(request):
+    """Disproportionality signals from the pre-aggregated rollups (staff only)"""
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'Forbidden'}, status=403)
+    
+    try:
+        end = datetime.strptime(request.GET['end'], '%Y-%m-%d').date() if request.GET.get('end') else timezone.localdate()
+        start = datetime.strptime(request.GET['start'], '%Y-%m-%d').date() if request.GET.get('start') else end - timedelta(days=90)
+        min_count = int(request.GET.get('min_count', 1))
+    except ValueError:
+        return JsonResponse({'error': 'Invalid start, end or min_count'}, status=400)
+    
+    try:
+        report = signal_report(start, end, pairs=request.GET.get('pairs') == '1', min_count=min_count)
+        return JsonResponse({'start': start.isoformat(), 'end': end.isoformat(), **report})
+    except Exception as e:
+        logger.error(f"Error computing adverse event signals: {str(e)}")
+        return JsonResponse({'error': str(e)}, status=500)
+
 @login_required
 @require_http_methods(["DELETE"])
 def remove_medication(request, medication_id):
@@ -359,7 +427,13 @@ def medication_details(request, medication_id):
         patient = get_object_or_404(Patient, user=request.user)
         medication = get_object_or_404(Medication, id=medication_id, patient=patient)
         
-        adverse_events = AdverseEvent.objects.filter(medication=medication).order_by('-reported_date')
+        try:
+            adverse_events, next_cursor = keyset_page(
+                AdverseEvent.objects.filter(medication=medication), 'reported_date', ADVERSE_EVENT_FIELDS,
+                limit=page_limit(request), cursor=request.GET.get('cursor'), descending=True
+            )
+        except PaginationError as e:
+            return JsonResponse({'error': str(e)}, status=400)
         
         # Format schedule information
         schedule = medication.schedule if isinstance(medication.schedule, dict) else {}
@@ -370,7 +444,7 @@ def medication_details(request, medication_id):
             'endDate': schedule.get('endDate', 'Ongoing')
         }
         
-        return JsonResponse({
+        return conditional_json(request, {
             'medication': {
                 'id': medication.id,
                 'name': medication.name,
@@ -379,7 +453,8 @@ def medication_details(request, medication_id):
                 'startDate': schedule_info['startDate'],
                 'endDate': schedule_info['endDate']
             },
-            'adverse_events': list(adverse_events.values('reaction', 'severity', 'reported_date'))
+            'adverse_events': adverse_events,
+            'next_cursor': next_cursor
         })
     except Exception as e:
         logger.error(f"Error fetching medication details: {str(e)}")
@@ -0,0 +1,74 @@
+import logging
+import queue
+import threading
+from django.conf import settings
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+class BackgroundWorker:
+    """
+    In-process task queue drained by a single daemon thread.
+    Identical jobs (same task and arguments) that are already queued are
+    coalesced, so a burst of medication edits triggers one recomputation.
+    With settings.BACKGROUND_TASKS_EAGER the queue acts as a local stand-in
+    broker and runs every job inline, which keeps tests deterministic.
+    """
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._queued = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def enqueue(self, task, *args) -> bool:
+        """Schedule task(*args); returns False if an identical job is already queued"""
+        if settings.BACKGROUND_TASKS_EAGER:
+            self._run(task, args)
+            return True
+
+        job = (task, args)
+        with self._lock:
+            if job in self._queued:
+                return False
+            self._queued.add(job)
+            self._ensure_thread()
+        self._queue.put(job)
+        return True
+
+    def is_queued(self, task, *args) -> bool:
+        with self._lock:
+            return (task, args) in self._queued
+
+    def join(self):
+        """Block until every queued job has finished"""
+        self._queue.join()
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._drain, name='background-worker', daemon=True)
+            self._thread.start()
+
+    def _drain(self):
+        while True:
+            job = self._queue.get()
+            # Release the job first so changes made while it runs queue a fresh one
+            with self._lock:
+                self._queued.discard(job)
+            try:
+                self._run(*job)
+            finally:
+                close_old_connections()
+                self._queue.task_done()
+
+    def _run(self, task, args):
+        try:
+            task(*args)
+        except Exception as e:
+            logger.error(f"Background task {task.__name__} failed: {str(e)}")
+
+
+worker = BackgroundWorker()
+
+def enqueue(task, *args) -> bool:
+    return worker.enqueue(task, *args)
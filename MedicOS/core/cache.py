@@ -0,0 +1,468 @@
+import datetime
+import logging
+import os
+import pickle
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Dict, Iterable, Optional
+import msgpack
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.exceptions import ImproperlyConfigured
+from .metrics import record_cache
+
+logger = logging.getLogger(__name__)
+
+# msgpack extension types for values JSON-like types do not cover
+EXT_DATETIME = 1
+EXT_PICKLE = 2
+
+def _default(value):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return msgpack.ExtType(EXT_DATETIME, value.isoformat().encode())
+    return msgpack.ExtType(EXT_PICKLE, pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+
+def _ext_hook(code, data):
+    if code == EXT_DATETIME:
+        text = data.decode()
+        return datetime.datetime.fromisoformat(text) if 'T' in text else datetime.date.fromisoformat(text)
+    if code == EXT_PICKLE:
+        return pickle.loads(data)
+    return msgpack.ExtType(code, data)
+
+def dumps(value) -> bytes:
+    """
+    msgpack encoding; tuples come back as lists. Plain ints are stored as
+    ASCII digits so the shared tier can INCR them atomically.
+    """
+    if type(value) is int:
+        return str(value).encode()
+    return msgpack.packb(value, default=_default, use_bin_type=True)
+
+def loads(data: bytes):
+    # A top-level msgpack value never starts with an ASCII digit or '-' (those are stored ints)
+    if data[:1].isdigit() or data[:1] == b'-':
+        return int(data)
+    return msgpack.unpackb(data, ext_hook=_ext_hook, raw=False, strict_map_key=False)
+
+class LocalTier:
+    """Bounded per-process LRU of encoded values with per-entry expiry"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            data, expires = entry
+            if expires is not None and expires <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return data
+
+    def set(self, key: str, data: bytes, timeout: Optional[float]):
+        expires = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            self._entries[key] = (data, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> bool:
+        with self._lock:
+            return self._entries.pop(key, None) is not None
+
+    def incr(self, key: str, delta: int) -> Optional[int]:
+        """Add ``delta`` to a stored int in place, keeping its expiry; None if missing"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            data, expires = entry
+            if expires is not None and expires <= time.monotonic():
+                del self._entries[key]
+                return None
+            value = loads(data) + delta
+            self._entries[key] = (dumps(value), expires)
+            return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+class RedisTier:
+    """Shared tier on Redis; ``fakeredis://`` gives an in-process server for tests"""
+
+    def __init__(self, location: str):
+        if location.startswith('fakeredis://'):
+            try:
+                import fakeredis
+            except ImportError:
+                raise ImproperlyConfigured('fakeredis:// cache locations need the fakeredis package')
+            self.client = fakeredis.FakeRedis(server=_fake_server(location))
+        else:
+            try:
+                import redis
+            except ImportError:
+                raise ImproperlyConfigured('Redis cache locations need the redis package')
+            self.client = redis.Redis.from_url(location)
+        from redis import RedisError
+        self.errors = (RedisError, OSError)
+
+    def get_many(self, keys: list) -> list:
+        return self.client.mget(keys)
+
+    def set(self, key: str, data: bytes, timeout: Optional[float], only_if_missing=False) -> bool:
+        if timeout is not None and timeout <= 0:
+            self.client.delete(key)
+            return not only_if_missing
+        milliseconds = None if timeout is None else max(1, int(timeout * 1000))
+        return bool(self.client.set(key, data, px=milliseconds, nx=only_if_missing))
+
+    def set_many(self, items: Dict[str, bytes], timeout: Optional[float]):
+        pipeline = self.client.pipeline(transaction=False)
+        for key, data in items.items():
+            if timeout is not None and timeout <= 0:
+                pipeline.delete(key)
+            else:
+                pipeline.set(key, data, px=None if timeout is None else max(1, int(timeout * 1000)))
+        pipeline.execute()
+
+    def touch(self, key: str, timeout: Optional[float]) -> bool:
+        if timeout is None:
+            return bool(self.client.persist(key)) or bool(self.client.exists(key))
+        return bool(self.client.pexpire(key, max(1, int(timeout * 1000))))
+
+    def delete_many(self, keys: list) -> int:
+        return self.client.delete(*keys) if keys else 0
+
+    def incr(self, key: str, delta: int) -> Optional[int]:
+        # INCRBY would create a missing key, and Django's incr must raise instead;
+        # WATCH makes the existence check and the increment one atomic step
+        def increment(pipeline):
+            if not pipeline.exists(key):
+                return None
+            pipeline.multi()
+            pipeline.incrby(key, delta)
+
+        result = self.client.transaction(increment, key)
+        return result[0] if result else None
+
+    def clear(self, prefix: str):
+        for keys in _chunks(self.client.scan_iter(match=f"{prefix}*", count=1000), 1000):
+            self.client.delete(*keys)
+
+class FileTier:
+    """
+    Shared tier in a directory, a development fallback when there is no Redis.
+    FileBasedCache lists the whole directory on every set to cull it, so this
+    only stays fast while FILE_MAX_ENTRIES is small.
+    """
+    errors = (OSError,)
+
+    def __init__(self, location: str, params: dict, max_entries: int):
+        self.files = FileBasedCache(location, {
+            **params,
+            'KEY_FUNCTION': lambda key, prefix, version: key,
+            'OPTIONS': {'MAX_ENTRIES': max_entries},
+        })
+
+    def get_many(self, keys: list) -> list:
+        return [self.files.get(key) for key in keys]
+
+    def set(self, key: str, data: bytes, timeout: Optional[float], only_if_missing=False) -> bool:
+        if only_if_missing:
+            return self.files.add(key, data, timeout)
+        self.files.set(key, data, timeout)
+        return True
+
+    def set_many(self, items: Dict[str, bytes], timeout: Optional[float]):
+        for key, data in items.items():
+            self.files.set(key, data, timeout)
+
+    def touch(self, key: str, timeout: Optional[float]) -> bool:
+        return self.files.touch(key, timeout)
+
+    def delete_many(self, keys: list) -> int:
+        return sum(1 for key in keys if self.files.delete(key))
+
+    def incr(self, key: str, delta: int) -> Optional[int]:
+        # Not atomic across processes, like Django's own file cache
+        data = self.files.get(key)
+        if data is None:
+            return None
+        value = loads(data) + delta
+        self.files.set(key, dumps(value), self._remaining(key))
+        return value
+
+    def _remaining(self, key: str) -> Optional[float]:
+        # Keep the key's expiry; FileBasedCache files start with the pickled expiry time
+        try:
+            with open(self.files._key_to_file(key), 'rb') as f:
+                expires = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return DEFAULT_TIMEOUT
+        return None if expires is None else max(expires - time.time(), 1)
+
+    def clear(self, prefix: str):
+        self.files.clear()
+
+_fake_servers: Dict[str, object] = {}
+
+def _fake_server(location: str):
+    import fakeredis
+    return _fake_servers.setdefault(location, fakeredis.FakeServer())
+
+def _chunks(iterable: Iterable, size: int):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+class TieredCache(BaseCache):
+    """
+    Django cache backend with a bounded in-process LRU in front of a shared
+    tier that every worker sees: Redis for ``redis://``/``rediss://``/``unix://``
+    locations, an in-process fake Redis for ``fakeredis://``, otherwise a
+    directory. Values are msgpack-encoded in both tiers, so readers always get
+    a fresh copy they may mutate.
+
+    Local copies live at most LOCAL_TIMEOUT seconds, since another worker's
+    write cannot evict them; keys under LOCAL_EXCLUDE_PREFIXES (counters and
+    anything else that must be read fresh) skip the local tier entirely.
+    Hits per tier and misses are counted per STATS_PREFIXES prefix. When the
+    shared tier is unreachable every operation logs a warning and carries on
+    with the local tier alone.
+
+    OPTIONS: LOCAL_MAX_ENTRIES, LOCAL_TIMEOUT, LOCAL_EXCLUDE_PREFIXES, STATS_PREFIXES,
+    FILE_MAX_ENTRIES (directory tier only, default 1000)
+    """
+
+    def __init__(self, location, params):
+        options = params.get('OPTIONS', {})
+        super().__init__({**params, 'OPTIONS': {}})
+        self.local_timeout = options.get('LOCAL_TIMEOUT', 30)
+        self.local_exclude = tuple(options.get('LOCAL_EXCLUDE_PREFIXES', ()))
+        self.stats_prefixes = tuple(options.get('STATS_PREFIXES', ()))
+        self.local = LocalTier(options.get('LOCAL_MAX_ENTRIES', 10000))
+        if location.startswith(('redis://', 'rediss://', 'unix://', 'fakeredis://')):
+            self.shared = RedisTier(location)
+        else:
+            os.makedirs(location, exist_ok=True)
+            self.shared = FileTier(location, params, options.get('FILE_MAX_ENTRIES', 1000))
+            if not settings.DEBUG:
+                logger.warning(f"Shared cache tier is the directory {location}; set CACHE_URL to a Redis URL in production")
+        self._stats = Counter()
+        self._stats_lock = threading.Lock()
+
+    def get_backend_timeout(self, timeout=DEFAULT_TIMEOUT):
+        """Seconds from now (both tiers take relative timeouts); None never expires, <= 0 deletes"""
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        elif timeout == 0:
+            timeout = -1
+        return timeout
+
+    # Bookkeeping
+
+    def _prefix(self, key: str) -> str:
+        for prefix in self.stats_prefixes:
+            if key.startswith(prefix):
+                return prefix
+        return 'other'
+
+    def _count(self, key: str, outcome: str):
+        prefix = self._prefix(key)
+        with self._stats_lock:
+            self._stats[(prefix, outcome)] += 1
+        record_cache(prefix, outcome)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """{prefix: {'local_hits', 'shared_hits', 'misses'}} for this process"""
+        with self._stats_lock:
+            snapshot = dict(self._stats)
+        report = {}
+        for prefix in (*self.stats_prefixes, 'other'):
+            counts = {outcome: snapshot.get((prefix, outcome), 0) for outcome in ('local_hits', 'shared_hits', 'misses')}
+            lookups = sum(counts.values())
+            counts['hit_ratio'] = round((lookups - counts['misses']) / lookups, 3) if lookups else None
+            report[prefix] = counts
+        return report
+
+    def reset_stats(self):
+        with self._stats_lock:
+            self._stats.clear()
+
+    def _local_ok(self, key: str) -> bool:
+        return self.local_timeout > 0 and not key.startswith(self.local_exclude)
+
+    def _local_timeout(self, timeout):
+        return self.local_timeout if timeout is None else min(timeout, self.local_timeout)
+
+    def _remember(self, key: str, cache_key: str, data: bytes, timeout):
+        if self._local_ok(key):
+            if timeout is not None and timeout <= 0:
+                self.local.delete(cache_key)
+            else:
+                self.local.set(cache_key, data, self._local_timeout(timeout))
+
+    # Cache API
+
+    def get(self, key, default=None, version=None):
+        return self.get_many([key], version=version).get(key, default)
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        found = {}
+        remote = []
+        for key in keys:
+            cache_key = self.make_and_validate_key(key, version=version)
+            data = self.local.get(cache_key) if self._local_ok(key) else None
+            if data is not None:
+                found[key] = loads(data)
+                self._count(key, 'local_hits')
+            else:
+                remote.append((key, cache_key))
+        if not remote:
+            return found
+
+        try:
+            values = self.shared.get_many([cache_key for _, cache_key in remote])
+        except self.shared.errors as e:
+            logger.warning(f"Shared cache unavailable, treating {len(remote)} keys as misses: {str(e)}")
+            values = [None] * len(remote)
+        for (key, cache_key), data in zip(remote, values):
+            if data is None:
+                self._count(key, 'misses')
+                continue
+            found[key] = loads(data)
+            self._count(key, 'shared_hits')
+            # The shared TTL is unknown here, so the local copy gets LOCAL_TIMEOUT
+            self._remember(key, cache_key, data, None)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._store(key, value, timeout, version, only_if_missing=False)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._store(key, value, timeout, version, only_if_missing=True)
+
+    def _store(self, key, value, timeout, version, only_if_missing):
+        cache_key = self.make_and_validate_key(key, version=version)
+        timeout = self.get_backend_timeout(timeout)
+        data = dumps(value)
+        try:
+            stored = self.shared.set(cache_key, data, timeout, only_if_missing=only_if_missing)
+        except self.shared.errors as e:
+            logger.warning(f"Shared cache unavailable, keeping {key} locally only: {str(e)}")
+            stored = True
+        if stored:
+            self._remember(key, cache_key, data, timeout)
+        return stored
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        timeout = self.get_backend_timeout(timeout)
+        encoded = {}
+        for key, value in data.items():
+            cache_key = self.make_and_validate_key(key, version=version)
+            encoded[cache_key] = dumps(value)
+            self._remember(key, cache_key, encoded[cache_key], timeout)
+        try:
+            self.shared.set_many(encoded, timeout)
+        except self.shared.errors as e:
+            logger.warning(f"Shared cache unavailable, kept {len(encoded)} keys locally only: {str(e)}")
+            return list(data)
+        return []
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        cache_key = self.make_and_validate_key(key, version=version)
+        timeout = self.get_backend_timeout(timeout)
+        data = self.local.get(cache_key)
+        self.local.delete(cache_key)
+        try:
+            return self.shared.touch(cache_key, timeout)
+        except self.shared.errors as e:
+            logger.warning(f"Shared cache unavailable, touching {key} locally only: {str(e)}")
+        if data is None:
+            return False
+        self._remember(key, cache_key, data, timeout)
+        return True
+
+    def delete(self, key, version=None):
+        return bool(self.delete_many([key], version=version))
+
+    def delete_many(self, keys, version=None):
+        cache_keys = [self.make_and_validate_key(key, version=version) for key in keys]
+        deleted = sum(self.local.delete(cache_key) for cache_key in cache_keys)
+        try:
+            return self.shared.delete_many(cache_keys)
+        except self.shared.errors as e:
+            logger.warning(f"Shared cache unavailable, deleted {len(cache_keys)} keys locally only: {str(e)}")
+            return deleted
+
+    def has_key(self, key, version=None):
+        return key in self.get_many([key], version=version)
+
+    def incr(self, key, delta=1, version=None):
+        cache_key = self.make_and_validate_key(key, version=version)
+        try:
+            value = self.shared.incr(cache_key, delta)
+        except self.shared.errors as e:
+            logger.warning(f"Shared cache unavailable, incrementing {key} locally only: {str(e)}")
+            # Only keys the local tier holds can be counted; others read as missing
+            value = self.local.incr(cache_key, delta)
+        else:
+            self.local.delete(cache_key)
+        if value is None:
+            raise ValueError(f"Key '{key}' not found")
+        return value
+
+    def clear(self):
+        self.local.clear()
+        try:
+            self.shared.clear(self.key_prefix)
+        except self.shared.errors as e:
+            logger.warning(f"Shared cache unavailable, cleared the local tier only: {str(e)}")
+
+    # Async API. BaseCache runs these thread-sensitively, i.e. queued behind
+    # every sync view on one thread; local hits are answered right here and
+    # shared-tier I/O goes to a pool thread so no event loop waits on it.
+
+    async def aget(self, key, default=None, version=None):
+        if self._local_ok(key):
+            data = self.local.get(self.make_and_validate_key(key, version=version))
+            if data is not None:
+                self._count(key, 'local_hits')
+                return loads(data)
+        return await sync_to_async(self.get, thread_sensitive=False)(key, default, version)
+
+    async def aset(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return await sync_to_async(self.set, thread_sensitive=False)(key, value, timeout, version)
+
+    async def aadd(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return await sync_to_async(self.add, thread_sensitive=False)(key, value, timeout, version)
+
+    async def adelete(self, key, version=None):
+        return await sync_to_async(self.delete, thread_sensitive=False)(key, version)
+
+
+def cache_stats() -> Dict[str, Dict[str, int]]:
+    """Per-prefix hit/miss counters of the default cache, or {} for other backends"""
+    from django.core.cache import cache
+    stats = getattr(cache, 'stats', None)
+    return stats() if stats else {}
@@ -0,0 +1,158 @@
+import csv
+import io
+import json
+import logging
+import re
+import threading
+import unicodedata
+import zipfile
+from functools import lru_cache
+from typing import Dict, Iterable, Optional
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# "Paracetamol 500mg", "Lisinopril 10 mg tablets", "Amoxicillin 250mg/5ml", "Hydrocortisone 1% cream"
+DOSAGE_PATTERN = re.compile(
+    r'\b\d+(?:[.,]\d+)?\s*(?:(?:mg|mcg|µg|ug|g|ml|l|iu|units?|meq)\b|%)(?:\s*/\s*\d*(?:[.,]\d+)?\s*(?:mg|mcg|g|ml|l|dose))?',
+    re.IGNORECASE
+)
+PUNCTUATION_PATTERN = re.compile(r'[^\w\s+-]')
+
+# Dosage-form and release words that never change the active ingredient
+FORM_WORDS = frozenset({
+    'tablet', 'tablets', 'tab', 'tabs', 'capsule', 'capsules', 'cap', 'caps',
+    'oral', 'solution', 'suspension', 'syrup', 'injection', 'injectable', 'cream',
+    'ointment', 'gel', 'patch', 'drops', 'spray', 'inhaler', 'film', 'coated',
+    'chewable', 'er', 'xr', 'sr', 'xl', 'cr', 'dr', 'ir', 'extended', 'delayed',
+    'release', 'extended-release', 'delayed-release', 'hcl', 'hydrochloride',
+    'usp', 'generic',
+})
+
+# Strength and marketing qualifiers of single-ingredient products ("Tylenol Extra Strength").
+# Anything else after a brand ("PM", "with Codeine", "Cold & Flu") may be another ingredient.
+STRENGTH_WORDS = frozenset({
+    'extra', 'strength', 'regular', 'maximum', 'max', 'rapid', 'fast', 'acting',
+    'low', 'dose', 'junior', 'adult', 'adults', 'children', 'childrens', 'infant', 'infants',
+})
+
+@lru_cache(maxsize=8192)
+def normalize_drug_name(name: str) -> str:
+    """
+    Reduce a free-text medication name to its lookup form:
+    ASCII, lower case, no dosage, strength or dosage-form words.
+    """
+    ascii_name = unicodedata.normalize('NFKD', name).encode('ASCII', 'ignore').decode().lower().replace("'", '')
+    without_dosage = DOSAGE_PATTERN.sub(' ', ascii_name)
+    tokens = PUNCTUATION_PATTERN.sub(' ', without_dosage).split()
+    kept = [token for token in tokens if token not in FORM_WORDS and token not in STRENGTH_WORDS]
+    # Never reduce a name to nothing (e.g. "Oral Solution")
+    return ' '.join(kept or tokens)
+
+class DrugNameIndex:
+    """
+    In-memory hash index from brand, generic and dosage-suffixed names to a
+    canonical ingredient ID. Only exact hits on the normalized name resolve:
+    a name that merely starts with a known one ("Tylenol with Codeine",
+    "Advil PM") is a different product and keeps its own key.
+    """
+
+    def __init__(self, entries: Optional[Dict[str, str]] = None):
+        self._names: Dict[str, str] = {}
+        for name, canonical_id in (entries or {}).items():
+            self.add(name, canonical_id)
+
+    def __len__(self):
+        return len(self._names)
+
+    def add(self, name: str, canonical_id: str):
+        key = normalize_drug_name(name)
+        if key:
+            self._names.setdefault(key, normalize_drug_name(canonical_id))
+
+    def canonical_id(self, name: str) -> str:
+        """Canonical ingredient ID for ``name``, or its normalized form if unknown"""
+        key = normalize_drug_name(name)
+        return self._names.get(key) or key
+
+    def load_csv(self, stream: Iterable[str]):
+        """Rows of name,canonical_id (a header row and extra columns are fine)"""
+        for row in csv.DictReader(stream):
+            if row.get('name') and row.get('canonical_id'):
+                self.add(row['name'], row['canonical_id'])
+
+    def load_openfda_ndc(self, data: Dict):
+        """
+        openFDA NDC dump (drug-ndc-*.json). Each product's brand and generic
+        names map to its sorted active ingredients joined with '+'.
+        """
+        for product in data.get('results', []):
+            ingredients = sorted(
+                normalize_drug_name(ingredient['name'])
+                for ingredient in product.get('active_ingredients', [])
+                if ingredient.get('name')
+            )
+            canonical_id = '+'.join(ingredients) or product.get('generic_name')
+            if not canonical_id:
+                continue
+            for field in ('generic_name', 'brand_name', 'brand_name_base'):
+                if product.get(field):
+                    self.add(product[field], canonical_id)
+
+    def load_path(self, path: str):
+        """Load a .csv, an openFDA .json dump, or a .zip holding either"""
+        if path.endswith('.zip'):
+            with zipfile.ZipFile(path) as archive:
+                for member in archive.namelist():
+                    with archive.open(member) as raw:
+                        self._load_stream(member, io.TextIOWrapper(raw, encoding='utf-8'))
+        else:
+            with open(path, encoding='utf-8', newline='') as stream:
+                self._load_stream(path, stream)
+
+    def _load_stream(self, name: str, stream):
+        if name.endswith('.csv'):
+            self.load_csv(stream)
+        elif name.endswith('.json'):
+            self.load_openfda_ndc(json.load(stream))
+
+
+_index: Optional[DrugNameIndex] = None
+_index_lock = threading.Lock()
+
+def get_drug_index() -> DrugNameIndex:
+    """Process-wide index built from settings.DRUG_INDEX_PATHS on first use"""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                index = DrugNameIndex()
+                for path in settings.DRUG_INDEX_PATHS:
+                    try:
+                        index.load_path(str(path))
+                    except (OSError, ValueError, zipfile.BadZipFile) as e:
+                        logger.error(f"Could not load drug index {path}: {str(e)}")
+                logger.info(f"Drug name index loaded with {len(index)} names")
+                _index = index
+    return _index
+
+@lru_cache(maxsize=8192)
+def canonical_drug_id(name: str) -> str:
+    return get_drug_index().canonical_id(name)
+
+def sanitize_drug_name(name):
+    """Normalize and sanitize drug names for API calls"""
+    # Normalize unicode characters (e.g., combining diacritical marks)
+    normalized = unicodedata.normalize('NFKD', name)
+    # Remove non-ASCII characters
+    ascii_name = normalized.encode('ASCII', 'ignore').decode()
+    # Clean up any double spaces and trim
+    cleaned = re.sub(r'\s+', ' ', ascii_name).strip()
+    return cleaned
+
+def canonical_drug_name(name):
+    """
+    Canonical ingredient ID used for interaction caching, storage and
+    de-duplication, so brand, generic and dosage-suffixed names share one key
+    """
+    return canonical_drug_id(sanitize_drug_name(name))
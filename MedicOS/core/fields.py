@@ -0,0 +1,160 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Iterable, Iterator, List, Optional, Sequence
+from django.db import models
+from django.db.models.query_utils import DeferredAttribute
+from django_cryptography.fields import get_encrypted_field
+
+class EncryptedValue:
+    """
+    Ciphertext of an encrypted column as loaded from the database, decrypted
+    on first use. ``str()`` gives the plaintext.
+    """
+    __slots__ = ('token', 'field', '_plaintext')
+
+    def __init__(self, token: bytes, field):
+        self.token = token
+        self.field = field
+        self._plaintext = None
+
+    def decrypt(self):
+        if self._plaintext is None:
+            self._plaintext = self.field._load(self.token)
+        return self._plaintext
+
+    def __str__(self):
+        return str(self.decrypt())
+
+    def __repr__(self):
+        return f"<EncryptedValue {self.field.name}>"
+
+class LazyDecryptAttribute(DeferredAttribute):
+    """Model attribute that decrypts an EncryptedValue the first time it is read"""
+
+    def __get__(self, instance, cls=None):
+        if instance is None:
+            return self
+        value = super().__get__(instance, cls)
+        if isinstance(value, EncryptedValue):
+            value = instance.__dict__[self.field.attname] = value.decrypt()
+        return value
+
+    def __set__(self, instance, value):
+        instance.__dict__[self.field.attname] = value
+
+class LazyEncryptedMixin:
+    """
+    Encrypted field that skips decryption when rows are loaded. Instances hold
+    the ciphertext until the attribute is read, and rows saved without touching
+    the field write the stored ciphertext back unchanged. ``values()`` rows only
+    stay encrypted on a PlaintextValuesQuerySet asked for ``ciphertext()``.
+    The on-disk format is django-cryptography's.
+    """
+    descriptor_class = LazyDecryptAttribute
+
+    def from_db_value(self, value, *args, **kwargs):
+        if value is None:
+            return value
+        return EncryptedValue(bytes(value), self)
+
+    def pre_save(self, model_instance, add):
+        # Read past the descriptor so an untouched value is not decrypted just to be re-encrypted
+        return model_instance.__dict__.get(self.attname)
+
+    def get_db_prep_value(self, value, connection, prepared=False):
+        if isinstance(value, EncryptedValue):
+            return connection.Database.Binary(value.token)
+        return super().get_db_prep_value(value, connection, prepared)
+
+class LazyEncryptedTextField(LazyEncryptedMixin, get_encrypted_field(models.TextField)):
+    pass
+
+def _plaintext(value):
+    return value.decrypt() if isinstance(value, EncryptedValue) else value
+
+def _plaintext_row(row):
+    if isinstance(row, dict):
+        return {name: _plaintext(value) for name, value in row.items()}
+    if isinstance(row, tuple):
+        values = [_plaintext(value) for value in row]
+        # values_list(named=True) rows are namedtuples
+        return row._make(values) if hasattr(row, '_make') else tuple(values)
+    return _plaintext(row)
+
+@lru_cache(maxsize=None)
+def _plaintext_iterable(iterable_class):
+    class PlaintextIterable(iterable_class):
+        ciphertext_class = iterable_class
+
+        def __iter__(self):
+            for row in super().__iter__():
+                yield _plaintext_row(row)
+
+    PlaintextIterable.__name__ = f'Plaintext{iterable_class.__name__}'
+    return PlaintextIterable
+
+class PlaintextValuesQuerySet(models.QuerySet):
+    """
+    QuerySet for models with lazily encrypted fields whose ``values()`` and
+    ``values_list()`` rows hold plaintext, as with the eager fields. Bulk
+    readers that decrypt themselves (see BulkDecryptor) call ``ciphertext()``
+    after ``values()``/``values_list()`` to get EncryptedValues instead.
+    """
+
+    def values(self, *fields, **expressions):
+        clone = super().values(*fields, **expressions)
+        clone._iterable_class = _plaintext_iterable(clone._iterable_class)
+        return clone
+
+    def values_list(self, *fields, flat=False, named=False):
+        clone = super().values_list(*fields, flat=flat, named=named)
+        clone._iterable_class = _plaintext_iterable(clone._iterable_class)
+        return clone
+
+    def ciphertext(self):
+        clone = self._chain()
+        clone._iterable_class = getattr(clone._iterable_class, 'ciphertext_class', clone._iterable_class)
+        return clone
+
+class BulkDecryptor:
+    """
+    Decrypts many tokens of one encrypted field for exports, in batches spread
+    over a thread pool. Every token goes through the field's own decrypt path,
+    so the token format, TTL and Expired handling stay django-cryptography's.
+    """
+
+    def __init__(self, field, batch_size: int = 2048, workers: int = 4):
+        self.field = field
+        self.batch_size = batch_size
+        self.workers = workers
+
+    def _decrypt_batch(self, tokens: Sequence[Optional[bytes]]) -> list:
+        return [None if token is None else self.field._load(token) for token in tokens]
+
+    def decrypt_many(self, tokens: Iterable) -> List:
+        """Plaintexts for raw tokens or EncryptedValues (None stays None), in order"""
+        tokens = [token.token if isinstance(token, EncryptedValue) else token for token in tokens]
+        batches = [tokens[i:i + self.batch_size] for i in range(0, len(tokens), self.batch_size)]
+        if self.workers <= 1 or len(batches) <= 1:
+            results = map(self._decrypt_batch, batches)
+        else:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                results = list(pool.map(self._decrypt_batch, batches))
+        return [value for batch in results for value in batch]
+
+    def iter_rows(self, rows: Iterable[Sequence], column: int, chunk_size: int = 10000) -> Iterator[list]:
+        """Rows (e.g. from values_list().ciphertext()) with ``column`` decrypted, chunk by chunk"""
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                yield from self._decrypt_rows(chunk, column)
+                chunk = []
+        yield from self._decrypt_rows(chunk, column)
+
+    def _decrypt_rows(self, rows: List[Sequence], column: int) -> Iterator[list]:
+        plaintexts = self.decrypt_many(row[column] for row in rows)
+        for row, plaintext in zip(rows, plaintexts):
+            row = list(row)
+            row[column] = plaintext
+            yield row
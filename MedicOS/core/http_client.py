@@ -0,0 +1,268 @@
+import asyncio
+import atexit
+import concurrent.futures
+import json
+import logging
+import threading
+import time
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+import aiohttp
+from django.conf import settings
+from .metrics import record_upstream
+from .resilience import AdaptiveLimiter, CircuitBreaker
+
+logger = logging.getLogger(__name__)
+
+class UpstreamError(Exception):
+    """Transport failure, timeout or error status from an outbound call"""
+
+    def __init__(self, message, host=None, status=None):
+        super().__init__(message)
+        self.host = host
+        self.status = status
+
+class CircuitOpenError(UpstreamError):
+    """Raised without touching the network while an upstream's breaker is open"""
+
+class ConcurrencyLimitError(UpstreamError):
+    """Raised without touching the network when no concurrency slot freed up in time"""
+
+class UpstreamResponse:
+    """Fully read response, safe to hand across threads and event loops"""
+
+    def __init__(self, url: str, status: int, headers: Dict[str, str], body: bytes):
+        self.url = url
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    @property
+    def ok(self) -> bool:
+        return 200 <= self.status < 300
+
+    @property
+    def text(self) -> str:
+        return self.body.decode('utf-8', errors='replace')
+
+    def json(self):
+        return json.loads(self.body)
+
+    def raise_for_status(self):
+        if not self.ok:
+            raise UpstreamError(
+                f"{self.status} response from {self.url}",
+                host=urlsplit(self.url).netloc,
+                status=self.status
+            )
+
+class HostMetrics:
+    """Counters for one upstream host"""
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.rejected = 0
+        self.in_flight = 0
+        self.total_seconds = 0.0
+        self.statuses: Dict[int, int] = {}
+
+    def snapshot(self) -> Dict:
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'rejected': self.rejected,
+            'in_flight': self.in_flight,
+            'total_seconds': round(self.total_seconds, 6),
+            'avg_seconds': round(self.total_seconds / self.requests, 6) if self.requests else 0.0,
+            'statuses': dict(self.statuses),
+        }
+
+class HttpClient:
+    """
+    App-scoped outbound HTTP client.
+    A background event loop owns one keep-alive aiohttp session per upstream
+    host, with default timeouts and DNS caching. Async callers on any loop use
+    ``await request(...)``; sync views and tasks use ``request_sync(...)``.
+    """
+
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._sessions: Dict[str, aiohttp.ClientSession] = {}
+        self._metrics: Dict[str, HostMetrics] = {}
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._limiters: Dict[str, AdaptiveLimiter] = {}
+        self._lock = threading.Lock()
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None or self._loop.is_closed():
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(
+                    target=self._loop.run_forever,
+                    name='http-client-loop',
+                    daemon=True
+                ).start()
+                atexit.register(self.close)
+            return self._loop
+
+    def _on_loop(self) -> bool:
+        try:
+            return asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            return False
+
+    def _session_for(self, host: str) -> aiohttp.ClientSession:
+        # Only ever called on the client loop, so no locking needed
+        session = self._sessions.get(host)
+        if session is None or session.closed:
+            session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit_per_host=settings.HTTP_CLIENT_POOL_SIZE,
+                    ttl_dns_cache=settings.HTTP_CLIENT_DNS_TTL,
+                    keepalive_timeout=settings.HTTP_CLIENT_KEEPALIVE
+                ),
+                timeout=aiohttp.ClientTimeout(total=settings.HTTP_CLIENT_TIMEOUT)
+            )
+            self._sessions[host] = session
+        return session
+
+    def _breaker_for(self, host: str) -> CircuitBreaker:
+        breaker = self._breakers.get(host)
+        if breaker is None:
+            breaker = self._breakers[host] = CircuitBreaker(
+                failure_threshold=settings.HTTP_CIRCUIT_FAILURE_THRESHOLD,
+                reset_timeout=settings.HTTP_CIRCUIT_RESET_TIMEOUT
+            )
+        return breaker
+
+    def _limiter_for(self, host: str) -> AdaptiveLimiter:
+        limiter = self._limiters.get(host)
+        if limiter is None:
+            limiter = self._limiters[host] = AdaptiveLimiter(
+                initial=settings.HTTP_CONCURRENCY_INITIAL,
+                minimum=1,
+                maximum=settings.HTTP_CLIENT_POOL_SIZE,
+                slow_seconds=settings.HTTP_CONCURRENCY_SLOW_SECONDS,
+                queue_timeout=settings.HTTP_CONCURRENCY_QUEUE_TIMEOUT
+            )
+        return limiter
+
+    async def _request(self, method: str, url: str, timeout: Optional[float] = None, **kwargs) -> UpstreamResponse:
+        host = urlsplit(url).netloc
+        metrics = self._metrics.setdefault(host, HostMetrics())
+        breaker = self._breaker_for(host)
+        limiter = self._limiter_for(host)
+        if timeout is not None:
+            kwargs['timeout'] = aiohttp.ClientTimeout(total=timeout)
+
+        # Fail fast instead of queueing behind a service that is down or saturated
+        if breaker.is_open():
+            metrics.rejected += 1
+            raise CircuitOpenError(f"Circuit open for {host}", host=host)
+        if not await limiter.acquire():
+            metrics.rejected += 1
+            raise ConcurrencyLimitError(f"Concurrency limit reached for {host}", host=host)
+        if not breaker.allow():
+            # Another caller took the half-open probe while we were queued
+            limiter.cancel()
+            metrics.rejected += 1
+            raise CircuitOpenError(f"Circuit open for {host}", host=host)
+
+        metrics.requests += 1
+        metrics.in_flight += 1
+        started = time.perf_counter()
+        healthy = False
+        try:
+            async with self._session_for(host).request(method, url, **kwargs) as response:
+                body = await response.read()
+                metrics.statuses[response.status] = metrics.statuses.get(response.status, 0) + 1
+                healthy = response.status < 500 and response.status != 429
+                if not healthy:
+                    metrics.errors += 1
+                return UpstreamResponse(str(response.url), response.status, dict(response.headers), body)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            metrics.errors += 1
+            raise UpstreamError(f"{method} {url} failed: {type(e).__name__} {str(e)}", host=host) from e
+        finally:
+            elapsed = time.perf_counter() - started
+            metrics.in_flight -= 1
+            metrics.total_seconds += elapsed
+            record_upstream(host, elapsed, healthy)
+            limiter.release(healthy, elapsed)
+            if healthy:
+                breaker.record_success()
+            else:
+                breaker.record_failure()
+
+    def _call_on_loop(self, func, *args):
+        """Run a plain function on the client loop, which owns breakers, limiters and metrics"""
+        if self._on_loop() or self._loop is None or self._loop.is_closed():
+            # Nothing else touches the state before the loop starts
+            return func(*args)
+
+        async def call():
+            return func(*args)
+
+        return self.run(call())
+
+    def _circuit_open(self, host: str) -> bool:
+        breaker = self._breakers.get(host)
+        return breaker is not None and breaker.is_open()
+
+    def circuit_open(self, url: str) -> bool:
+        """Whether calls to this URL's host are currently being rejected"""
+        return self._call_on_loop(self._circuit_open, urlsplit(url).netloc)
+
+    async def request(self, method: str, url: str, **kwargs) -> UpstreamResponse:
+        """Perform a request from any event loop"""
+        return await self.run_async(self._request(method, url, **kwargs))
+
+    async def run_async(self, coro):
+        """Await a coroutine on the client loop from any event loop"""
+        if self._on_loop():
+            return await coro
+        return await asyncio.wrap_future(self.submit(coro))
+
+    def request_sync(self, method: str, url: str, **kwargs) -> UpstreamResponse:
+        """Blocking facade for sync views and tasks"""
+        return self.run(self._request(method, url, **kwargs))
+
+    def submit(self, coro) -> concurrent.futures.Future:
+        """Schedule a coroutine on the client loop without waiting for it"""
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop())
+
+    def run(self, coro, timeout: Optional[float] = None):
+        """Run a coroutine on the client loop and block until it finishes"""
+        if self._on_loop():
+            raise RuntimeError("HttpClient.run() would deadlock on the client loop; await instead")
+        return self.submit(coro).result(timeout)
+
+    def _metrics_snapshot(self) -> Dict[str, Dict]:
+        snapshot = {}
+        for host, metrics in self._metrics.items():
+            snapshot[host] = metrics.snapshot()
+            snapshot[host]['circuit'] = self._breaker_for(host).snapshot()
+            snapshot[host]['concurrency'] = self._limiter_for(host).snapshot()
+        return snapshot
+
+    def metrics(self) -> Dict[str, Dict]:
+        """Per-host counters, circuit state and adaptive concurrency limit"""
+        return self._call_on_loop(self._metrics_snapshot)
+
+    def close(self):
+        if self._loop is None or self._loop.is_closed() or not self._sessions:
+            return
+
+        async def close_sessions():
+            for session in self._sessions.values():
+                await session.close()
+            self._sessions.clear()
+
+        try:
+            self.run(close_sessions(), timeout=5)
+        except Exception as e:
+            logger.warning(f"Error closing HTTP sessions: {str(e)}")
+
+
+http_client = HttpClient()
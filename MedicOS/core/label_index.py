@@ -0,0 +1,210 @@
+import io
+import json
+import logging
+import os
+import sqlite3
+import threading
+import zipfile
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS passages USING fts5(
+    label_id UNINDEXED,
+    drugs,
+    text,
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+WHITESPACE = ' \t\r\n'
+
+def iter_label_records(stream, chunk_size: int = 1 << 20) -> Iterator[Dict]:
+    """
+    Yield the objects of an openFDA bulk file's top-level "results" array one
+    at a time. The text stream is read in chunks; the top-level keys, the
+    values before "results" (the "meta" block, which has a "results" object of
+    its own) and each label are decoded with raw_decode, so memory stays
+    bounded by the largest single label.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+
+    def fill() -> bool:
+        nonlocal buffer, position
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            return False
+        buffer = buffer[position:] + chunk
+        position = 0
+        return True
+
+    def skip(characters: str) -> bool:
+        """Move past ``characters``; False at the end of the input"""
+        nonlocal position
+        while True:
+            while position < len(buffer) and buffer[position] in characters:
+                position += 1
+            if position < len(buffer):
+                return True
+            if not fill():
+                return False
+
+    def decode():
+        nonlocal position
+        while True:
+            try:
+                value, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                # Value continues in the next chunk
+                if not fill():
+                    raise
+                continue
+            if end == len(buffer) and fill():
+                # A number or literal may continue in the next chunk
+                continue
+            position = end
+            return value
+
+    if not skip(WHITESPACE):
+        return
+    if buffer[position] != '{':
+        raise json.JSONDecodeError('Expected a JSON object', buffer, position)
+    position += 1
+    while True:
+        if not skip(WHITESPACE + ',') or buffer[position] == '}':
+            return
+        key = decode()
+        if not skip(WHITESPACE + ':'):
+            return
+        if key == 'results' and buffer[position] == '[':
+            position += 1
+            break
+        decode()
+
+    while True:
+        if not skip(WHITESPACE + ',') or buffer[position] == ']':
+            return
+        yield decode()
+
+def label_passages(record: Dict) -> Optional[Tuple[str, str, List[str]]]:
+    """(label id, drug names, interaction sections) for a label, or None if it has none"""
+    sections = record.get('drug_interactions') or []
+    if not sections:
+        return None
+    openfda = record.get('openfda', {})
+    names = set()
+    for field in ('generic_name', 'brand_name', 'substance_name'):
+        names.update(name.lower() for name in openfda.get(field, []))
+    if not names:
+        return None
+    label_id = record.get('id') or record.get('set_id') or ''
+    return label_id, ' ; '.join(sorted(names)), sections
+
+def open_label_files(paths: Iterable[str]) -> Iterator[Tuple[str, Iterable[str]]]:
+    """(name, text stream) for every .json file in the given paths, reading inside .zip archives"""
+    for path in paths:
+        if path.endswith('.zip'):
+            with zipfile.ZipFile(path) as archive:
+                for member in archive.namelist():
+                    if member.endswith('.json'):
+                        with archive.open(member) as raw:
+                            yield member, io.TextIOWrapper(raw, encoding='utf-8')
+        else:
+            with open(path, encoding='utf-8') as stream:
+                yield path, stream
+
+def _fts_phrase(value: str) -> str:
+    return '"' + value.replace('"', '""') + '"'
+
+class LabelIndex:
+    """
+    Local SQLite FTS5 index of openFDA label interaction sections, keyed by
+    the labelled drug's generic, brand and substance names.
+    Built offline by ``manage.py ingest_fda_labels``; read-only at runtime.
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._local = threading.local()
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def _reader(self) -> sqlite3.Connection:
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+            self._local.connection = connection
+        return connection
+
+    def passages_for(self, drug: str, limit: int = 5) -> Dict[str, List[str]]:
+        """Interaction sections of up to ``limit`` labels for ``drug``, grouped by label id"""
+        rows = self._reader().execute(
+            """
+            SELECT label_id, text FROM passages
+            WHERE label_id IN (
+                SELECT DISTINCT label_id FROM passages WHERE drugs MATCH ? LIMIT ?
+            )
+            """,
+            (_fts_phrase(drug), limit)
+        ).fetchall()
+        labels: Dict[str, List[str]] = {}
+        for label_id, text in rows:
+            labels.setdefault(label_id, []).append(text)
+        return labels
+
+    def ingest(self, records: Iterable[Dict], batch_size: int = 1000) -> Tuple[int, int]:
+        """Append labels to the index; returns (labels, passages) written"""
+        connection = sqlite3.connect(self.path)
+        try:
+            connection.executescript(SCHEMA)
+            # Built into a scratch file that is swapped in afterwards, so durability is moot
+            connection.execute('PRAGMA journal_mode = OFF')
+            connection.execute('PRAGMA synchronous = OFF')
+            labels = passages = 0
+            batch = []
+            for record in records:
+                parsed = label_passages(record)
+                if parsed is None:
+                    continue
+                label_id, drugs, sections = parsed
+                batch.extend((label_id, drugs, section) for section in sections)
+                labels += 1
+                if len(batch) >= batch_size:
+                    passages += self._write(connection, batch)
+                    batch = []
+            passages += self._write(connection, batch)
+            connection.execute("INSERT INTO passages(passages) VALUES ('optimize')")
+            connection.commit()
+            return labels, passages
+        finally:
+            connection.close()
+
+    @staticmethod
+    def _write(connection: sqlite3.Connection, batch: List[Tuple[str, str, str]]) -> int:
+        if batch:
+            with connection:
+                connection.executemany('INSERT INTO passages (label_id, drugs, text) VALUES (?, ?, ?)', batch)
+        return len(batch)
+
+    def set_meta(self, key: str, value: str):
+        connection = sqlite3.connect(self.path)
+        try:
+            with connection:
+                connection.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (key, value))
+        finally:
+            connection.close()
+
+
+_index: Optional[LabelIndex] = None
+
+def get_label_index() -> Optional[LabelIndex]:
+    """The configured local label index, or None until it has been built"""
+    global _index
+    if _index is None:
+        _index = LabelIndex(settings.OPENFDA_LABEL_INDEX_PATH)
+    return _index if _index.exists() else None
@@ -0,0 +1,70 @@
+import json
+import time
+from django.core.management.base import BaseCommand
+from django_cryptography.fields import EncryptedMixin
+from core.fields import BulkDecryptor, EncryptedValue
+from core.models import AdverseEvent
+
+SAMPLE_NOTES = [
+    "Rash on both forearms two days after starting, resolved after stopping.",
+    "Mild nausea in the mornings.",
+    "",
+    "Patient reported dizziness when standing up quickly; BP 100/60 at the clinic visit, advised to rise slowly "
+    "and to keep a symptom diary until the next appointment.",
+    "Headache.",
+]
+
+class Command(BaseCommand):
+    help = 'Rows per second for loading encrypted AdverseEvent.notes: eager vs lazy decryption and bulk export'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=20000, help='Synthetic encrypted notes to decrypt')
+        parser.add_argument('--workers', type=int, default=4, help='Threads for the bulk path')
+        parser.add_argument('--batch-size', type=int, default=2048, help='Notes per thread pool task in the bulk path')
+        parser.add_argument('--repeat', type=int, default=3, help='Timed passes (best is reported)')
+        parser.add_argument('--json', action='store_true', help='Print results as JSON')
+
+    def handle(self, *args, **options):
+        field = AdverseEvent._meta.get_field('notes')
+        # Ciphertexts exactly as the column stores them
+        notes = [SAMPLE_NOTES[i % len(SAMPLE_NOTES)] + str(i) for i in range(options['rows'])]
+        tokens = [field._dump(note) for note in notes]
+
+        def best_of(run):
+            timings = []
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                result = run()
+                timings.append(time.perf_counter() - started)
+            return min(timings), result
+
+        # What the plain encrypt() field did for every loaded row
+        eager_seconds, eager = best_of(lambda: [EncryptedMixin._load(field, token) for token in tokens])
+        # Loading rows that never read the notes
+        lazy_seconds, _ = best_of(lambda: [field.from_db_value(token, None, None) for token in tokens])
+        # Loading rows and then reading every note
+        lazy_read_seconds, _ = best_of(lambda: [field.from_db_value(token, None, None).decrypt() for token in tokens])
+        serial = BulkDecryptor(field, batch_size=options['batch_size'], workers=1)
+        bulk_seconds, bulk = best_of(lambda: serial.decrypt_many(tokens))
+        threaded = BulkDecryptor(field, batch_size=options['batch_size'], workers=options['workers'])
+        threaded_seconds, threaded_bulk = best_of(lambda: threaded.decrypt_many(tokens))
+        assert isinstance(field.from_db_value(tokens[0], None, None), EncryptedValue)
+
+        def rate(seconds):
+            return round(len(tokens) / seconds) if seconds else None
+
+        results = {
+            'rows': len(tokens),
+            'eager_rows_per_second': rate(eager_seconds),
+            'lazy_unread_rows_per_second': rate(lazy_seconds),
+            'lazy_read_rows_per_second': rate(lazy_read_seconds),
+            'bulk_rows_per_second': rate(bulk_seconds),
+            'bulk_threaded_rows_per_second': rate(threaded_seconds),
+            'workers': options['workers'],
+            'bulk_matches_eager': bulk == eager == notes and threaded_bulk == eager,
+        }
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for key, value in results.items():
+            self.stdout.write(f"{key}: {value}")
@@ -0,0 +1,101 @@
+import json
+import time
+import zipfile
+from django.core.management.base import BaseCommand, CommandError
+from core.severity import classifier, classify_severity
+
+# Sentences in the style of FDA label drug_interactions sections, used when no dump is given
+SAMPLE_SECTIONS = [
+    "Concomitant use with strong CYP3A4 inhibitors is contraindicated.",
+    "Monitor INR closely when warfarin is co-administered; dose adjustment may be required.",
+    "No clinically significant interaction was observed with digoxin, so no need to avoid the combination.",
+    "Use with caution in patients receiving other CNS depressants.",
+    "Coadministration may increase plasma concentrations of simvastatin. Avoid doses above 20 mg.",
+    "No dose adjustment is necessary when given with antacids.",
+    "Fatal respiratory depression has occurred with concomitant benzodiazepines.",
+    "Consider therapeutic drug monitoring of lithium.",
+]
+
+def legacy_calculate_severity(description):
+    """The substring scan this classifier replaced, kept as the benchmark baseline"""
+    description_lower = description.lower()
+    high_risk_phrases = [
+        'severe', 'significant', 'dangerous', 'avoid', 'contraindicated',
+        'high risk', 'stop', 'do not', 'fatal', 'life-threatening'
+    ]
+    medium_risk_phrases = [
+        'moderate', 'monitor', 'caution', 'may increase', 'watch for',
+        'be careful', 'adjust', 'consider'
+    ]
+    if any(phrase in description_lower for phrase in high_risk_phrases):
+        return 3
+    elif any(phrase in description_lower for phrase in medium_risk_phrases):
+        return 2
+    return 1
+
+def load_label_sections(path):
+    """drug_interactions passages from an openFDA drug label dump (.json or .zip)"""
+    if path.endswith('.zip'):
+        with zipfile.ZipFile(path) as archive:
+            documents = [json.load(archive.open(member)) for member in archive.namelist() if member.endswith('.json')]
+    else:
+        with open(path, encoding='utf-8') as stream:
+            documents = [json.load(stream)]
+    return [
+        section
+        for document in documents
+        for label in document.get('results', [])
+        for section in label.get('drug_interactions', [])
+    ]
+
+class Command(BaseCommand):
+    help = 'Benchmark the severity classifier against the legacy substring scan on FDA label text'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--labels', help='openFDA drug label dump (drug-label-*.json[.zip])')
+        parser.add_argument('--repeat', type=int, default=3, help='Timed passes over the corpus (best is reported)')
+        parser.add_argument('--json', action='store_true', help='Print results as JSON')
+
+    def handle(self, *args, **options):
+        if options['labels']:
+            try:
+                corpus = load_label_sections(options['labels'])
+            except (OSError, ValueError, zipfile.BadZipFile) as e:
+                raise CommandError(f"Could not read {options['labels']}: {str(e)}")
+        else:
+            corpus = SAMPLE_SECTIONS * 2500
+        if not corpus:
+            raise CommandError('No drug_interactions sections found')
+
+        def best_of(run):
+            timings = []
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                result = run()
+                timings.append(time.perf_counter() - started)
+            return min(timings), result
+
+        legacy_seconds, legacy = best_of(lambda: [legacy_calculate_severity(text) for text in corpus])
+        single_seconds, levels = best_of(lambda: [classifier.classify(text) for text in corpus])
+        batch_seconds, _ = best_of(lambda: classifier.classify_many(corpus))
+        classify_severity.cache_clear()
+        cached_seconds, _ = best_of(lambda: [classify_severity(text) for text in corpus])
+
+        changed = sum(1 for old, new in zip(legacy, levels) if old != new)
+        results = {
+            'documents': len(corpus),
+            'unique_documents': len(set(corpus)),
+            'characters': sum(len(text) for text in corpus),
+            'legacy_seconds': round(legacy_seconds, 4),
+            'classifier_seconds': round(single_seconds, 4),
+            'classifier_batch_seconds': round(batch_seconds, 4),
+            'classify_severity_seconds': round(cached_seconds, 4),
+            'classifier_docs_per_second': round(len(corpus) / single_seconds) if single_seconds else None,
+            'changed_levels': changed,
+            'distribution': {level: levels.count(level) for level in (1, 2, 3)},
+        }
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for key, value in results.items():
+            self.stdout.write(f"{key}: {value}")
@@ -0,0 +1,198 @@
+import threading
+import time
+from collections import Counter, defaultdict
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+# Request duration histogram buckets (seconds)
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+class RequestMetrics:
+    """
+    What one request spent on the database, upstream HTTP and the cache.
+    Lives in a context variable, which asgiref copies into sync_to_async
+    threads and asyncio copies into tasks scheduled on the HTTP client loop,
+    so work done on the request's behalf anywhere is attributed to it.
+    """
+    __slots__ = ('started', 'view', 'db_queries', 'db_seconds', 'upstream', 'cache', '_lock')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.view: Optional[str] = None
+        self.db_queries = 0
+        self.db_seconds = 0.0
+        self.upstream: Dict[str, List] = {}  # host -> [calls, errors, seconds]
+        self.cache = Counter()  # (prefix, outcome) -> lookups
+        self._lock = threading.Lock()
+
+    def add_query(self, seconds: float):
+        with self._lock:
+            self.db_queries += 1
+            self.db_seconds += seconds
+
+    def add_upstream(self, host: str, seconds: float, ok: bool):
+        with self._lock:
+            entry = self.upstream.setdefault(host, [0, 0, 0.0])
+            entry[0] += 1
+            entry[1] += 0 if ok else 1
+            entry[2] += seconds
+
+    def add_cache(self, prefix: str, outcome: str):
+        with self._lock:
+            self.cache[(prefix, outcome)] += 1
+
+    def server_timing(self, total_seconds: float) -> str:
+        """Server-Timing header value; durations in milliseconds"""
+        parts = [f'db;dur={self.db_seconds * 1000:.1f};desc="{self.db_queries} queries"']
+        if self.upstream:
+            calls = sum(entry[0] for entry in self.upstream.values())
+            seconds = sum(entry[2] for entry in self.upstream.values())
+            hosts = ', '.join(f"{host}={entry[0]}" for host, entry in sorted(self.upstream.items()))
+            parts.append(f'upstream;dur={seconds * 1000:.1f};desc="{calls} calls: {hosts}"')
+        if self.cache:
+            misses = sum(count for (_, outcome), count in self.cache.items() if outcome == 'misses')
+            hits = sum(self.cache.values()) - misses
+            parts.append(f'cache;desc="{hits} hits, {misses} misses"')
+        parts.append(f'total;dur={total_seconds * 1000:.1f}')
+        return ', '.join(parts)
+
+
+_current: ContextVar[Optional[RequestMetrics]] = ContextVar('request_metrics', default=None)
+
+def begin_request() -> Tuple[RequestMetrics, object]:
+    metrics = RequestMetrics()
+    return metrics, _current.set(metrics)
+
+def end_request(token):
+    _current.reset(token)
+
+def current_request() -> Optional[RequestMetrics]:
+    return _current.get()
+
+def record_upstream(host: str, seconds: float, ok: bool):
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.add_upstream(host, seconds, ok)
+
+def record_cache(prefix: str, outcome: str):
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.add_cache(prefix, outcome)
+
+def _record_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.add_query(time.perf_counter() - started)
+
+def _attach_query_recorder(sender=None, connection=None, **kwargs):
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+def install_query_recorder():
+    """Time queries on every connection, including those other threads open later"""
+    connection_created.connect(_attach_query_recorder, dispatch_uid='core.metrics.query_recorder')
+    for existing in connections.all(initialized_only=True):
+        _attach_query_recorder(connection=existing)
+
+class Registry:
+    """Process-wide request, query and duration counters behind /metrics"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = Counter()  # (view, method, status)
+        self.durations: Dict[str, List[float]] = defaultdict(lambda: [0] * len(DURATION_BUCKETS) + [0, 0.0])
+        self.db_queries = Counter()  # view
+        self.db_seconds: Dict[str, float] = defaultdict(float)
+
+    def observe(self, metrics: RequestMetrics, method: str, status: int, seconds: float):
+        view = metrics.view or 'unresolved'
+        with self._lock:
+            self.requests[(view, method, str(status))] += 1
+            histogram = self.durations[view]
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if seconds <= bound:
+                    histogram[i] += 1
+            histogram[-2] += 1
+            histogram[-1] += seconds
+            self.db_queries[view] += metrics.db_queries
+            self.db_seconds[view] += metrics.db_seconds
+
+    def snapshot(self):
+        with self._lock:
+            return (
+                dict(self.requests),
+                {view: list(histogram) for view, histogram in self.durations.items()},
+                dict(self.db_queries),
+                dict(self.db_seconds),
+            )
+
+
+registry = Registry()
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(**labels) -> str:
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+def render_prometheus() -> str:
+    """
+    Prometheus text exposition of this process's counters. Every worker
+    keeps its own, so scrape each worker or aggregate by instance.
+    """
+    from .cache import cache_stats
+    from .http_client import http_client
+
+    requests, durations, db_queries, db_seconds = registry.snapshot()
+    lines = []
+
+    def family(name: str, kind: str, description: str):
+        lines.append(f"# HELP {name} {description}")
+        lines.append(f"# TYPE {name} {kind}")
+
+    family('medicos_http_requests_total', 'counter', 'Requests by view, method and status')
+    for (view, method, status), count in sorted(requests.items()):
+        lines.append(f"medicos_http_requests_total{_labels(view=view, method=method, status=status)} {count}")
+
+    family('medicos_http_request_duration_seconds', 'histogram', 'Request duration by view')
+    for view, histogram in sorted(durations.items()):
+        for bound, count in zip(DURATION_BUCKETS, histogram):
+            lines.append(f"medicos_http_request_duration_seconds_bucket{_labels(view=view, le=bound)} {count}")
+        lines.append(f"medicos_http_request_duration_seconds_bucket{_labels(view=view, le='+Inf')} {histogram[-2]}")
+        lines.append(f"medicos_http_request_duration_seconds_count{_labels(view=view)} {histogram[-2]}")
+        lines.append(f"medicos_http_request_duration_seconds_sum{_labels(view=view)} {histogram[-1]:.6f}")
+
+    family('medicos_db_queries_total', 'counter', 'Database queries issued while serving requests, by view')
+    for view, count in sorted(db_queries.items()):
+        lines.append(f"medicos_db_queries_total{_labels(view=view)} {count}")
+    family('medicos_db_query_seconds_total', 'counter', 'Time spent in database queries, by view')
+    for view, seconds in sorted(db_seconds.items()):
+        lines.append(f"medicos_db_query_seconds_total{_labels(view=view)} {seconds:.6f}")
+
+    upstream = http_client.metrics()
+    for name, kind, description, value in (
+        ('medicos_upstream_requests_total', 'counter', 'Outbound HTTP requests by host', lambda m: m['requests']),
+        ('medicos_upstream_errors_total', 'counter', 'Outbound requests failing or answered 429/5xx', lambda m: m['errors']),
+        ('medicos_upstream_rejected_total', 'counter', 'Outbound requests refused by the circuit breaker or limiter', lambda m: m['rejected']),
+        ('medicos_upstream_request_seconds_total', 'counter', 'Time spent in outbound requests', lambda m: m['total_seconds']),
+        ('medicos_upstream_in_flight', 'gauge', 'Outbound requests in progress', lambda m: m['in_flight']),
+        ('medicos_upstream_circuit_open', 'gauge', '1 while the host circuit breaker is open', lambda m: int(m['circuit']['state'] == 'open')),
+        ('medicos_upstream_concurrency_limit', 'gauge', 'Adaptive concurrency limit per host', lambda m: m['concurrency']['limit']),
+    ):
+        family(name, kind, description)
+        for host, host_metrics in sorted(upstream.items()):
+            lines.append(f"{name}{_labels(host=host)} {value(host_metrics)}")
+
+    family('medicos_cache_requests_total', 'counter', 'Cache lookups by key prefix and outcome')
+    for prefix, counts in sorted(cache_stats().items()):
+        for outcome in ('local_hits', 'shared_hits', 'misses'):
+            lines.append(f"medicos_cache_requests_total{_labels(prefix=prefix, outcome=outcome)} {counts[outcome]}")
+
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,147 @@
+import cProfile
+import logging
+import pstats
+import random
+import re
+import threading
+import time
+from typing import Optional
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.urls import Resolver404, resolve
+from django.utils import timezone
+from .metrics import begin_request, current_request, end_request, install_query_recorder, registry
+
+logger = logging.getLogger(__name__)
+
+def view_name(view_func) -> str:
+    return f"{view_func.__module__}.{getattr(view_func, '__name__', type(view_func).__name__)}"
+
+class RequestMetricsMiddleware:
+    """
+    Records each request's DB queries and time, outbound calls by host and
+    cache hits/misses (core.metrics), adds them to the /metrics counters and,
+    with SERVER_TIMING, returns them in a Server-Timing header.
+
+    With PROFILE_SAMPLE_RATE > 0 a sample of requests to PROFILE_VIEW_MODULES
+    runs under cProfile, and those slower than PROFILE_SLOW_MS are dumped to
+    PROFILE_DIR for ``python -m pstats``. The profiler wraps the rest of the
+    handler chain, so the view still runs through process_exception and
+    ATOMIC_REQUESTS. Under ASGI the event loop thread and the request's sync
+    thread are profiled together; the loop's share also shows whatever else
+    it ran meanwhile.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+            # Django adapts process_view to the handler mode, so give it the native kind
+            self.process_view = self.aprocess_view
+        self._profiling = threading.local()
+        install_query_recorder()
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        metrics, token = begin_request()
+        try:
+            name = self._sampled(request)
+            response = self._profile(request, name) if name else self.get_response(request)
+        finally:
+            end_request(token)
+        return self._finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        metrics, token = begin_request()
+        try:
+            name = self._sampled(request)
+            response = await (self._aprofile(request, name) if name else self.get_response(request))
+        finally:
+            end_request(token)
+        return self._finish(request, response, metrics)
+
+    def _finish(self, request, response, metrics):
+        seconds = time.perf_counter() - metrics.started
+        registry.observe(metrics, request.method, response.status_code, seconds)
+        if settings.SERVER_TIMING:
+            response['Server-Timing'] = metrics.server_timing(seconds)
+        return response
+
+    def _record_view(self, view_func):
+        metrics = current_request()
+        if metrics is not None:
+            metrics.view = view_name(view_func)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        self._record_view(view_func)
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        self._record_view(view_func)
+
+    # Profiling
+
+    def _sampled(self, request) -> Optional[str]:
+        """The view name if this request should run under cProfile"""
+        if (
+            settings.PROFILE_SAMPLE_RATE <= 0
+            or getattr(self._profiling, 'active', False)
+            or random.random() >= settings.PROFILE_SAMPLE_RATE
+        ):
+            return None
+        try:
+            match = resolve(request.path_info, getattr(request, 'urlconf', None))
+        except Resolver404:
+            return None
+        if match.func.__module__ not in settings.PROFILE_VIEW_MODULES:
+            return None
+        return view_name(match.func)
+
+    def _profile(self, request, name):
+        profiler = cProfile.Profile()
+        self._profiling.active = True
+        started = time.perf_counter()
+        try:
+            return profiler.runcall(self.get_response, request)
+        finally:
+            self._profiling.active = False
+            self._dump_if_slow([profiler], request, name, time.perf_counter() - started)
+
+    async def _aprofile(self, request, name):
+        # Sync views and middleware run on the request's thread-sensitive
+        # thread, which cProfile on the loop thread does not see
+        loop_profiler, sync_profiler = cProfile.Profile(), cProfile.Profile()
+        self._profiling.active = True
+        await sync_to_async(sync_profiler.enable, thread_sensitive=True)()
+        started = time.perf_counter()
+        loop_profiler.enable()
+        try:
+            return await self.get_response(request)
+        finally:
+            loop_profiler.disable()
+            seconds = time.perf_counter() - started
+            await sync_to_async(sync_profiler.disable, thread_sensitive=True)()
+            self._profiling.active = False
+            self._dump_if_slow([loop_profiler, sync_profiler], request, name, seconds)
+
+    def _dump_if_slow(self, profilers, request, name, seconds):
+        milliseconds = seconds * 1000
+        if milliseconds < settings.PROFILE_SLOW_MS:
+            return
+        stats = None
+        for profiler in profilers:
+            if profiler.getstats():
+                stats = pstats.Stats(profiler) if stats is None else stats.add(profiler)
+        if stats is None:
+            return
+        try:
+            settings.PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+            filename = re.sub(r'[^\w.-]', '_', name)
+            path = settings.PROFILE_DIR / f"{timezone.now():%Y%m%dT%H%M%S%f}-{filename}-{milliseconds:.0f}ms.prof"
+            stats.dump_stats(path)
+            logger.warning(f"Slow request {request.method} {request.path} took {milliseconds:.0f} ms, profile saved to {path}")
+        except OSError as e:
+            logger.error(f"Could not save request profile: {str(e)}")
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.9 on 2026-10-18 19:04
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='medication',
+            name='doses_from',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='medication',
+            name='doses_until',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.CreateModel(
+            name='DoseOccurrence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scheduled_at', models.DateTimeField()),
+                ('reminder_sent_at', models.DateTimeField(blank=True, null=True)),
+                ('medication', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.medication')),
+                ('patient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.patient')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['patient', 'scheduled_at'], name='core_doseoc_patient_1c29ab_idx'), models.Index(fields=['scheduled_at', 'reminder_sent_at'], name='core_doseoc_schedul_011feb_idx')],
+                'unique_together': {('medication', 'scheduled_at')},
+            },
+        ),
+    ]
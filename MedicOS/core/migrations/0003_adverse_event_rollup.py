@@ -0,0 +1,31 @@
+# Generated by Django 4.2.9 on 2026-10-18 19:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_dose_occurrence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AdverseEventRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('drug_a', models.CharField(max_length=255)),
+                ('drug_b', models.CharField(blank=True, default='', max_length=255)),
+                ('reaction', models.CharField(max_length=255)),
+                ('period', models.DateField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('mild', models.PositiveIntegerField(default=0)),
+                ('moderate', models.PositiveIntegerField(default=0)),
+                ('severe', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['period', 'drug_b'], name='core_advers_period_0a5a8c_idx')],
+                'unique_together': {('drug_a', 'drug_b', 'reaction', 'period')},
+            },
+        ),
+    ]
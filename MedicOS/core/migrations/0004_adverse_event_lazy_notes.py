@@ -0,0 +1,19 @@
+# Generated by Django 4.2.9 on 2026-10-18 19:20
+
+import core.fields
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_adverse_event_rollup'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='adverseevent',
+            name='notes',
+            field=core.fields.LazyEncryptedTextField(blank=True),
+        ),
+    ]
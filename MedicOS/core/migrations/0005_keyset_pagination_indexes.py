@@ -0,0 +1,21 @@
+# Generated by Django 4.2.9 on 2026-10-18 19:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_adverse_event_lazy_notes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='adverseevent',
+            index=models.Index(fields=['medication', 'reported_date'], name='core_advers_medicat_69fa2b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='medication',
+            index=models.Index(fields=['patient', 'created_at'], name='core_medica_patient_53cf05_idx'),
+        ),
+    ]
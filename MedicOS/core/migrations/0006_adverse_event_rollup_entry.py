@@ -0,0 +1,18 @@
+# Generated by Django 4.2.9 on 2026-10-18 19:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='adverseevent',
+            name='rollup_entry',
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+    ]
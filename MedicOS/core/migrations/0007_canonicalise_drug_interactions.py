@@ -0,0 +1,42 @@
+from django.db import migrations
+
+
+def canonicalise_drug_interactions(apps, schema_editor):
+    """
+    Re-key knowledge base rows stored under the names as entered ("Tylenol",
+    "Coumadin 5mg") to the canonical ingredient IDs lookups now use. Rows that
+    collapse onto one pair are merged, keeping the active, most recently
+    updated finding; rows whose two drugs turn out to be the same are dropped.
+    """
+    from core.drug_index import canonical_drug_name
+
+    DrugInteraction = apps.get_model('core', 'DrugInteraction')
+    keep = {}
+    drop = []
+    for row in DrugInteraction.objects.order_by('-active', '-last_updated', '-id').iterator():
+        drug_a, drug_b = sorted((canonical_drug_name(row.drug_a), canonical_drug_name(row.drug_b)))
+        if drug_a == drug_b or (drug_a, drug_b) in keep:
+            drop.append(row.id)
+        else:
+            keep[(drug_a, drug_b)] = row
+
+    DrugInteraction.objects.filter(id__in=drop).delete()
+    renamed = {row.id for key, row in keep.items() if (row.drug_a, row.drug_b) != key}
+    # Park renamed rows on unique placeholder keys first, so no rename can hit
+    # a pair another row still holds until its own rename
+    for row_id in renamed:
+        DrugInteraction.objects.filter(id=row_id).update(drug_a=f'\x00{row_id}', drug_b='')
+    for (drug_a, drug_b), row in keep.items():
+        if row.id in renamed:
+            DrugInteraction.objects.filter(id=row.id).update(drug_a=drug_a, drug_b=drug_b)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_adverse_event_rollup_entry'),
+    ]
+
+    operations = [
+        migrations.RunPython(canonicalise_drug_interactions, migrations.RunPython.noop),
+    ]
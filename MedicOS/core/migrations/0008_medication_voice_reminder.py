@@ -0,0 +1,36 @@
+# Generated by Django 4.2.9 on 2026-10-18 20:10
+
+from django.db import migrations, models
+
+
+def move_voice_flag_out_of_schedule(apps, schema_editor):
+    """Schedules used to carry a "voice_reminder" key; it now has its own column"""
+    Medication = apps.get_model('core', 'Medication')
+    for medication in Medication.objects.filter(schedule__has_key='voice_reminder'):
+        schedule = dict(medication.schedule)
+        voice_reminder = bool(schedule.pop('voice_reminder'))
+        Medication.objects.filter(id=medication.id).update(schedule=schedule, voice_reminder=voice_reminder)
+
+
+def move_voice_flag_into_schedule(apps, schema_editor):
+    Medication = apps.get_model('core', 'Medication')
+    for medication in Medication.objects.filter(voice_reminder=True):
+        Medication.objects.filter(id=medication.id).update(
+            schedule={**medication.schedule, 'voice_reminder': True}
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_canonicalise_drug_interactions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='medication',
+            name='voice_reminder',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(move_voice_flag_out_of_schedule, move_voice_flag_into_schedule),
+    ]
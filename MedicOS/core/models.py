@@ -1,6 +1,7 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
 from django.contrib.auth.models import User
-from django_cryptography.fields import encrypt
+from django.utils import timezone
+from .fields import LazyEncryptedTextField, PlaintextValuesQuerySet
 
 class Patient(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
@@ -17,11 +18,38 @@ class Medication(models.Model):
     name = models.CharField(max_length=255)
     dosage = models.CharField(max_length=50)
     schedule = models.JSONField()  # {time: "08:00", days: [0-6]}
+    voice_reminder = models.BooleanField(default=False)  # Attach a spoken note to reminders
     created_at = models.DateTimeField(auto_now_add=True)
+    # Date window covered by DoseOccurrence rows (see api.schedule)
+    doses_from = models.DateField(null=True, blank=True, editable=False)
+    doses_until = models.DateField(null=True, blank=True, editable=False)
+    
+    class Meta:
+        indexes = [
+            # Keyset pagination of a patient's medications (api.pagination)
+            models.Index(fields=['patient', 'created_at']),
+        ]
     
     def __str__(self):
         return f"{self.name} - {self.dosage}"
 
+class DoseOccurrence(models.Model):
+    """A single scheduled dose, materialised from Medication.schedule"""
+    patient = models.ForeignKey(Patient, on_delete=models.CASCADE)
+    medication = models.ForeignKey(Medication, on_delete=models.CASCADE)
+    scheduled_at = models.DateTimeField()
+    reminder_sent_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        unique_together = ['medication', 'scheduled_at']
+        indexes = [
+            models.Index(fields=['patient', 'scheduled_at']),
+            models.Index(fields=['scheduled_at', 'reminder_sent_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.medication} @ {self.scheduled_at:%Y-%m-%d %H:%M}"
+
 class AdverseEvent(models.Model):
     SEVERITY_CHOICES = [
         (1, 'Mild'),
@@ -33,12 +61,122 @@ class AdverseEvent(models.Model):
     medication = models.ForeignKey(Medication, on_delete=models.CASCADE)
     reaction = models.CharField(max_length=255)
     severity = models.IntegerField(choices=SEVERITY_CHOICES)
-    notes = encrypt(models.TextField(blank=True))
+    notes = LazyEncryptedTextField(blank=True)
     reported_date = models.DateTimeField(auto_now_add=True)
+    # The rollup rows this event was counted in ({'period', 'severity', 'keys'}),
+    # so deleting or editing it takes back exactly what was added
+    rollup_entry = models.JSONField(null=True, blank=True, editable=False)
+    
+    objects = PlaintextValuesQuerySet.as_manager()
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['medication', 'reported_date']),
+        ]
     
     def __str__(self):
         return f"{self.patient} - {self.medication} - {self.get_severity_display()}"
 
+class AdverseEventRollupManager(models.Manager):
+    def increment(self, keys, severity, period, delta=1):
+        """
+        Add ``delta`` events of ``severity`` to each (drug_a, drug_b, reaction)
+        key for the given period, creating missing rows.
+        """
+        severity_field = AdverseEventRollup.SEVERITY_FIELDS[severity]
+        for drug_a, drug_b, reaction in keys:
+            lookup = {'drug_a': drug_a, 'drug_b': drug_b, 'reaction': reaction, 'period': period}
+            changes = {'count': models.F('count') + delta, severity_field: models.F(severity_field) + delta}
+            if delta < 0:
+                # Never below zero; a row that was already rebuilt without this event stays as it is
+                self.filter(**lookup, count__gte=-delta, **{f'{severity_field}__gte': -delta}).update(**changes)
+                self.filter(**lookup, count=0).delete()
+                continue
+            if self.filter(**lookup).update(**changes):
+                continue
+            try:
+                with transaction.atomic():
+                    self.create(**lookup, count=delta, **{severity_field: delta})
+            except IntegrityError:
+                # Created concurrently; add to that row instead
+                self.filter(**lookup).update(**changes)
+
+class AdverseEventRollup(models.Model):
+    """
+    Pre-aggregated adverse event counts per drug (drug_b blank) or co-medicated
+    drug pair, reaction and week. Maintained incrementally as events are
+    reported; see api.pharmacovigilance.
+    """
+    SEVERITY_FIELDS = {1: 'mild', 2: 'moderate', 3: 'severe'}
+    
+    drug_a = models.CharField(max_length=255)
+    drug_b = models.CharField(max_length=255, blank=True, default='')
+    reaction = models.CharField(max_length=255)
+    period = models.DateField()  # Monday of the reporting week
+    count = models.PositiveIntegerField(default=0)
+    mild = models.PositiveIntegerField(default=0)
+    moderate = models.PositiveIntegerField(default=0)
+    severe = models.PositiveIntegerField(default=0)
+    
+    objects = AdverseEventRollupManager()
+    
+    class Meta:
+        unique_together = ['drug_a', 'drug_b', 'reaction', 'period']
+        indexes = [
+            models.Index(fields=['period', 'drug_b']),
+        ]
+    
+    def __str__(self):
+        drugs = f"{self.drug_a} + {self.drug_b}" if self.drug_b else self.drug_a
+        return f"{drugs} - {self.reaction} ({self.period}): {self.count}"
+
+class DrugInteractionManager(models.Manager):
+    def lookup(self, pairs):
+        """
+        Fetch active interactions for many drug pairs with one indexed query.
+        Returns {(drug_a, drug_b): DrugInteraction} keyed by the alphabetically ordered pair.
+        """
+        wanted = {tuple(sorted(pair)) for pair in pairs}
+        if not wanted:
+            return {}
+        names = {name for pair in wanted for name in pair}
+        rows = self.filter(drug_a__in=names, drug_b__in=names, active=True)
+        return {
+            (row.drug_a, row.drug_b): row
+            for row in rows
+            if (row.drug_a, row.drug_b) in wanted
+        }
+
+    def record(self, findings):
+        """
+        Upsert interaction findings in a single statement.
+        Each finding is a dict with drug_a, drug_b, severity, description,
+        source, confidence_score and optionally references.
+        """
+        now = timezone.now()
+        objs = {}
+        for finding in findings:
+            drug_a, drug_b = sorted((finding['drug_a'], finding['drug_b']))
+            objs[(drug_a, drug_b)] = self.model(
+                drug_a=drug_a,
+                drug_b=drug_b,
+                severity=finding['severity'],
+                description=finding['description'],
+                confidence_score=finding['confidence_score'],
+                references=finding.get('references', []),
+                source=finding['source'],
+                last_updated=now,
+                active=True
+            )
+        if not objs:
+            return []
+        return self.bulk_create(
+            objs.values(),
+            update_conflicts=True,
+            unique_fields=['drug_a', 'drug_b'],
+            update_fields=['severity', 'description', 'confidence_score', 'references', 'source', 'last_updated', 'active']
+        )
+
 class DrugInteraction(models.Model):
     drug_a = models.CharField(max_length=255)
     drug_b = models.CharField(max_length=255)
@@ -50,6 +188,8 @@ class DrugInteraction(models.Model):
     last_updated = models.DateTimeField(auto_now=True)
     active = models.BooleanField(default=True)  # To soft-disable outdated interactions
     
+    objects = DrugInteractionManager()
+    
     class Meta:
         unique_together = ['drug_a', 'drug_b']
         indexes = [
@@ -0,0 +1,182 @@
+import asyncio
+import time
+from collections import deque
+from typing import Dict
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker for one upstream.
+    closed -> open after ``failure_threshold`` failures in a row; open rejects
+    every call for ``reset_timeout`` seconds; half-open then lets a single
+    probe through, whose outcome closes or re-opens the circuit.
+    Used from the HTTP client loop only, so it needs no locking; HttpClient
+    hops other threads onto the loop before reading it.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = 0.0
+        self._state = self.CLOSED
+        self._probe_in_flight = False
+
+    @property
+    def state(self) -> str:
+        """Effective state; reading it never changes it, allow() takes the probe"""
+        if self._state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self._state
+
+    def is_open(self) -> bool:
+        """True while calls would be rejected outright (a pending probe counts as open)"""
+        state = self.state
+        return state == self.OPEN or (state == self.HALF_OPEN and self._probe_in_flight)
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN and not self._probe_in_flight:
+            self._state = self.HALF_OPEN
+            self._probe_in_flight = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self._probe_in_flight = False
+        self._state = self.CLOSED
+
+    def record_failure(self):
+        self.failures += 1
+        if self._state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self._state = self.OPEN
+            self.opened_at = time.monotonic()
+        self._probe_in_flight = False
+
+    def snapshot(self) -> Dict:
+        return {'state': self.state, 'consecutive_failures': self.failures}
+
+class AdaptiveLimiter:
+    """
+    AIMD concurrency limit for one upstream.
+    Every healthy response raises the limit by 1/limit (about +1 per round of
+    calls); a failure or a response slower than ``slow_seconds`` halves it.
+    Callers over the limit wait up to ``queue_timeout`` seconds for a slot
+    instead of piling more load onto a struggling service.
+    Used from the HTTP client loop only, so it needs no locking.
+    """
+
+    def __init__(self, initial: int, minimum: int, maximum: int, slow_seconds: float, queue_timeout: float):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.slow_seconds = slow_seconds
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.rejected = 0
+        self._waiters = deque()
+
+    async def acquire(self) -> bool:
+        """Take a slot; False if none frees up within queue_timeout"""
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self.in_flight += 1
+            return True
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout=self.queue_timeout)
+            return True
+        except asyncio.TimeoutError:
+            if waiter.done():
+                # Slot was handed over just as we gave up; keep it
+                return True
+            waiter.cancel()
+            self.rejected += 1
+            return False
+        except asyncio.CancelledError:
+            # Caller's deadline expired; don't leak a slot that was already granted
+            if waiter.done() and not waiter.cancelled():
+                self.cancel()
+            waiter.cancel()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+    def release(self, ok: bool, seconds: float):
+        self.in_flight -= 1
+        if ok and seconds < self.slow_seconds:
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
+        else:
+            self.limit = max(self.minimum, self.limit / 2)
+        self._wake()
+
+    def cancel(self):
+        """Give a slot back without it counting as a response"""
+        self.in_flight -= 1
+        self._wake()
+
+    def _wake(self):
+        while self._waiters and self.in_flight < int(self.limit):
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    def snapshot(self) -> Dict:
+        return {
+            'limit': round(self.limit, 2),
+            'in_flight': self.in_flight,
+            'queued': len(self._waiters),
+            'rejected': self.rejected,
+        }
+
+class RateLimiter:
+    """
+    Token bucket: ``rate`` acquisitions per second with bursts of up to
+    ``burst``. Waiters are served in FIFO order, and ``pause`` holds all of
+    them back (e.g. after a 429 carrying Retry-After).
+    Used from a single event loop, so it needs no thread locking.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = None
+
+    async def acquire(self):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def pause(self, seconds: float):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens = 0.0
+
+    def snapshot(self) -> Dict:
+        return {
+            'rate': self.rate,
+            'tokens': round(self.tokens, 2),
+            'paused_for': round(max(0.0, self.paused_until - time.monotonic()), 2),
+        }
@@ -1,44 +1,103 @@
-import requests
 import boto3
 import json
+import logging
+import re
+import sqlite3
 from django.conf import settings
 from datetime import datetime
+from .drug_index import canonical_drug_name, normalize_drug_name
+from .http_client import UpstreamError, http_client
+from .label_index import get_label_index
+from .models import DrugInteraction
+from .severity import SEVERITY_LEVELS, classifier
+
+logger = logging.getLogger(__name__)
+
+LABEL_LIMIT = 5  # Labels considered per drug
+LIVE_LOOKUP_TIMEOUT = 10  # Seconds
 
 class OpenFDAService:
     def __init__(self):
         self.api_key = settings.OPENFDA_API_KEY
-        self.base_url = 'https://api.fda.gov/drug/label.json'
+        self.base_url = f"{settings.OPENFDA_API_URL.rstrip('/')}/drug/label.json"
 
     def check_interactions(self, drug_names):
         interactions = []
+        findings = []
         try:
             for drug in drug_names:
-                query = f'?search=drug_interactions:{drug}&api_key={self.api_key}'
-                response = requests.get(self.base_url + query)
-                response.raise_for_status()
-                data = response.json()
-                
-                if 'results' in data:
-                    for result in data['results']:
-                        if 'drug_interactions' in result:
-                            interactions.append({
-                                'drug': drug,
-                                'severity': self._determine_severity(result),
-                                'description': result['drug_interactions'][0],
-                                'timestamp': datetime.now()
-                            })
+                # Local label index first; the live API only fills gaps
+                for result in self._local_labels(drug) or self._live_labels(drug):
+                    if 'drug_interactions' in result:
+                        interactions.append({
+                            'drug': drug,
+                            'severity': self._determine_severity(result),
+                            'description': result['drug_interactions'][0],
+                            'timestamp': datetime.now()
+                        })
+                        findings.extend(self._pair_findings(drug, result, drug_names))
+            self._record_findings(findings)
             return interactions
-        except requests.exceptions.RequestException as e:
-            print(f"OpenFDA API Error: {str(e)}")
+        except UpstreamError as e:
+            logger.error(f"OpenFDA API Error: {str(e)}")
+            return []
+
+    def _local_labels(self, drug):
+        """Labels for ``drug`` from the ingested openFDA index, [] if absent or unknown"""
+        index = get_label_index()
+        if index is None:
             return []
+        try:
+            labels = index.passages_for(normalize_drug_name(drug), limit=LABEL_LIMIT)
+        except sqlite3.Error as e:
+            logger.error(f"OpenFDA label index error: {str(e)}")
+            return []
+        return [{'id': label_id, 'drug_interactions': sections} for label_id, sections in labels.items()]
+
+    def _live_labels(self, drug):
+        response = http_client.request_sync(
+            'GET',
+            self.base_url,
+            params={'search': f'drug_interactions:{drug}', 'limit': LABEL_LIMIT, 'api_key': self.api_key},
+            timeout=LIVE_LOOKUP_TIMEOUT
+        )
+        if response.status == 404:
+            # openFDA answers "no matches" with a 404
+            return []
+        response.raise_for_status()
+        return response.json().get('results', [])
+
+    def _pair_findings(self, drug, result, drug_names):
+        """Label passages for ``drug`` that name another drug from the list"""
+        findings = []
+        for other in drug_names:
+            if other == drug:
+                continue
+            pattern = re.compile(rf'\b{re.escape(other)}\b', re.IGNORECASE)
+            for section in result['drug_interactions']:
+                sentences = [s for s in re.split(r'(?<=[.!?])\s+', section) if pattern.search(s)]
+                if sentences:
+                    findings.append({
+                        'drug_a': canonical_drug_name(drug),
+                        'drug_b': canonical_drug_name(other),
+                        'severity': SEVERITY_LEVELS[self._determine_severity({'drug_interactions': sentences})],
+                        'description': ' '.join(sentences),
+                        'source': 'OpenFDA',
+                        'confidence_score': 0.9,
+                        'references': [result['id']] if 'id' in result else []
+                    })
+                    break
+        return findings
+
+    def _record_findings(self, findings):
+        """Write-through to the local interaction knowledge base"""
+        try:
+            DrugInteraction.objects.record(findings)
+        except Exception as e:
+            logger.error(f"Failed to store OpenFDA findings: {str(e)}")
 
     def _determine_severity(self, result):
-        text = ' '.join(result.get('drug_interactions', []))
-        if any(word in text.lower() for word in ['severe', 'danger', 'fatal']):
-            return 'HIGH'
-        elif any(word in text.lower() for word in ['moderate', 'caution']):
-            return 'MEDIUM'
-        return 'LOW'
+        return classifier.label(' '.join(result.get('drug_interactions', [])))
 
 class WhatsAppService:
     def __init__(self):
@@ -48,7 +107,8 @@ class WhatsAppService:
     def send_interaction_alert(self, patient, interactions):
         message = self._format_interaction_message(interactions)
         try:
-            response = requests.post(
+            response = http_client.request_sync(
+                'POST',
                 self.base_url,
                 headers={
                     'Authorization': f'Bearer {self.api_key}',
@@ -63,8 +123,8 @@ class WhatsAppService:
             )
             response.raise_for_status()
             return True
-        except requests.exceptions.RequestException as e:
-            print(f"WhatsApp API Error: {str(e)}")
+        except UpstreamError as e:
+            logger.error(f"WhatsApp API Error: {str(e)}")
             return False
 
     def _format_interaction_message(self, interactions):
@@ -104,7 +164,7 @@ class PollyService:
                     file.write(response['AudioStream'].read())
                 return filename
         except Exception as e:
-            print(f"AWS Polly Error: {str(e)}")
+            logger.error(f"AWS Polly Error: {str(e)}")
             return None
 
     def _format_voice_message(self, interactions):
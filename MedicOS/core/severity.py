@@ -0,0 +1,91 @@
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, List
+
+SEVERITY_LEVELS = {'HIGH': 3, 'MEDIUM': 2, 'LOW': 1}
+SEVERITY_LABELS = {level: label for label, level in SEVERITY_LEVELS.items()}
+
+# Regex fragments matched at a word start against lower-cased text, so stems
+# also match their inflections ("danger" -> "dangerous", "avoid" -> "avoided")
+HIGH_RISK_PATTERNS = [
+    r'severe', r'significant', r'danger', r'avoid', r'contraindicat', r'high risk',
+    r'stop', r'do not(?!\s+need)', r"don't(?!\s+need)", r'fatal', r'life-threatening',
+]
+MEDIUM_RISK_PATTERNS = [
+    r'moderate', r'monitor', r'caution', r'may increase', r'watch for',
+    r'be careful', r'adjust', r'consider',
+]
+
+# A cue among the three words before a phrase, in the same clause, cancels it:
+# "no need to avoid", "not clinically significant", "without dose adjustment"
+NEGATION_WORDS = frozenset({'no', 'not', 'without', 'never', 'unlikely', 'none', 'neither', 'nor'})
+# Substrings one of which every cue contains; checked first since most windows have none
+NEGATION_HINTS = ('no', "n't", 'without', 'never', 'unlikely', 'neither')
+NEGATION_SCOPE = 3
+NEGATION_WINDOW = 60  # Characters of context inspected before each match
+# A negation directly before an action cue makes it an instruction ("do not stop",
+# "never adjust the dose yourself"): that is the warning itself, not a cancelled cue.
+# Descriptive cues ("never dangerous") stay negated.
+DIRECTIVE_CUES = ('stop', 'adjust')
+IMPERATIVE_NEGATION = re.compile(r"\b(?:do not|don't|dont|never|must not|mustn't|should not|shouldn't)\s+$")
+CLAUSE_BREAK = re.compile(r'[.;:!?,]|\bbut\b|\bhowever\b')
+WORD = re.compile(r'\w+')
+
+class SeverityClassifier:
+    """
+    Interaction severity from free text, 3 (high) to 1 (low).
+    Each level's phrases are compiled into one word-bounded alternation regex,
+    so a level costs a single scan however long its list is. Levels are tried
+    from high to low and a scan stops at its first non-negated match.
+    """
+
+    def __init__(self, high: Iterable[str], medium: Iterable[str]):
+        self.levels = [
+            (3, re.compile(r'\b(?:{})'.format('|'.join(high)))),
+            (2, re.compile(r'\b(?:{})'.format('|'.join(medium)))),
+        ]
+
+    @staticmethod
+    def _negated(text: str, start: int) -> bool:
+        window = text[max(0, start - NEGATION_WINDOW):start]
+        if not any(hint in window for hint in NEGATION_HINTS):
+            return False
+        if text.startswith(DIRECTIVE_CUES, start) and IMPERATIVE_NEGATION.search(window):
+            return False
+        clause = CLAUSE_BREAK.split(window)[-1].replace("n't", ' not')
+        return any(word in NEGATION_WORDS for word in WORD.findall(clause)[-NEGATION_SCOPE:])
+
+    def classify(self, text: str) -> int:
+        if not text:
+            return 1
+        text = text.lower()
+        for level, pattern in self.levels:
+            for match in pattern.finditer(text):
+                if not self._negated(text, match.start()):
+                    return level
+        return 1
+
+    def classify_many(self, texts: Iterable[str]) -> List[int]:
+        """Batch form; repeated texts are classified once"""
+        seen: Dict[str, int] = {}
+        levels = []
+        for text in texts:
+            level = seen.get(text)
+            if level is None:
+                level = seen[text] = self.classify(text)
+            levels.append(level)
+        return levels
+
+    def label(self, text: str) -> str:
+        return SEVERITY_LABELS[self.classify(text)]
+
+
+classifier = SeverityClassifier(HIGH_RISK_PATTERNS, MEDIUM_RISK_PATTERNS)
+
+@lru_cache(maxsize=4096)
+def classify_severity(text: str) -> int:
+    # Descriptions repeat a lot (fallback text, one label section per drug pair)
+    return classifier.classify(text)
+
+def classify_severities(texts: Iterable[str]) -> List[int]:
+    return classifier.classify_many(texts)
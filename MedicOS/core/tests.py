@@ -1,3 +1,562 @@
-from django.test import TestCase
+import asyncio
+import importlib
+import io
+import json
+import pickle
+import pstats
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from pathlib import Path
+from unittest import mock
+from aiohttp import web
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.db import connection
+from django.http import HttpResponse
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import path, reverse
+from django.utils import timezone
+from django_cryptography.core.signing import BadSignature
+from django_cryptography.fields import Expired
+from django_cryptography.utils.crypto import FernetBytes
+from .cache import TieredCache, _fake_server
+from .drug_index import DrugNameIndex, normalize_drug_name
+from .fields import BulkDecryptor, EncryptedValue, LazyEncryptedTextField
+from .http_client import HttpClient, UpstreamError
+from .label_index import iter_label_records
+from .models import AdverseEvent, DrugInteraction, Medication, Patient
+from .resilience import CircuitBreaker
+from .severity import classify_severity
 
-# Create your tests here.
+class SeverityClassifierTests(SimpleTestCase):
+    def assertSeverity(self, cases, level):
+        for text in cases:
+            with self.subTest(text=text):
+                self.assertEqual(classify_severity(text), level)
+
+    def test_negated_instructions_are_warnings(self):
+        self.assertSeverity([
+            "Don't stop taking warfarin",
+            'Do not stop taking warfarin without talking to your doctor',
+            'Never stop taking warfarin abruptly',
+            'You should not stop this medication',
+            'Stop taking warfarin and seek care',
+        ], 3)
+
+    def test_negation_cancels_risk_cues(self):
+        self.assertSeverity([
+            'No need to avoid this combination',
+            'The interaction is not clinically significant.',
+            'You do not need to stop either drug',
+            "You don't need to avoid grapefruit",
+            'No dose adjustment is needed',
+            'It is never dangerous at usual doses',
+        ], 1)
+
+    def test_levels(self):
+        self.assertSeverity(['This combination is contraindicated'], 3)
+        self.assertSeverity(['Monitor INR closely', 'Never adjust the dose yourself; monitor INR'], 2)
+        self.assertSeverity(['', 'Take with food'], 1)
+
+class BulkDecryptorTests(SimpleTestCase):
+    def setUp(self):
+        self.field = AdverseEvent._meta.get_field('notes')
+
+    def test_round_trip_with_field_and_fernet_tokens(self):
+        notes = [f'note {i}' for i in range(7)]
+        tokens = [self.field._dump(note) for note in notes]
+        tokens.append(FernetBytes(self.field.key).encrypt(pickle.dumps('written by FernetBytes')))
+        tokens.append(None)
+        expected = notes + ['written by FernetBytes', None]
+        for workers in (1, 3):
+            with self.subTest(workers=workers):
+                decryptor = BulkDecryptor(self.field, batch_size=2, workers=workers)
+                self.assertEqual(decryptor.decrypt_many(tokens), expected)
+        values = [EncryptedValue(token, self.field) for token in tokens[:2]]
+        self.assertEqual(BulkDecryptor(self.field).decrypt_many(values), notes[:2])
+
+    def test_expired_tokens_follow_field_ttl(self):
+        field = LazyEncryptedTextField(ttl=60)
+        token = field._dump('short lived')
+        decryptor = BulkDecryptor(field)
+        self.assertEqual(decryptor.decrypt_many([token]), ['short lived'])
+        with mock.patch('time.time', return_value=time.time() + 3600):
+            self.assertIs(decryptor.decrypt_many([token])[0], Expired)
+
+    def test_tampered_token_is_rejected(self):
+        token = bytearray(self.field._dump('secret'))
+        token[-1] ^= 1
+        with self.assertRaises(BadSignature):
+            BulkDecryptor(self.field).decrypt_many([bytes(token)])
+
+class EncryptedNotesQueryTests(TestCase):
+    def setUp(self):
+        patcher = mock.patch('api.signals.enqueue')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        user = User.objects.create_user('notes', password='x')
+        patient = Patient.objects.create(user=user, dob=date(1970, 1, 1), phone='1')
+        medication = Medication.objects.create(patient=patient, name='aspirin', dosage='81mg', schedule={})
+        self.event = AdverseEvent.objects.create(
+            patient=patient, medication=medication, reaction='rash', severity=1, notes='itchy forearms'
+        )
+
+    def test_values_queries_return_plaintext(self):
+        events = AdverseEvent.objects.filter(pk=self.event.pk)
+        self.assertEqual(list(events.values('notes')), [{'notes': 'itchy forearms'}])
+        self.assertEqual(list(events.values_list('id', 'notes')), [(self.event.pk, 'itchy forearms')])
+        self.assertEqual(list(events.values_list('notes', flat=True)), ['itchy forearms'])
+        self.assertEqual(events.values_list('notes', named=True).get().notes, 'itchy forearms')
+        self.assertEqual(json.loads(json.dumps(list(events.values('notes')))), [{'notes': 'itchy forearms'}])
+
+    def test_ciphertext_rows_stay_encrypted(self):
+        notes = AdverseEvent.objects.values_list('notes', flat=True).ciphertext().get()
+        self.assertIsInstance(notes, EncryptedValue)
+        self.assertEqual(BulkDecryptor(notes.field).decrypt_many([notes]), ['itchy forearms'])
+
+    def test_instances_decrypt_on_first_read(self):
+        event = AdverseEvent.objects.get(pk=self.event.pk)
+        self.assertIsInstance(event.__dict__['notes'], EncryptedValue)
+        self.assertEqual(event.notes, 'itchy forearms')
+
+    def test_untouched_notes_survive_save(self):
+        event = AdverseEvent.objects.get(pk=self.event.pk)
+        event.reaction = 'hives'
+        event.save()
+        self.assertEqual(AdverseEvent.objects.get(pk=self.event.pk).notes, 'itchy forearms')
+
+class TieredCacheTests(SimpleTestCase):
+    location = 'fakeredis://tiered-cache-tests'
+
+    def setUp(self):
+        self.cache = TieredCache(self.location, {'OPTIONS': {'LOCAL_EXCLUDE_PREFIXES': ['patient_']}})
+        self.server = _fake_server(self.location)
+        self.server.connected = True
+        self.cache.clear()
+        self.addCleanup(setattr, self.server, 'connected', True)
+
+    def other_worker(self):
+        return TieredCache(self.location, {})
+
+    def test_shared_round_trip(self):
+        self.cache.set('drug_pair_a', {'severity': 2, 'pairs': ('a', 'b')})
+        self.assertEqual(self.other_worker().get('drug_pair_a'), {'severity': 2, 'pairs': ['a', 'b']})
+        self.assertTrue(self.cache.add('patient_1_version', 0, timeout=None))
+        self.assertEqual(self.cache.incr('patient_1_version'), 1)
+        self.assertEqual(self.other_worker().incr('patient_1_version', 2), 3)
+        with self.assertRaises(ValueError):
+            self.cache.incr('patient_2_version')
+        self.assertTrue(self.cache.touch('drug_pair_a', 60))
+        self.assertTrue(self.cache.delete('drug_pair_a'))
+        self.assertIsNone(self.other_worker().get('drug_pair_a'))
+
+    def test_shared_outage_falls_back_to_local_tier(self):
+        self.cache.set('counter', 5)
+        self.cache.set('patient_1_version', 1)
+        self.server.connected = False
+        with self.assertLogs('core.cache', 'WARNING'):
+            self.assertEqual(self.cache.get('counter'), 5)
+            self.assertIsNone(self.cache.get('patient_1_version'))
+            self.cache.set('drug_pair_b', 'cached')
+            self.assertEqual(self.cache.get('drug_pair_b'), 'cached')
+            self.assertEqual(self.cache.incr('counter'), 6)
+            self.assertEqual(self.cache.get('counter'), 6)
+            with self.assertRaises(ValueError):
+                self.cache.incr('patient_1_version')
+            self.assertTrue(self.cache.touch('drug_pair_b', 60))
+            self.assertFalse(self.cache.touch('missing', 60))
+            self.assertTrue(self.cache.delete('drug_pair_b'))
+            self.assertIsNone(self.cache.get('drug_pair_b'))
+            self.assertEqual(self.cache.delete_many(['counter', 'missing']), 1)
+            self.cache.clear()
+
+@override_settings(METRICS_TOKEN=None)
+class MetricsViewTests(TestCase):
+    def setUp(self):
+        self.url = reverse('core:metrics')
+
+    def test_denied_by_default(self):
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+        self.client.force_login(User.objects.create_user('plain', password='x'))
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+    def test_staff_session(self):
+        self.client.force_login(User.objects.create_user('ops', password='x', is_staff=True))
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    @override_settings(METRICS_TOKEN='s3cret')
+    def test_bearer_token(self):
+        self.assertEqual(self.client.get(self.url, HTTP_AUTHORIZATION='Bearer wrong').status_code, 401)
+        self.assertEqual(self.client.get(self.url, HTTP_AUTHORIZATION='Bearer s3cret').status_code, 200)
+
+def profiled_sync_view(request):
+    return HttpResponse('ok')
+
+def profiled_failing_view(request):
+    User.objects.create_user('rolled_back')
+    raise RuntimeError('view failed')
+
+urlpatterns = [
+    path('profiled/ok', profiled_sync_view),
+    path('profiled/fail', profiled_failing_view),
+]
+
+@override_settings(ROOT_URLCONF='core.tests', PROFILE_SAMPLE_RATE=1.0, PROFILE_SLOW_MS=0, PROFILE_VIEW_MODULES=['core.tests'])
+class ProfilingMiddlewareTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        patcher = override_settings(PROFILE_DIR=self.directory)
+        patcher.enable()
+        self.addCleanup(patcher.disable)
+
+    def profiled_functions(self):
+        (profile,) = self.directory.glob('*.prof')
+        return {function for _, _, function in pstats.Stats(str(profile)).stats}
+
+    def test_sync_request_profile(self):
+        with self.assertLogs('core.middleware', 'WARNING'):
+            self.assertEqual(self.client.get('/profiled/ok').status_code, 200)
+        self.assertIn('profiled_sync_view', self.profiled_functions())
+
+    async def test_async_handler_profiles_sync_view(self):
+        with self.assertLogs('core.middleware', 'WARNING'):
+            response = await self.async_client.get('/profiled/ok')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('profiled_sync_view', self.profiled_functions())
+
+    def test_profiled_view_keeps_atomic_requests(self):
+        self.client.raise_request_exception = False
+        with mock.patch.dict(connection.settings_dict, {'ATOMIC_REQUESTS': True}), \
+                self.assertLogs('django.request', 'ERROR'):
+            self.assertEqual(self.client.get('/profiled/fail').status_code, 500)
+        self.assertFalse(User.objects.filter(username='rolled_back').exists())
+
+class DrugNameIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.index = DrugNameIndex({
+            'acetaminophen': 'acetaminophen',
+            'tylenol': 'acetaminophen',
+            'advil': 'ibuprofen',
+        })
+
+    def test_brand_and_strength_resolve_to_ingredient(self):
+        self.assertEqual(self.index.canonical_id('Tylenol'), 'acetaminophen')
+        self.assertEqual(self.index.canonical_id('Tylenol Extra Strength 500 mg tablets'), 'acetaminophen')
+        self.assertEqual(self.index.canonical_id("Children's Tylenol"), 'acetaminophen')
+
+    def test_percent_strength_is_dropped(self):
+        self.assertEqual(normalize_drug_name('Hydrocortisone 1% cream'), 'hydrocortisone')
+        self.assertEqual(normalize_drug_name('Lidocaine 2.5 %'), 'lidocaine')
+
+    def test_combination_product_is_not_its_first_ingredient(self):
+        self.assertEqual(self.index.canonical_id('Tylenol with Codeine'), 'tylenol with codeine')
+        self.assertEqual(self.index.canonical_id('Advil PM'), 'advil pm')
+
+class LabelRecordParserTests(SimpleTestCase):
+    records = [
+        {'id': 'a', 'openfda': {'generic_name': ['warfarin']}, 'drug_interactions': ['See "results" [below], {x}.']},
+        {'id': 'b', 'nested': [[1, 2], {'k': ']'}], 'text': 'caf\u00e9 \\ "quoted"'},
+        {'id': 'c'},
+    ]
+
+    def document(self, records):
+        # Shaped like an openFDA download: "meta" comes first and has its own "results"
+        return json.dumps({
+            'meta': {
+                'disclaimer': 'Do not rely on openFDA to make decisions regarding medical care.',
+                'terms': 'https://open.fda.gov/terms/',
+                'license': 'https://open.fda.gov/license/',
+                'last_updated': '2024-05-21',
+                'results': {'skip': 0, 'limit': len(records), 'total': len(records)},
+                'notes': ['not a label', {'id': 'nor this'}],
+            },
+            'results': records,
+        }, indent=1)
+
+    def parse(self, text, chunk_size):
+        return list(iter_label_records(io.StringIO(text), chunk_size=chunk_size))
+
+    def test_every_chunk_size(self):
+        text = self.document(self.records)
+        for chunk_size in (*range(1, 40), 64, 1000, len(text)):
+            with self.subTest(chunk_size=chunk_size):
+                self.assertEqual(self.parse(text, chunk_size), self.records)
+
+    def test_compact_and_empty_documents(self):
+        compact = json.dumps({'results': self.records}, separators=(',', ':'))
+        for chunk_size in (1, 5, 4096):
+            with self.subTest(chunk_size=chunk_size):
+                self.assertEqual(self.parse(compact, chunk_size), self.records)
+                self.assertEqual(self.parse('{"results": []}', chunk_size), [])
+                self.assertEqual(self.parse('{"meta": {}}', chunk_size), [])
+
+    def test_meta_values_are_not_records(self):
+        compact = json.dumps({'meta': {'results': {'total': 1}, 'codes': [1, 2]}, 'results': [{'id': 'a'}], 'n': 12345})
+        for chunk_size in (1, 3, 4096):
+            with self.subTest(chunk_size=chunk_size):
+                self.assertEqual(self.parse(compact, chunk_size), [{'id': 'a'}])
+
+    def test_truncated_file_raises(self):
+        text = self.document(self.records)
+        with self.assertRaises(json.JSONDecodeError):
+            self.parse(text[:text.index('"id": "b"') + 5], 8)
+
+class DrugInteractionManagerTests(TestCase):
+    def finding(self, drug_a, drug_b, description, severity=2):
+        return {
+            'drug_a': drug_a, 'drug_b': drug_b, 'severity': severity,
+            'description': description, 'source': 'DeepSeek', 'confidence_score': 0.7
+        }
+
+    def test_record_writes_ordered_pairs(self):
+        DrugInteraction.objects.record([
+            self.finding('warfarin', 'aspirin', 'Bleeding risk.'),
+            self.finding('aspirin', 'warfarin', 'Duplicate in one call, last one wins.'),
+            self.finding('ibuprofen', 'aspirin', 'Reduced antiplatelet effect.'),
+        ])
+        rows = {(row.drug_a, row.drug_b): row.description for row in DrugInteraction.objects.all()}
+        self.assertEqual(rows, {
+            ('aspirin', 'warfarin'): 'Duplicate in one call, last one wins.',
+            ('aspirin', 'ibuprofen'): 'Reduced antiplatelet effect.',
+        })
+        self.assertEqual(DrugInteraction.objects.record([]), [])
+
+    def test_record_updates_existing_row(self):
+        existing = DrugInteraction.objects.create(
+            drug_a='aspirin', drug_b='warfarin', severity=1, description='Outdated.', source='OpenFDA', active=False
+        )
+        DrugInteraction.objects.filter(id=existing.id).update(last_updated=timezone.now() - timedelta(days=60))
+
+        with self.assertNumQueries(1):
+            DrugInteraction.objects.record([self.finding('warfarin', 'aspirin', 'Bleeding risk.', severity=3)])
+
+        row = DrugInteraction.objects.get()
+        self.assertEqual(row.id, existing.id)
+        self.assertEqual((row.severity, row.description, row.source, row.active), (3, 'Bleeding risk.', 'DeepSeek', True))
+        self.assertGreater(row.last_updated, timezone.now() - timedelta(minutes=1))
+
+    def test_lookup_matches_either_order_in_one_query(self):
+        DrugInteraction.objects.record([
+            self.finding('aspirin', 'warfarin', 'Bleeding risk.'),
+            self.finding('aspirin', 'ibuprofen', 'Reduced antiplatelet effect.'),
+            self.finding('ibuprofen', 'warfarin', 'Not asked for.'),
+        ])
+        DrugInteraction.objects.create(drug_a='metformin', drug_b='warfarin', severity=1, description='Retired.', active=False)
+
+        with self.assertNumQueries(1):
+            found = DrugInteraction.objects.lookup([
+                ('warfarin', 'aspirin'), ('aspirin', 'ibuprofen'), ('warfarin', 'metformin')
+            ])
+        self.assertEqual(set(found), {('aspirin', 'warfarin'), ('aspirin', 'ibuprofen')})
+        self.assertEqual(found[('aspirin', 'warfarin')].description, 'Bleeding risk.')
+        with self.assertNumQueries(0):
+            self.assertEqual(DrugInteraction.objects.lookup([]), {})
+
+class CanonicaliseDrugInteractionsMigrationTests(TestCase):
+    migration = importlib.import_module('core.migrations.0007_canonicalise_drug_interactions')
+
+    def interaction(self, drug_a, drug_b, description, age_days=0, active=True):
+        row = DrugInteraction.objects.create(
+            drug_a=drug_a, drug_b=drug_b, severity=2, description=description, active=active
+        )
+        DrugInteraction.objects.filter(id=row.id).update(last_updated=timezone.now() - timedelta(days=age_days))
+        return row
+
+    def test_rows_are_rekeyed_and_merged(self):
+        self.interaction('Tylenol', 'Coumadin 5mg', 'older brand-name finding', age_days=10)
+        self.interaction('acetaminophen', 'warfarin', 'newer canonical finding')
+        self.interaction('Paracetamol', 'Warfarin', 'newest but inactive', active=False)
+        self.interaction('Aspirin', 'Jantoven', 'renamed only')
+        self.interaction('Advil', 'Motrin', 'same ingredient twice')
+
+        self.migration.canonicalise_drug_interactions(apps, None)
+
+        rows = {(row.drug_a, row.drug_b): row.description for row in DrugInteraction.objects.all()}
+        self.assertEqual(rows, {
+            ('acetaminophen', 'warfarin'): 'newer canonical finding',
+            ('aspirin', 'warfarin'): 'renamed only',
+        })
+
+class MedicationVoiceFlagMigrationTests(TestCase):
+    migration = importlib.import_module('core.migrations.0008_medication_voice_reminder')
+
+    def test_flag_moves_out_of_schedule_and_back(self):
+        patient = Patient.objects.create(user=User.objects.create_user('voice'), dob=date(1970, 1, 1), phone='1')
+        days = [0, 1, 2, 3, 4, 5, 6]
+        # Rows as the old code wrote them; bulk_create skips the save signals
+        spoken = Medication.objects.bulk_create([
+            Medication(patient=patient, name='Warfarin', dosage='5mg',
+                       schedule={'times': ['08:00'], 'days': days, 'voice_reminder': True}),
+            Medication(patient=patient, name='Aspirin', dosage='75mg',
+                       schedule={'times': ['08:00'], 'days': days, 'voice_reminder': False}),
+            Medication(patient=patient, name='Metformin', dosage='500mg',
+                       schedule={'times': ['08:00'], 'days': days}),
+        ])[0]
+
+        self.migration.move_voice_flag_out_of_schedule(apps, None)
+        rows = {row.name: (row.voice_reminder, row.schedule) for row in Medication.objects.all()}
+        self.assertEqual(rows, {
+            'Warfarin': (True, {'times': ['08:00'], 'days': days}),
+            'Aspirin': (False, {'times': ['08:00'], 'days': days}),
+            'Metformin': (False, {'times': ['08:00'], 'days': days}),
+        })
+
+        self.migration.move_voice_flag_into_schedule(apps, None)
+        spoken.refresh_from_db()
+        self.assertEqual(spoken.schedule, {'times': ['08:00'], 'days': days, 'voice_reminder': True})
+
+class CircuitBreakerTests(SimpleTestCase):
+    def test_reading_state_does_not_take_the_probe(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertEqual(breaker._state, CircuitBreaker.OPEN)
+        self.assertFalse(breaker.is_open())
+        self.assertEqual(breaker.snapshot()['state'], CircuitBreaker.HALF_OPEN)
+
+        self.assertTrue(breaker.allow())
+        self.assertTrue(breaker.is_open())
+        self.assertFalse(breaker.allow())
+        breaker.record_failure()
+        self.assertEqual(breaker._state, CircuitBreaker.OPEN)
+
+    def test_probe_success_closes(self):
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0)
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        breaker.record_failure()
+        self.assertTrue(breaker.allow())
+        breaker.record_success()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        self.assertTrue(breaker.allow())
+
+async def upstream_ok(request):
+    return web.json_response({'path': request.path})
+
+async def upstream_slow(request):
+    await asyncio.sleep(2)
+    return web.json_response({})
+
+async def upstream_unavailable(request):
+    return web.Response(status=503)
+
+@override_settings(HTTP_CIRCUIT_FAILURE_THRESHOLD=100)
+class HttpClientTests(SimpleTestCase):
+    """Runs the shared client against a real aiohttp server on its own loop thread"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        app = web.Application()
+        app.add_routes([
+            web.get('/ok', upstream_ok),
+            web.get('/slow', upstream_slow),
+            web.get('/unavailable', upstream_unavailable),
+        ])
+        cls.server_loop = asyncio.new_event_loop()
+        cls.runner = web.AppRunner(app)
+        cls.server_loop.run_until_complete(cls.runner.setup())
+        site = web.TCPSite(cls.runner, '127.0.0.1', 0)
+        cls.server_loop.run_until_complete(site.start())
+        cls.port = cls.runner.addresses[0][1]
+        cls.server_thread = threading.Thread(target=cls.server_loop.run_forever, daemon=True)
+        cls.server_thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        asyncio.run_coroutine_threadsafe(cls.runner.cleanup(), cls.server_loop).result(5)
+        cls.server_loop.call_soon_threadsafe(cls.server_loop.stop)
+        cls.server_thread.join(5)
+        cls.server_loop.close()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.client = HttpClient()
+        self.addCleanup(self.stop_client)
+
+    def stop_client(self):
+        self.client.close()
+        if self.client._loop is not None:
+            self.client._loop.call_soon_threadsafe(self.client._loop.stop)
+
+    def url(self, path, host='127.0.0.1'):
+        return f"http://{host}:{self.port}{path}"
+
+    def test_request_sync_from_caller_thread(self):
+        response = self.client.request_sync('GET', self.url('/ok'))
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.json(), {'path': '/ok'})
+        self.assertNotEqual(threading.current_thread().name, 'http-client-loop')
+
+    def test_run_and_submit_execute_on_loop_thread(self):
+        async def loop_thread_name():
+            return threading.current_thread().name
+
+        self.assertEqual(self.client.run(loop_thread_name()), 'http-client-loop')
+        self.assertEqual(self.client.submit(loop_thread_name()).result(5), 'http-client-loop')
+
+    def test_run_on_client_loop_refuses_to_deadlock(self):
+        async def nested():
+            coro = asyncio.sleep(0)
+            try:
+                self.client.run(coro)
+            finally:
+                coro.close()
+
+        with self.assertRaises(RuntimeError):
+            self.client.run(nested())
+
+    def test_request_from_another_event_loop(self):
+        response = asyncio.run(self.client.request('GET', self.url('/ok')))
+        self.assertEqual(response.status, 200)
+
+    def test_session_reused_per_host(self):
+        self.client.request_sync('GET', self.url('/ok'))
+        session = self.client._sessions['127.0.0.1:%d' % self.port]
+        self.client.request_sync('GET', self.url('/ok'))
+        self.assertIs(self.client._sessions['127.0.0.1:%d' % self.port], session)
+
+        self.client.request_sync('GET', self.url('/ok', host='localhost'))
+        self.assertEqual(len(self.client._sessions), 2)
+        self.assertEqual(self.client.metrics()['127.0.0.1:%d' % self.port]['requests'], 2)
+
+    def test_timeout_raises_upstream_error(self):
+        with self.assertRaises(UpstreamError) as raised:
+            self.client.request_sync('GET', self.url('/slow'), timeout=0.2)
+        self.assertEqual(raised.exception.host, '127.0.0.1:%d' % self.port)
+        self.assertEqual(self.client.metrics()['127.0.0.1:%d' % self.port]['errors'], 1)
+
+    def test_server_error_raises_upstream_error(self):
+        response = self.client.request_sync('GET', self.url('/unavailable'))
+        with self.assertRaises(UpstreamError) as raised:
+            response.raise_for_status()
+        self.assertEqual(raised.exception.status, 503)
+        self.assertEqual(self.client.metrics()['127.0.0.1:%d' % self.port]['statuses'], {503: 1})
+
+    def test_breaker_reads_hop_onto_the_loop(self):
+        self.client.request_sync('GET', self.url('/ok'))
+        breaker = self.client._breakers['127.0.0.1:%d' % self.port]
+        threads = []
+        original = breaker.is_open
+
+        def is_open():
+            threads.append(threading.current_thread().name)
+            return original()
+
+        with mock.patch.object(breaker, 'is_open', is_open):
+            self.assertFalse(self.client.circuit_open(self.url('/ok')))
+        self.assertEqual(threads, ['http-client-loop'])
+        self.assertEqual(self.client.metrics()['127.0.0.1:%d' % self.port]['circuit']['state'], 'closed')
+
+    @override_settings(HTTP_CIRCUIT_FAILURE_THRESHOLD=1, HTTP_CIRCUIT_RESET_TIMEOUT=60)
+    def test_open_circuit_rejects_without_calling(self):
+        self.client.request_sync('GET', self.url('/unavailable'))
+        self.assertTrue(self.client.circuit_open(self.url('/ok')))
+        with self.assertRaises(UpstreamError):
+            self.client.request_sync('GET', self.url('/ok'))
+        host_metrics = self.client.metrics()['127.0.0.1:%d' % self.port]
+        self.assertEqual((host_metrics['requests'], host_metrics['rejected']), (1, 1))
@@ -9,4 +9,5 @@ urlpatterns = [
     path('profile/', views.profile, name='profile'),
     path('patient/<int:pk>/', views.patient_detail, name='patient_detail'),
     path('patient/<int:patient_id>/add-medication/', views.add_medication, name='add_medication'),
+    path('metrics', views.metrics, name='metrics'),
 ]
\ No newline at end of file
@@ -1,3 +1,6 @@
+import hmac
+from django.conf import settings
+from django.http import HttpResponse
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import login, authenticate
 from django.contrib.auth.forms import UserCreationForm
@@ -5,6 +8,7 @@ from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.views.decorators.http import require_http_methods
 from django.utils import timezone
+from .metrics import render_prometheus
 from .models import Patient
 
 @login_required
@@ -112,3 +116,19 @@ def add_medication(request, patient_id):
         else:
             messages.error(request, "Medication name is required!")
     return render(request, 'core/add_medication.html', {'patient': patient})
+
+def _metrics_token_ok(request) -> bool:
+    if not settings.METRICS_TOKEN:
+        return False
+    supplied = request.headers.get('Authorization', '').encode()
+    return hmac.compare_digest(supplied, f"Bearer {settings.METRICS_TOKEN}".encode())
+
+@require_http_methods(["GET"])
+def metrics(request):
+    """
+    Prometheus scrape endpoint for this worker's request, DB, upstream and
+    cache counters. Needs the METRICS_TOKEN bearer token or a staff session.
+    """
+    if not (request.user.is_staff or _metrics_token_ok(request)):
+        return HttpResponse(status=401)
+    return HttpResponse(render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,24 @@
+# Opt-in ASGI deployment profile; the Dockerfile defaults to WSGI:
+#   gunicorn -c gunicorn_asgi.py MedicOS.asgi:application
+# Async views (reminders, alternatives) only run concurrently under ASGI; under
+# WSGI every request holds a worker thread for its whole Telegram/TTS round trip.
+# The trade-off: sync views still run on a single thread-sensitive executor per
+# worker under ASGI, so the hot sync views serialise and need more workers than
+# under WSGI. Switch only once the traffic that matters is on async views.
+# Anything running on an event loop (async views, core.http_client, the Telegram
+# sender) must not block it: use cache.aget/aset, the async ORM or sync_to_async,
+# and plain (non-streaming) responses. api.tests.AsyncViewBlockingTests checks this.
+import multiprocessing
+import os
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.getenv('GUNICORN_WORKERS', multiprocessing.cpu_count()))
+worker_class = 'uvicorn_worker.UvicornWorker'
+# Requests are mostly waiting on upstreams; keep slow ones from being killed early
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 60))
+graceful_timeout = 30
+keepalive = 5
+# Recycle workers now and then so leaks in native libraries can't accumulate
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 10000))
+max_requests_jitter = 1000
+accesslog = '-'